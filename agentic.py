@@ -1,19 +1,37 @@
+import time
+_import_started = time.perf_counter()
 from typing import TypedDict, List
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
-from langchain.prompts import PromptTemplate
-from langchain.tools import tool
+from langchain_core.prompts import PromptTemplate
+from langchain_core.tools import StructuredTool
 from dotenv import load_dotenv
 from langgraph.graph import StateGraph, END
 from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+import asyncio
+import hashlib
 import json
-from langchain_chroma import Chroma
+import os
+import shutil
+import threading
+from functools import cached_property, partial
+import httpx
 from langchain_core.messages import ToolMessage, HumanMessage
+from cached_embeddings import cached_openai_embeddings
+from retrieval import CachedRetriever, SpeculativePrefetcher
+from router import default_router, RETRIEVER_ROUTE, GENERAL_ROUTE
 
-from langchain.globals import set_debug
-
-set_debug(True)
+from metrics import metrics, timed_node, llm_metrics_callback, startup_step, startup_timings
+from checkpoint import default_checkpointer
+from context_compression import CONTEXT_COMPRESSION, CONTEXT_FETCH_K, compress_context
 
 load_dotenv()
+
+
+def chat_model(model="gpt-4o-mini", **kwargs):
+    # langchain_openai takes seconds to import, so it is only loaded when a client is built
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(model=model, **kwargs)
+
 #state
 class State(TypedDict):
     messages: List[str]
@@ -22,8 +40,8 @@ class State(TypedDict):
     
 
 class supervisedAgent:
-    def __init__(self):
-        self.llm = ChatOpenAI(model="gpt-4o-mini")
+    def __init__(self, llm=None):
+        self.llm = llm or chat_model("gpt-4o-mini")
         
     
     def define_prompt(self):
@@ -57,26 +75,71 @@ class supervisedAgent:
         return chain 
 
 
-embedding = OpenAIEmbeddings(model="text-embedding-3-large")
-retriever = Chroma(
-    embedding_function=embedding, persist_directory="chromadb",collection_name="rag"
-    )
-@tool
-def pdf_chatter( query):
+# created on first use by get_embedding() / get_cached_retriever(), not at import
+embedding = None
+retriever = None
+cached_retriever = None
+_init_lock = threading.Lock()
+
+def get_embedding():
+    global embedding
+    if embedding is None:
+        with _init_lock:
+            if embedding is None:
+                with startup_step("embeddings"):
+                    embedding = cached_openai_embeddings(model="text-embedding-3-large")
+    return embedding
+
+def get_cached_retriever():
+    global retriever, cached_retriever
+    if cached_retriever is None:
+        embeddings = get_embedding()
+        with _init_lock:
+            if cached_retriever is None:
+                with startup_step("vector_store"):
+                    from langchain_chroma import Chroma
+                    retriever = Chroma(
+                        embedding_function=embeddings, persist_directory="chromadb",collection_name="rag"
+                        )
+                    # RETRIEVAL_MODE: vector (default), hybrid (BM25 + vector), lexical (BM25 only) or
+                    # compact (truncated/int8 memory-mapped embeddings, see compact_index.py)
+                    cached_retriever = CachedRetriever(retriever, embeddings, mode=os.getenv("RETRIEVAL_MODE", "vector"))
+    return cached_retriever
+
+# compression over-fetches candidates and lets MMR / the token budget pick the context
+RETRIEVAL_K = CONTEXT_FETCH_K if CONTEXT_COMPRESSION else 2
+
+
+def build_context(question, docs):
+    """
+        Compact cited context for final_answer; CONTEXT_COMPRESSION=0 keeps the raw documents.
+    """
+    if not CONTEXT_COMPRESSION or not isinstance(docs, list):
+        return docs
+    return compress_context(question, docs)
+
+def _pdf_chatter( query):
     """
         this tool must be called when question is about company or question related to pdf.
     """
     
     print("*"*100)
-    docs = retriever.similarity_search(query, k=2)
+    docs = get_cached_retriever().similarity_search(query, k=RETRIEVAL_K)
     return docs
+
+async def _apdf_chatter(query):
+    return await get_cached_retriever().asimilarity_search(query, k=RETRIEVAL_K)
+
+pdf_chatter = StructuredTool.from_function(
+    func=_pdf_chatter, coroutine=_apdf_chatter, name="pdf_chatter"
+)
 tools = dict()
 tools[pdf_chatter.name] = pdf_chatter
 class Agnet2:
-    def __init__(self):
+    def __init__(self, llm=None):
         # retreiver data 
 
-        self.llm = ChatOpenAI(model="gpt-4o-mini")        
+        self.llm = llm or chat_model("gpt-4o-mini")
         self.agent2prompt()
     
     def agent2prompt(self):
@@ -109,33 +172,236 @@ class Agnet2:
         
         
 
-def node_1(state: State):
+final_answer_prompt = """
+        User question: {question}
+        context: {context}
+        
+        Provide the answer based on question and context provided.
+        JSON Structure format:
+        * Do not provide the explaination and always format the data into provided format below:
+        ```json{{
+            "answer": html format only.
+        }}```
+    """
+
+
+def with_llm_metrics(llm):
+    if llm_metrics_callback not in (llm.callbacks or []):
+        llm.callbacks = [*(llm.callbacks or []), llm_metrics_callback]
+    return llm
+
+
+class AgentRegistry:
+    """
+        Created once in `get_workflow()`: holds the compiled chains of every node and a
+        single LLM client whose sync/async httpx clients keep pooled connections alive
+        across turns, instead of rebuilding prompts and clients on every graph step.
+        Every member is built on first use (or by `warmup()`), so creating the registry is free.
+    """
+    def __init__(self, model="gpt-4o-mini", max_connections=50, max_keepalive_connections=20,
+                 local_router=True, embeddings=None, llm=None, speculative=False):
+        self.model = model
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive_connections)
+        self.local_router = local_router
+        self.embeddings = embeddings
+        self.speculative = speculative
+        self.http_client = self.http_async_client = None
+        if llm is not None:
+            self.llm = with_llm_metrics(llm)
+
+    @cached_property
+    def llm(self):
+        with startup_step("llm_client"):
+            self.http_client = httpx.Client(limits=self.limits)
+            self.http_async_client = httpx.AsyncClient(limits=self.limits)
+            # stream_usage keeps token metrics when the graph is streamed token by token
+            return with_llm_metrics(chat_model(self.model, http_client=self.http_client,
+                                               http_async_client=self.http_async_client, stream_usage=True))
+
+    @cached_property
+    def supervisor(self):
+        return supervisedAgent(self.llm).create_supervisor()
+
+    @cached_property
+    def agent2(self):
+        return Agnet2(self.llm).finalAgent()
+
+    @cached_property
+    def final_answer(self):
+        return PromptTemplate.from_template(final_answer_prompt) | self.llm
+
+    @cached_property
+    def router(self):
+        # decides greetings and obvious report questions without calling the supervisor
+        if not self.local_router:
+            return None
+        if self.embeddings is not None:
+            return default_router(self.embeddings)
+        # the router's low-retry copy shares the on-disk embedding cache with retrieval, so a
+        # routed question is still embedded once
+        return default_router(get_embedding())
+
+    @cached_property
+    def prefetcher(self):
+        # enabled by get_workflow(speculative=True)
+        return SpeculativePrefetcher(get_cached_retriever(), k=RETRIEVAL_K) if self.speculative else None
+
+    def warmup(self):
+        """
+            Builds everything the first request would otherwise build.
+        """
+        with startup_step("warmup"):
+            self.supervisor, self.agent2, self.final_answer, self.router, self.prefetcher
+            get_cached_retriever()
+
+    def close(self):
+        """
+            Closes both pooled HTTP clients and the prefetch workers. From async code prefer
+            `await aclose()`, which closes the async client on the loop that used it.
+        """
+        if self.http_client is not None:
+            self.http_client.close()
+        if self.http_async_client is not None and not self.http_async_client.is_closed:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                loop = None
+            if loop is not None:
+                loop.create_task(self.http_async_client.aclose())
+            else:
+                try:
+                    asyncio.run(self.http_async_client.aclose())
+                except RuntimeError:
+                    # its connections belong to an event loop that is already closed
+                    pass
+        prefetcher = self.__dict__.get("prefetcher")
+        if prefetcher is not None:
+            prefetcher.close()
+
+    async def aclose(self):
+        if self.http_async_client is not None:
+            await self.http_async_client.aclose()
+        self.close()
+
+
+_registry = None
+
+def get_registry():
+    global _registry
+    if _registry is None:
+        _registry = AgentRegistry()
+    return _registry
+
+
+def message_text(message):
+    if isinstance(message, tuple):
+        return message[1]
+    return getattr(message, "content", message)
+
+
+def record_supervisor_route(router, answer):
+    if router is not None:
+        router.record_llm(RETRIEVER_ROUTE if answer == RETRIEVER_ROUTE else GENERAL_ROUTE)
+
+
+def node_1(state: State, registry=None):
+    registry = registry or get_registry()
     question = state["messages"][-1]
-    sp_agent = supervisedAgent()
-    sp1 = sp_agent.create_supervisor()
-    response = sp1.invoke({"question": question})
-    output = response.content.replace("```json", "").replace("```", "")
-    output = json.loads(output)
+    router = getattr(registry, "router", None)
+    decision = router.route(message_text(question)) if router else None
+    if decision is not None:
+        state["messages"].append(AIMessage(content = decision.answer))
+        return state
+    prefetcher = getattr(registry, "prefetcher", None)
+    if prefetcher is not None:
+        prefetcher.start(message_text(question))
+    routed = False
+    try:
+        sp1 = registry.supervisor
+        response = sp1.invoke({"question": question})
+        output = response.content.replace("```json", "").replace("```", "")
+        output = json.loads(output)
+        routed = output["answer"] == RETRIEVER_ROUTE
+    finally:
+        # any other route, or a failed/unparseable supervisor call, releases the prefetch
+        if prefetcher is not None and not routed:
+            prefetcher.discard(message_text(question))
+    record_supervisor_route(router, output["answer"])
+    state["messages"].append(AIMessage(content = output["answer"]))
+    return state
+
+
+async def anode_1(state: State, registry=None):
+    registry = registry or get_registry()
+    question = state["messages"][-1]
+    router = getattr(registry, "router", None)
+    decision = await router.aroute(message_text(question)) if router else None
+    if decision is not None:
+        state["messages"].append(AIMessage(content = decision.answer))
+        return state
+    prefetcher = getattr(registry, "prefetcher", None)
+    if prefetcher is not None:
+        prefetcher.astart(message_text(question))
+    routed = False
+    try:
+        sp1 = registry.supervisor
+        response = await sp1.ainvoke({"question": question})
+        output = response.content.replace("```json", "").replace("```", "")
+        output = json.loads(output)
+        routed = output["answer"] == RETRIEVER_ROUTE
+    finally:
+        # any other route, or a failed/unparseable supervisor call, releases the prefetch
+        if prefetcher is not None and not routed:
+            prefetcher.discard(message_text(question))
+    record_supervisor_route(router, output["answer"])
     state["messages"].append(AIMessage(content = output["answer"]))
     return state
 
 
 def conditional_check(state: State):
     ot = state["messages"][-1].content
-    if ot == "retreiveragent":
+    if ot == RETRIEVER_ROUTE:
         return "call_next"
     else:
         return "__end__"
     
 #1353594633
-def agent_2(state: State):
-    agent = Agnet2()
-    agent = agent.finalAgent()
+def agent_2(state: State, registry=None):
+    registry = registry or get_registry()
+    agent = registry.agent2
     # we focus only on question
     for message in state["messages"][:-1]:
         if "user" in message:
             _, question = message
-    output = agent.invoke({"question": question})
+    prefetcher = getattr(registry, "prefetcher", None)
+    try:
+        output = agent.invoke({"question": question})
+    except BaseException:
+        if prefetcher is not None:
+            prefetcher.discard(question)
+        raise
+    if prefetcher is not None and not output.tool_calls:
+        # should_continue ends the run, tool_node will not take the prefetch
+        prefetcher.discard(question)
+    state["messages"].append(output)
+    return state
+
+async def aagent_2(state: State, registry=None):
+    registry = registry or get_registry()
+    agent = registry.agent2
+    for message in state["messages"][:-1]:
+        if "user" in message:
+            _, question = message
+    prefetcher = getattr(registry, "prefetcher", None)
+    try:
+        output = await agent.ainvoke({"question": question})
+    except BaseException:
+        if prefetcher is not None:
+            prefetcher.discard(question)
+        raise
+    if prefetcher is not None and not output.tool_calls:
+        # should_continue ends the run, tool_node will not take the prefetch
+        prefetcher.discard(question)
     state["messages"].append(output)
     return state
     
@@ -146,79 +412,241 @@ def should_continue(state: State):
     else:
         return "__end__"
 
-def tool_node(state: State):
-    for tn in state["messages"][-1].tool_calls:
+def is_retrieval_call(tool_call):
+    return tool_call["name"] == pdf_chatter.name
+
+def tool_node(state: State, registry=None):
+    prefetcher = getattr(registry, "prefetcher", None)
+    tool_calls = state["messages"][-1].tool_calls
+    # the prefetch ran on the routed question, which the LLM usually rewrites for the
+    # tool call, so it is taken by that question and serves the first retrieval call
+    prefetched = prefetcher.take(routed_question(state)) if prefetcher is not None else None
+    for tn in tool_calls:
         tname = tn["name"]
         args = tn["args"]
-        result = tools[tname].invoke(args)
+        result = None
+        if prefetched is not None and is_retrieval_call(tn):
+            result, prefetched = prefetched, None
+        if result is None:
+            result = tools[tname].invoke(args)
         context = ToolMessage(
-            content=result, 
+            content=build_context(args.get("query"), result),
             name= tname,
             tool_call_id = tn["id"]
         )
     state["messages"].append(context)
     return state    
 
-def final_answer(state: State):
+async def atool_node(state: State, registry=None):
+    prefetcher = getattr(registry, "prefetcher", None)
+    tool_calls = state["messages"][-1].tool_calls
+    prefetched = await prefetcher.atake(routed_question(state)) if prefetcher is not None else None
+
+    async def call(tn):
+        return await tools[tn["name"]].ainvoke(tn["args"])
+
+    pending = []
+    for tn in tool_calls:
+        if prefetched is not None and is_retrieval_call(tn):
+            pending.append(asyncio.sleep(0, prefetched))
+            prefetched = None
+        else:
+            pending.append(call(tn))
+    results = await asyncio.gather(*pending)
+    for tn, result in zip(tool_calls, results):
+        context = ToolMessage(
+            content=build_context(tn["args"].get("query"), result),
+            name=tn["name"],
+            tool_call_id=tn["id"]
+        )
+    state["messages"].append(context)
+    return state
+
+def final_answer(state: State, registry=None):
     question = None 
     context = None 
-    for messages in state["messages"][:-1]:
+    for messages in state["messages"]:
         if "user" in messages:
             question = messages[1]
         
         if type(messages) == ToolMessage:
-            context = messages
-    
-    
-    pmpt = """
-        User question: {question}
-        context: {context}
-        
-        Provide the answer based on question and context provided.
-        JSON Structure format:
-        * Do not provide the explaination and always format the data into provided format below:
-        ```json{{
-            "answer": html format only.
-        }}```
-    """
+            context = messages.content
     
-    chain = PromptTemplate.from_template(pmpt) | ChatOpenAI(model="gpt-4o-mini")
+    chain = (registry or get_registry()).final_answer
     output = chain.invoke({"question": question, "context": context})
     state["messages"].append(json.loads(output.content.replace("```json", "").replace("```", "")))
     return state
 
-def get_workflow():
+async def afinal_answer(state: State, registry=None):
+    question = None
+    context = None
+    for messages in state["messages"]:
+        if "user" in messages:
+            question = messages[1]
+        if type(messages) == ToolMessage:
+            context = messages.content
+
+    chain = (registry or get_registry()).final_answer
+    output = await chain.ainvoke({"question": question, "context": context})
+    state["messages"].append(json.loads(output.content.replace("```json", "").replace("```", "")))
+    return state
+
+
+def routed_question(state: State):
+    question = None
+    for message in state["messages"][:-1]:
+        if "user" in message:
+            _, question = message
+    return question
+
+def direct_answer(state: State, registry=None):
+    """
+        Direct RAG: retrieves context for the routed question and answers in a single
+        generation, skipping the tool-calling round-trip of node_2 -> tool_node.
+    """
+    registry = registry or get_registry()
+    question = routed_question(state)
+    prefetcher = getattr(registry, "prefetcher", None)
+    docs = prefetcher.take(question) if prefetcher is not None else None
+    if docs is None:
+        docs = get_cached_retriever().similarity_search(question, k=RETRIEVAL_K)
+    chain = registry.final_answer
+    output = chain.invoke({"question": question, "context": build_context(question, docs)})
+    state["messages"].append(json.loads(output.content.replace("```json", "").replace("```", "")))
+    return state
+
+async def adirect_answer(state: State, registry=None):
+    registry = registry or get_registry()
+    question = routed_question(state)
+    prefetcher = getattr(registry, "prefetcher", None)
+    docs = await prefetcher.atake(question) if prefetcher is not None else None
+    if docs is None:
+        docs = await get_cached_retriever().asimilarity_search(question, k=RETRIEVAL_K)
+    chain = registry.final_answer
+    output = await chain.ainvoke({"question": question, "context": build_context(question, docs)})
+    state["messages"].append(json.loads(output.content.replace("```json", "").replace("```", "")))
+    return state
+
+
+def graph_node(name, func, afunc, registry=None):
+    """
+        A node usable from both `workflow.invoke` (sync) and `workflow.ainvoke` (async),
+        timed into `node_latency_seconds{node=name}`.
+    """
+    if registry is not None:
+        func, afunc = partial(func, registry=registry), partial(afunc, registry=registry)
+    func, afunc = timed_node(name, func, afunc)
+    return RunnableLambda(func, afunc=afunc)
+
+WORKFLOW_MODES = ("tools", "direct")
+
+def register_collectors(registry):
+    """
+        Cache and routing counters shown next to the latency histograms.
+    """
+    # only report what has been built, collectors must not trigger initialisation
+    metrics.register_collector("retrieval_cache", lambda: cached_retriever.stats() if cached_retriever is not None else {})
+    metrics.register_collector("router", lambda: registry.__dict__["router"].stats() if registry.__dict__.get("router") else {})
+    metrics.register_collector("prefetch", lambda: registry.__dict__["prefetcher"].stats() if registry.__dict__.get("prefetcher") else {})
+    metrics.register_collector("embedding_cache", lambda: dict(getattr(embedding, "stats", {})))
+    metrics.register_collector("startup_ms", lambda: dict(startup_timings))
+
+
+GRAPH_IMAGE_CACHE = ".graph_cache"
+
+def save_graph_image(workflow, output_file_path="my_langgraph.png", cache_dir=GRAPH_IMAGE_CACHE):
+    """
+        Renders the graph png through the mermaid API only when the graph structure has
+        not been rendered before; renders are cached by the hash of the mermaid source.
+    """
+    with startup_step("graph_image"):
+        graph = workflow.get_graph()
+        key = hashlib.sha256(graph.draw_mermaid().encode("utf-8")).hexdigest()[:16]
+        cached_path = os.path.join(cache_dir, f"{key}.png")
+        if not os.path.exists(cached_path):
+            try:
+                png_graph_bytes = graph.draw_mermaid_png()
+            except Exception as e:
+                print(f"Could not render graph image: {e}")
+                return None
+            os.makedirs(cache_dir, exist_ok=True)
+            with open(cached_path, "wb") as f:
+                f.write(png_graph_bytes)
+        shutil.copyfile(cached_path, output_file_path)
+    print(f"Graph saved as '{output_file_path}' in {os.getcwd()}")
+    return output_file_path
+
+def get_workflow(registry=None, mode=None, draw_graph=None, speculative=None, checkpointer=None):
+    """
+        mode="tools": boss -> node_2 (LLM emits a pdf_chatter call) -> tool_node -> final_answer.
+        mode="direct": boss -> direct_answer, one generation per company question.
+        Defaults to the WORKFLOW_MODE environment variable, then "tools".
+
+        speculative=True starts retrieval for the incoming message alongside the supervisor
+        call (SPECULATIVE_RETRIEVAL=1 enables it by default).
+
+        checkpointer defaults to the bounded SQLite saver (see checkpoint.default_checkpointer).
+
+        No client, vector store or graph image is created here; draw_graph=True (or
+        DRAW_GRAPH=1) writes my_langgraph.png through the render cache.
+    """
+    global _registry
+    started = time.perf_counter()
+    mode = mode or os.getenv("WORKFLOW_MODE", "tools")
+    if mode not in WORKFLOW_MODES:
+        raise ValueError(f"Unknown workflow mode '{mode}', expected one of {WORKFLOW_MODES}")
+    registry = registry or AgentRegistry()
+    if speculative is None:
+        speculative = os.getenv("SPECULATIVE_RETRIEVAL", "0") == "1"
+    if registry.speculative != speculative:
+        prefetcher = registry.__dict__.pop("prefetcher", None)
+        if prefetcher is not None:
+            prefetcher.close()
+        registry.speculative = speculative
+    _registry = registry
+    register_collectors(registry)
     graph = StateGraph(state_schema=State)
 
-    graph.add_node("boss", node_1)
-    graph.add_node("node_2",agent_2)
-    graph.add_node("tool_node", tool_node)
-    graph.add_node("final_answer", final_answer)
+    graph.add_node("boss", graph_node("boss", node_1, anode_1, registry))
     graph.set_entry_point("boss")
-    graph.add_conditional_edges(
-        "boss", conditional_check, 
-        {
-            "call_next": "node_2",
+    if mode == "direct":
+        graph.add_node("direct_answer", graph_node("direct_answer", direct_answer, adirect_answer, registry))
+        graph.add_conditional_edges(
+            "boss", conditional_check,
+            {
+                "call_next": "direct_answer",
+                "__end__": END
+            }
+        )
+        graph.add_edge("direct_answer", END)
+    else:
+        graph.add_node("node_2", graph_node("node_2", agent_2, aagent_2, registry))
+        graph.add_node("tool_node", graph_node("tool_node", tool_node, atool_node, registry))
+        graph.add_node("final_answer", graph_node("final_answer", final_answer, afinal_answer, registry))
+        graph.add_conditional_edges(
+            "boss", conditional_check, 
+            {
+                "call_next": "node_2",
+                "__end__": END
+            }
+        )
+        graph.add_conditional_edges("node_2", should_continue, {
+            "continue": "tool_node",
             "__end__": END
-        }
-    )
-    graph.add_conditional_edges("node_2", should_continue, {
-        "continue": "tool_node",
-        "__end__": END
-    })
-    graph.add_edge("tool_node", "final_answer")
-    graph.add_edge("final_answer", END)
-    from langgraph.checkpoint.memory import InMemorySaver
-
-    workflow = graph.compile(checkpointer=InMemorySaver())
-
-    import os 
-    png_graph_bytes = workflow.get_graph().draw_mermaid_png()
-    output_file_path = "my_langgraph.png"
-    with open(output_file_path, "wb") as f:
-        f.write(png_graph_bytes)
+        })
+        graph.add_edge("tool_node", "final_answer")
+        graph.add_edge("final_answer", END)
+    checkpointer = checkpointer if checkpointer is not None else default_checkpointer()
+    info = getattr(checkpointer, "info", None)
+    if info is not None:
+        metrics.register_collector("checkpointer", info)
 
-    print(f"Graph saved as '{output_file_path}' in {os.getcwd()}")
+    workflow = graph.compile(checkpointer=checkpointer)
+    startup_timings["get_workflow"] = round((time.perf_counter() - started) * 1000, 2)
+    if draw_graph is None:
+        draw_graph = os.getenv("DRAW_GRAPH", "0") == "1"
+    if draw_graph:
+        save_graph_image(workflow)
 
     # ot = workflow.invoke({
     #     "messages": [("user", "can you tell me about company status of tata motors?")]
@@ -228,3 +656,4 @@ def get_workflow():
     return workflow
 
 
+startup_timings["import_agentic"] = round((time.perf_counter() - _import_started) * 1000, 2)
@@ -0,0 +1,52 @@
+"""
+    Per-turn setup overhead of the graph nodes, before and after the shared AgentRegistry.
+
+    Run from the repository root:  python -m benchmarks.bench_agent_setup
+    No request is sent to OpenAI, only client/prompt/chain construction is timed.
+"""
+import os
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from langchain.prompts import PromptTemplate
+
+import agentic
+
+
+def per_turn_before():
+    # what node_1, agent_2 and final_answer used to build on every turn
+    agentic.supervisedAgent().create_supervisor()
+    agentic.Agnet2().finalAgent()
+    PromptTemplate.from_template(agentic.final_answer_prompt) | agentic.chat_model("gpt-4o-mini")
+
+
+def per_turn_after(registry):
+    registry.supervisor
+    registry.agent2
+    registry.final_answer
+
+
+def measure(fn, turns):
+    start = time.perf_counter()
+    for _ in range(turns):
+        fn()
+    return (time.perf_counter() - start) / turns * 1000
+
+
+def main(turns=50):
+    start = time.perf_counter()
+    registry = agentic.AgentRegistry()
+    per_turn_after(registry)
+    build_ms = (time.perf_counter() - start) * 1000
+    before_ms = measure(per_turn_before, turns)
+    after_ms = measure(lambda: per_turn_after(registry), turns)
+    print(f"registry build (once):   {build_ms:8.3f} ms")
+    print(f"per turn, before:        {before_ms:8.3f} ms")
+    print(f"per turn, with registry: {after_ms:8.3f} ms")
+    registry.close()
+    return {"registry_build_ms": build_ms, "per_turn_before_ms": before_ms, "per_turn_after_ms": after_ms}
+
+
+if __name__ == "__main__":
+    main()
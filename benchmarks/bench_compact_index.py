@@ -0,0 +1,99 @@
+"""
+    Compact vector storage versus the Chroma path: bytes held for search, bytes on disk,
+    query latency and recall@k against exact full-precision search.
+
+    Embeddings are synthetic 3072-dim vectors whose variance decays over the dimensions
+    (like text-embedding-3 vectors, which stay usable when shortened), so the recall of
+    truncated variants is indicative only; rerun on a real collection for final numbers.
+
+    Run from the repository root:  python -m benchmarks.bench_compact_index
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import numpy as np
+from langchain_chroma import Chroma
+
+from compact_index import CompactVectorIndex, normalize_rows
+from fakes import FakeEmbeddings
+
+VARIANTS = [
+    {"name": "f16 full dim", "dim": 0, "quantize": False, "rerank": 0},
+    {"name": "int8 1024", "dim": 1024, "quantize": True, "rerank": 0},
+    {"name": "int8 512", "dim": 512, "quantize": True, "rerank": 0},
+    {"name": "int8 512 + rerank", "dim": 512, "quantize": True, "rerank": 4},
+    {"name": "int8 256 + rerank", "dim": 256, "quantize": True, "rerank": 4},
+]
+
+
+def synthetic_embeddings(n, dim, clusters=64, seed=7):
+    rng = np.random.default_rng(seed)
+    decay = 1.0 / np.sqrt(1.0 + np.arange(dim) / 32.0)
+    centers = rng.normal(size=(clusters, dim)) * decay
+    vectors = centers[rng.integers(0, clusters, n)] + 0.6 * rng.normal(size=(n, dim)) * decay
+    return normalize_rows(vectors.astype(np.float32))
+
+
+def directory_bytes(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def timed(fn, queries):
+    timings = []
+    results = []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(fn(query))
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.mean(timings), results
+
+
+def recall(results, truth):
+    return statistics.mean(len(set(found) & set(expected)) / len(expected) for found, expected in zip(results, truth))
+
+
+def main(n=5000, dim=3072, n_queries=50, k=4):
+    vectors = synthetic_embeddings(n + n_queries, dim)
+    corpus, queries = vectors[:n], vectors[n:]
+    ids = [f"chunk-{i}" for i in range(n)]
+    texts = [f"synthetic chunk {i}" for i in range(n)]
+    truth = [[ids[i] for i in np.argsort(-(corpus @ query))[:k]] for query in queries]
+    rows = []
+    with tempfile.TemporaryDirectory() as directory:
+        chroma_dir = os.path.join(directory, "chroma")
+        vectordb = Chroma(embedding_function=FakeEmbeddings(size=dim), persist_directory=chroma_dir,
+                          collection_name="rag", collection_metadata={"hnsw:space": "cosine"})
+        for start in range(0, n, 1000):
+            vectordb._collection.add(ids=ids[start:start + 1000], embeddings=corpus[start:start + 1000].tolist(),
+                                     documents=texts[start:start + 1000])
+        latency, results = timed(lambda q: [d.id for d in vectordb.similarity_search_by_vector(q.tolist(), k=k)], queries)
+        rows.append({"name": "chroma (hnsw, float32)", "search_bytes": n * dim * 4,
+                     "disk_bytes": directory_bytes(chroma_dir), "latency_ms": latency, "recall": recall(results, truth)})
+
+        for variant in VARIANTS:
+            index_dir = os.path.join(directory, variant["name"].replace(" ", "_"))
+            index = CompactVectorIndex.build(index_dir, ids, corpus, texts, [{}] * n, dim=variant["dim"],
+                                             quantize=variant["quantize"], rerank=variant["rerank"])
+            latency, results = timed(lambda q: [index.ids[row] for row, _ in index.search(q, k)], queries)
+            memory = index.memory_bytes()
+            rows.append({"name": variant["name"], "search_bytes": memory["vectors"] + memory["scales"],
+                         "disk_bytes": directory_bytes(index_dir), "latency_ms": latency, "recall": recall(results, truth)})
+
+    print(f"{n} vectors x {dim} dims, {n_queries} queries, k={k}")
+    print(f"{'variant':<24} {'search MB':>10} {'disk MB':>9} {'latency ms':>11} {'recall@k':>9}")
+    for row in rows:
+        print(f"{row['name']:<24} {row['search_bytes'] / 1e6:>10.1f} {row['disk_bytes'] / 1e6:>9.1f} "
+              f"{row['latency_ms']:>11.2f} {row['recall']:>9.3f}")
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--vectors", type=int, default=5000)
+    parser.add_argument("--dim", type=int, default=3072)
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+    main(args.vectors, args.dim, args.queries)
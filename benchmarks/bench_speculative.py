@@ -0,0 +1,68 @@
+"""
+    Speculative retrieval: latency with and without prefetching during supervisor routing,
+    plus the retrieval work wasted on questions that were not routed to the retriever.
+
+    Run from the repository root:  python -m benchmarks.bench_speculative
+    Offline: FakeChatModel and FakeEmbeddings with simulated latencies.
+"""
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+os.environ.setdefault("CHECKPOINT_BACKEND", "memory")
+
+from langchain.globals import set_debug
+from langchain_chroma import Chroma
+
+import agentic
+from fakes import FakeChatModel, FakeEmbeddings
+from retrieval import CachedRetriever
+
+COMPANY = "What does the report say about company revenue in segment {i}?"
+GENERAL = "Explain the history of the bicycle, part {i}"
+
+
+def run(mode, speculative, directory, llm_latency, embedding_latency, questions, use_async):
+    embeddings = FakeEmbeddings(latency=embedding_latency)
+    vectordb = Chroma(embedding_function=embeddings, persist_directory=directory, collection_name="rag")
+    agentic.cached_retriever = CachedRetriever(vectordb, embeddings, persist_directory=directory)
+    registry = agentic.AgentRegistry(llm=FakeChatModel(latency=llm_latency), local_router=False)
+    workflow = agentic.get_workflow(registry, mode=mode, draw_graph=False, speculative=speculative)
+    timings = []
+    for i, question in enumerate(questions):
+        config = {"configurable": {"thread_id": f"{mode}-{speculative}-{i}"}}
+        payload = {"messages": [("user", question.format(i=i))]}
+        start = time.perf_counter()
+        if use_async:
+            asyncio.run(workflow.ainvoke(payload, config=config))
+        else:
+            workflow.invoke(payload, config=config)
+        timings.append((time.perf_counter() - start) * 1000)
+    stats = registry.prefetcher.stats() if registry.prefetcher else {}
+    registry.close()
+    return {"mode": mode, "speculative": speculative, "async": use_async,
+            "latency_ms_mean": statistics.mean(timings), "prefetch": stats}
+
+
+def main(llm_latency=0.05, embedding_latency=0.03, n=10):
+    set_debug(False)
+    questions = [COMPANY] * n + [GENERAL] * (n // 2)
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        seed = Chroma(embedding_function=FakeEmbeddings(), persist_directory=directory, collection_name="rag")
+        seed.add_texts([f"Segment {i} revenue and profit for the year." for i in range(50)])
+        for mode in agentic.WORKFLOW_MODES:
+            for use_async in (False, True):
+                for speculative in (False, True):
+                    results.append(run(mode, speculative, directory, llm_latency, embedding_latency, questions, use_async))
+    for result in results:
+        print(f"{result['mode']:>6} async={result['async']!s:5} speculative={result['speculative']!s:5} "
+              f"mean {result['latency_ms_mean']:7.1f} ms  {result['prefetch']}")
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+    SQL throughput by thread count: the shared SQLDatabase engine used before versus the
+    pooled read-only connections behind sql_agent.run_sql (result cache disabled so every
+    call executes).
+
+    Run from the repository root:  python -m benchmarks.bench_sql_pool
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from langchain_community.utilities import SQLDatabase
+
+from sql_pool import ReadOnlyConnectionPool
+from sql_results import run_query
+
+QUERIES = [
+    "SELECT g.Name, SUM(il.UnitPrice * il.Quantity) AS revenue FROM InvoiceLine il "
+    "JOIN Track t ON t.TrackId = il.TrackId JOIN Genre g ON g.GenreId = t.GenreId "
+    "GROUP BY g.Name ORDER BY revenue DESC",
+    "SELECT c.Country, COUNT(*), SUM(i.Total) FROM Invoice i JOIN Customer c ON c.CustomerId = i.CustomerId "
+    "GROUP BY c.Country ORDER BY 3 DESC",
+    "SELECT a.Name, COUNT(t.TrackId) FROM Artist a JOIN Album al ON al.ArtistId = a.ArtistId "
+    "JOIN Track t ON t.AlbumId = al.AlbumId GROUP BY a.ArtistId ORDER BY 2 DESC LIMIT 20",
+]
+
+
+def throughput(execute, threads, total):
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(execute, QUERIES * 2))
+        start = time.perf_counter()
+        list(pool.map(execute, (QUERIES[i % len(QUERIES)] for i in range(total))))
+    return total / (time.perf_counter() - start)
+
+
+def main(db_path="Chinook.db", thread_counts=(1, 2, 4, 8), total=600):
+    db = SQLDatabase.from_uri(f"sqlite:///{db_path}")
+    pool = ReadOnlyConnectionPool(db_path, size=max(thread_counts))
+
+    def pooled(sql):
+        with pool.connection() as conn:
+            return run_query(conn, sql)
+
+    print(f"{'threads':>8} {'engine q/s':>12} {'pool q/s':>12} {'speedup':>8}")
+    results = []
+    for threads in thread_counts:
+        engine_qps = throughput(db.run, threads, total)
+        pool_qps = throughput(pooled, threads, total)
+        results.append({"threads": threads, "engine_qps": engine_qps, "pool_qps": pool_qps})
+        print(f"{threads:>8} {engine_qps:>12.1f} {pool_qps:>12.1f} {pool_qps / engine_qps:>7.2f}x")
+    print(f"pool: {pool.stats()}")
+    pool.close()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--db", default="Chinook.db")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--queries", type=int, default=600)
+    args = parser.parse_args()
+    main(args.db, tuple(args.threads), args.queries)
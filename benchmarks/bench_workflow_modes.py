@@ -0,0 +1,70 @@
+"""
+    Latency and LLM-call count of the "tools" and "direct" workflow modes.
+
+    Run from the repository root:  python -m benchmarks.bench_workflow_modes
+    Uses FakeChatModel with a simulated per-call latency and FakeEmbeddings over a
+    temporary chroma collection, so it runs offline.
+"""
+import os
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+os.environ.setdefault("CHECKPOINT_BACKEND", "memory")
+
+from langchain.globals import set_debug
+from langchain_chroma import Chroma
+
+import agentic
+from fakes import FakeChatModel, FakeEmbeddings
+from retrieval import CachedRetriever
+
+QUESTIONS = [
+    "What was the company revenue in FY25?",
+    "How did the JLR segment perform?",
+    "What are the company's key risks?",
+    "Summarise the report's outlook",
+]
+
+
+def fake_retriever(directory):
+    embeddings = FakeEmbeddings()
+    vectordb = Chroma(embedding_function=embeddings, persist_directory=directory, collection_name="rag")
+    vectordb.add_texts([f"Report paragraph {i}: revenue, profit and segment figures." for i in range(50)])
+    return CachedRetriever(vectordb, embeddings, persist_directory=directory)
+
+
+def run_mode(mode, latency, repeat):
+    llm = FakeChatModel(latency=latency)
+    registry = agentic.AgentRegistry(llm=llm, local_router=False)
+    workflow = agentic.get_workflow(registry, mode=mode, draw_graph=False)
+    timings = []
+    for i in range(repeat):
+        for question in QUESTIONS:
+            start = time.perf_counter()
+            workflow.invoke({"messages": [("user", question)]}, config={"configurable": {"thread_id": f"{mode}-{i}-{question}"}})
+            timings.append((time.perf_counter() - start) * 1000)
+    return {
+        "mode": mode,
+        "questions": len(timings),
+        "llm_calls_per_question": llm.calls / len(timings),
+        "latency_ms_mean": statistics.mean(timings),
+        "latency_ms_p95": sorted(timings)[int(len(timings) * 0.95) - 1],
+    }
+
+
+def main(latency=0.05, repeat=3):
+    set_debug(False)
+    with tempfile.TemporaryDirectory() as directory:
+        agentic.cached_retriever = fake_retriever(directory)
+        results = [run_mode(mode, latency, repeat) for mode in agentic.WORKFLOW_MODES]
+    for result in results:
+        print(f"{result['mode']:>6}: {result['llm_calls_per_question']:.1f} LLM calls/question, "
+              f"mean {result['latency_ms_mean']:.1f} ms, p95 {result['latency_ms_p95']:.1f} ms "
+              f"(simulated {latency * 1000:.0f} ms per LLM call)")
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""
+    Offline component benchmark suite.
+
+    Every external model is replaced by a deterministic fake (FakeChatModel for
+    ChatOpenAI / init_chat_model, FakeEmbeddings for OpenAIEmbeddings), so only the
+    code this project owns is timed: splitting, chroma ingest/search, workflow build,
+    per-node overhead and sql_tool queries against Chinook.db.
+
+    Run from the repository root:
+        python -m benchmarks.run_benchmarks --output results.json
+        python -m benchmarks.run_benchmarks --compare results.json   # flags regressions
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+os.environ.setdefault("CHECKPOINT_BACKEND", "memory")
+
+from langchain.globals import set_debug
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_chroma import Chroma
+
+import agentic
+import vectorstore
+from chunking import StructuredChunker
+from fakes import FakeChatModel, FakeEmbeddings
+from retrieval import CachedRetriever
+
+
+def synthetic_pages(n_pages=40, seed_text=None):
+    paragraph = seed_text or (
+        "Tata Motors reported consolidated revenue of 4,39,695 crore in FY 2024-25. "
+        "The commercial vehicle segment grew while passenger vehicles remained flat. "
+        "Jaguar Land Rover delivered an EBIT margin of 8.5 percent for the year. "
+    )
+    return [
+        Document(page_content=f"Page {i}\n" + paragraph * 12, metadata={"source": "synthetic.pdf", "page": i})
+        for i in range(n_pages)
+    ]
+
+
+def measure(fn, repeat=5, warmup=1):
+    for _ in range(warmup):
+        fn()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        "runs": repeat,
+        "min_ms": round(timings[0], 4),
+        "mean_ms": round(statistics.mean(timings), 4),
+        "p95_ms": round(timings[max(0, math.ceil(len(timings) * 0.95) - 1)], 4),
+    }
+
+
+def bench_splitting():
+    pages = synthetic_pages()
+    chunker = StructuredChunker(compare_baseline=True)
+    chunker.split_documents(pages)
+    return {
+        "split_40_pages": measure(lambda: vectorstore.splitter.split_documents(pages)),
+        "structured_split_40_pages": measure(lambda: StructuredChunker().split_documents(pages)),
+        "structured_chunking_report": chunker.report(),
+    }
+
+
+def bench_chroma(directory):
+    embeddings = FakeEmbeddings()
+    chunks = vectorstore.splitter.split_documents(synthetic_pages())
+    counter = iter(range(10 ** 9))
+
+    def ingest():
+        vectordb = Chroma(embedding_function=embeddings, persist_directory=directory,
+                          collection_name=f"bench_{next(counter)}")
+        vectordb.add_documents(chunks)
+
+    vectordb = Chroma(embedding_function=embeddings, persist_directory=directory, collection_name="bench_search")
+    vectordb.add_documents(chunks)
+    retriever = CachedRetriever(vectordb, embeddings, persist_directory=directory)
+    questions = iter(f"revenue of segment {i}" for i in range(10 ** 9))
+    return {
+        "chroma_ingest_chunks": measure(ingest, repeat=3),
+        "chroma_search_k2": measure(lambda: vectordb.similarity_search("EBIT margin", k=2), repeat=20),
+        "cached_retriever_miss": measure(lambda: retriever.similarity_search(next(questions), k=2), repeat=20),
+        "cached_retriever_hit": measure(lambda: retriever.similarity_search("EBIT margin", k=2), repeat=20),
+        "chunks": len(chunks),
+    }
+
+
+def bench_workflow(directory):
+    embeddings = FakeEmbeddings()
+    vectordb = Chroma(embedding_function=embeddings, persist_directory=directory, collection_name="rag")
+    vectordb.add_documents(vectorstore.splitter.split_documents(synthetic_pages(5)))
+    agentic.cached_retriever = CachedRetriever(vectordb, embeddings, persist_directory=directory)
+    registry = agentic.AgentRegistry(llm=FakeChatModel(), local_router=False, embeddings=embeddings)
+
+    question = ("user", "What was the company revenue?")
+    tool_call = AIMessage(content="", tool_calls=[{"name": "pdf_chatter", "args": {"query": question[1]}, "id": "c1"}])
+    tool_result = ToolMessage(content="revenue context", name="pdf_chatter", tool_call_id="c1")
+    results = {
+        "get_workflow_tools": measure(lambda: agentic.get_workflow(registry, mode="tools", draw_graph=False)),
+        "get_workflow_direct": measure(lambda: agentic.get_workflow(registry, mode="direct", draw_graph=False)),
+        "node_boss": measure(lambda: agentic.node_1({"messages": [question]}, registry), repeat=20),
+        "node_2": measure(lambda: agentic.agent_2({"messages": [question, AIMessage(content="retreiveragent")]}, registry), repeat=20),
+        "node_tool": measure(lambda: agentic.tool_node({"messages": [question, tool_call]}, registry), repeat=20),
+        "node_final_answer": measure(lambda: agentic.final_answer({"messages": [question, tool_call, tool_result]}, registry), repeat=20),
+        "node_direct_answer": measure(lambda: agentic.direct_answer({"messages": [question, AIMessage(content="retreiveragent")]}, registry), repeat=20),
+    }
+    workflow = agentic.get_workflow(registry, mode="tools", draw_graph=False)
+    threads = iter(range(10 ** 9))
+    results["workflow_invoke_tools"] = measure(
+        lambda: workflow.invoke({"messages": [question]}, config={"configurable": {"thread_id": str(next(threads))}}),
+        repeat=20,
+    )
+    return results
+
+
+SQL_QUERIES = {
+    "sql_artists_limit": "SELECT * FROM Artist LIMIT 100;",
+    "sql_top_customers": (
+        "SELECT c.CustomerId, c.FirstName, c.LastName, SUM(i.Total) AS spent "
+        "FROM Customer c JOIN Invoice i ON i.CustomerId = c.CustomerId "
+        "GROUP BY c.CustomerId ORDER BY spent DESC LIMIT 10;"
+    ),
+    "sql_genre_sales": (
+        "SELECT g.Name, SUM(il.UnitPrice * il.Quantity) AS revenue FROM InvoiceLine il "
+        "JOIN Track t ON t.TrackId = il.TrackId JOIN Genre g ON g.GenreId = t.GenreId "
+        "GROUP BY g.Name ORDER BY revenue DESC;"
+    ),
+    "sql_invoice_lines_all": "SELECT * FROM InvoiceLine;",
+}
+
+
+def bench_sql():
+    import sql_agent
+
+    def uncached(query):
+        sql_agent.result_cache.clear()
+        return sql_agent.sql_tool.invoke(query)
+
+    results = {name: measure(lambda q=query: uncached(q), repeat=10) for name, query in SQL_QUERIES.items()}
+    results["sql_cached_hit"] = measure(lambda: sql_agent.sql_tool.invoke(SQL_QUERIES["sql_top_customers"]), repeat=10)
+    results["sql_usable_table_names"] = measure(sql_agent.db.get_usable_table_names, repeat=10)
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+
+def flatten(results):
+    flat = {}
+    for group, cases in results.items():
+        for name, value in cases.items():
+            if isinstance(value, dict) and "mean_ms" in value:
+                flat[f"{group}.{name}"] = value["mean_ms"]
+    return flat
+
+
+def compare(current, baseline, threshold):
+    """
+        Returns the cases whose mean got slower than `threshold` (ratio) against the baseline.
+    """
+    current_flat, baseline_flat = flatten(current["results"]), flatten(baseline["results"])
+    regressions = {}
+    for name, value in current_flat.items():
+        before = baseline_flat.get(name)
+        if before and value / before > threshold:
+            regressions[name] = {"baseline_ms": before, "current_ms": value, "ratio": round(value / before, 3)}
+    return regressions
+
+
+def run_all(groups=None):
+    set_debug(False)
+    suite = {"splitting": lambda d: bench_splitting(), "chroma": bench_chroma,
+             "workflow": bench_workflow, "sql": lambda d: bench_sql()}
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for name, bench in suite.items():
+            if groups and name not in groups:
+                continue
+            results[name] = bench(os.path.join(directory, name))
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline component benchmarks")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--compare", help="baseline JSON report to compare against")
+    parser.add_argument("--threshold", type=float, default=1.2, help="slowdown ratio reported as regression")
+    parser.add_argument("--only", nargs="*", help="subset of groups: splitting chroma workflow sql")
+    args = parser.parse_args(argv)
+
+    report = run_all(args.only)
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            report["regressions"] = compare(report, json.load(f), args.threshold)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+    return 1 if report.get("regressions") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,219 @@
+import asyncio
+import hashlib
+import os
+import random
+import sqlite3
+import threading
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+from metrics import metrics
+
+
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "embedding_cache.sqlite")
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+        On-disk cache of vectors keyed by (model, sha256(text)), stored in sqlite as float32 blobs.
+    """
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL, text_hash TEXT NOT NULL, vector BLOB NOT NULL,"
+            " PRIMARY KEY (model, text_hash))"
+        )
+        self._conn.commit()
+
+    def get_many(self, model: str, hashes: List[str]) -> Dict[str, List[float]]:
+        found = {}
+        with self._lock:
+            for start in range(0, len(hashes), 500):
+                part = hashes[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({','.join('?' * len(part))})",
+                    [model, *part],
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+        return found
+
+    def put_many(self, model: str, items: Dict[str, List[float]]):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector) VALUES (?, ?, ?)",
+                [(model, key, array("f", vector).tobytes()) for key, vector in items.items()],
+            )
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+
+class CachedEmbeddings(Embeddings):
+    """
+        Wraps an embedding backend with a persistent cache, size-bounded batching,
+        bounded concurrency and retry with exponential backoff. Only texts that are
+        not cached yet are sent to the backend. The async methods use the backend's async
+        API with the same batching, concurrency bound and retries.
+    """
+    def __init__(
+        self,
+        backend: Embeddings,
+        cache: Optional[EmbeddingCache] = None,
+        model: Optional[str] = None,
+        batch_size: int = 128,
+        max_batch_chars: int = 200_000,
+        max_concurrency: int = 4,
+        max_retries: int = 5,
+        backoff_base: float = 0.5,
+        backoff_max: float = 20.0,
+    ):
+        self.backend = backend
+        self.cache = cache if cache is not None else EmbeddingCache()
+        self.model = model or getattr(backend, "model", backend.__class__.__name__)
+        self.batch_size = batch_size
+        self.max_batch_chars = max_batch_chars
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.stats = {"hits": 0, "misses": 0, "batches": 0, "retries": 0}
+        self._stats_lock = threading.Lock()
+
+    def with_retries(self, max_retries: int) -> "CachedEmbeddings":
+        """
+            Same backend and cache with a different retry budget, for latency-sensitive callers.
+        """
+        return CachedEmbeddings(self.backend, self.cache, model=self.model, batch_size=self.batch_size,
+                                max_batch_chars=self.max_batch_chars, max_concurrency=self.max_concurrency,
+                                max_retries=max_retries, backoff_base=self.backoff_base,
+                                backoff_max=self.backoff_max)
+
+    def _count(self, key: str, value: int = 1):
+        with self._stats_lock:
+            self.stats[key] += value
+
+    def make_batches(self, texts: List[str]) -> List[List[str]]:
+        batches, current, current_chars = [], [], 0
+        for text in texts:
+            if current and (len(current) >= self.batch_size or current_chars + len(text) > self.max_batch_chars):
+                batches.append(current)
+                current, current_chars = [], 0
+            current.append(text)
+            current_chars += len(text)
+        if current:
+            batches.append(current)
+        return batches
+
+    def _backoff(self, attempt: int) -> float:
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return delay * random.uniform(0.5, 1.0)
+
+    def _embed_batch(self, batch: List[str]) -> List[List[float]]:
+        attempt = 0
+        while True:
+            try:
+                with metrics.timer("embedding_batch_seconds", model=self.model):
+                    vectors = self.backend.embed_documents(batch)
+                self._count("batches")
+                return vectors
+            except Exception:
+                metrics.inc("embedding_errors", model=self.model)
+                if attempt >= self.max_retries:
+                    raise
+                time.sleep(self._backoff(attempt))
+                attempt += 1
+                self._count("retries")
+
+    async def _aembed_batch(self, batch: List[str], semaphore: asyncio.Semaphore) -> List[List[float]]:
+        attempt = 0
+        async with semaphore:
+            while True:
+                try:
+                    with metrics.timer("embedding_batch_seconds", model=self.model):
+                        vectors = await self.backend.aembed_documents(batch)
+                    self._count("batches")
+                    return vectors
+                except Exception:
+                    metrics.inc("embedding_errors", model=self.model)
+                    if attempt >= self.max_retries:
+                        raise
+                    await asyncio.sleep(self._backoff(attempt))
+                    attempt += 1
+                    self._count("retries")
+
+    def _lookup(self, texts: List[str]):
+        """
+            Hashes of `texts`, the cached vectors among them and the texts still to embed.
+        """
+        hashes = [text_hash(text) for text in texts]
+        vectors = self.cache.get_many(self.model, list(set(hashes)))
+        missing = {}
+        for key, text in zip(hashes, texts):
+            if key not in vectors:
+                missing.setdefault(key, text)
+        hits = len(texts) - sum(1 for key in hashes if key in missing)
+        self._count("hits", hits)
+        self._count("misses", len(missing))
+        metrics.inc("embedding_cache", hits, result="hit")
+        metrics.inc("embedding_cache", len(missing), result="miss")
+        return hashes, vectors, missing
+
+    @staticmethod
+    def _fresh(batches: List[List[str]], results: List[List[List[float]]]) -> Dict[str, List[float]]:
+        fresh = {}
+        for batch, batch_vectors in zip(batches, results):
+            for text, vector in zip(batch, batch_vectors):
+                fresh[text_hash(text)] = vector
+        return fresh
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        hashes, vectors, missing = self._lookup(texts)
+        if missing:
+            batches = self.make_batches(list(missing.values()))
+            if len(batches) == 1 or self.max_concurrency <= 1:
+                results = [self._embed_batch(batch) for batch in batches]
+            else:
+                with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(batches))) as pool:
+                    results = list(pool.map(self._embed_batch, batches))
+            fresh = self._fresh(batches, results)
+            self.cache.put_many(self.model, fresh)
+            vectors.update(fresh)
+        return [vectors[key] for key in hashes]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        # sqlite reads and commits stay off the event loop
+        hashes, vectors, missing = await asyncio.to_thread(self._lookup, texts)
+        if missing:
+            batches = self.make_batches(list(missing.values()))
+            semaphore = asyncio.Semaphore(max(1, self.max_concurrency))
+            results = await asyncio.gather(*(self._aembed_batch(batch, semaphore) for batch in batches))
+            fresh = self._fresh(batches, results)
+            await asyncio.to_thread(self.cache.put_many, self.model, fresh)
+            vectors.update(fresh)
+        return [vectors[key] for key in hashes]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+
+def cached_openai_embeddings(model: str = "text-embedding-3-large", **kwargs) -> CachedEmbeddings:
+    from langchain_openai import OpenAIEmbeddings
+    return CachedEmbeddings(OpenAIEmbeddings(model=model), model=model, **kwargs)
@@ -0,0 +1,203 @@
+import asyncio
+import copy
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Optional
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import CheckpointTuple, get_checkpoint_metadata
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+
+CHECKPOINT_PATH = os.getenv("CHECKPOINT_PATH", "checkpoints.sqlite")
+CHECKPOINT_TTL_SECONDS = float(os.getenv("CHECKPOINT_TTL_SECONDS", str(7 * 24 * 3600)))
+CHECKPOINT_MAX_THREADS = int(os.getenv("CHECKPOINT_MAX_THREADS", "10000"))
+
+
+class BoundedSqliteSaver(SqliteSaver):
+    """
+        SQLite checkpointer that survives restarts and stays bounded:
+        - only the last `keep_checkpoints` checkpoints of a thread are kept,
+        - threads idle for longer than `ttl_seconds` are deleted,
+        - beyond `max_threads` the least recently used threads are deleted,
+        - the latest checkpoint of recently used threads is served from an in-process
+          LRU of `hot_cache_size` entries, so process memory does not depend on the
+          number of threads ever opened. Entries are deep copies because graph nodes
+          mutate the state they receive.
+        Async methods run the sync ones in a worker thread so `ainvoke` works as well.
+    """
+    def __init__(self, path: str = CHECKPOINT_PATH, ttl_seconds: float = CHECKPOINT_TTL_SECONDS,
+                 max_threads: int = CHECKPOINT_MAX_THREADS, hot_cache_size: int = 256,
+                 keep_checkpoints: int = 5, evict_every: int = 100):
+        conn = sqlite3.connect(path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        super().__init__(conn)
+        self.setup()
+        with self.cursor() as cur:
+            cur.execute(
+                "CREATE TABLE IF NOT EXISTS thread_activity (thread_id TEXT PRIMARY KEY, last_access REAL NOT NULL)"
+            )
+        self.ttl_seconds = ttl_seconds
+        self.max_threads = max_threads
+        self.hot_cache_size = hot_cache_size
+        self.keep_checkpoints = keep_checkpoints
+        self.evict_every = evict_every
+        self.stats = {"hot_hits": 0, "hot_misses": 0, "evicted_threads": 0}
+        self._hot = OrderedDict()
+        self._hot_lock = threading.Lock()
+        self._puts = 0
+
+    # hot cache of the latest checkpoint per thread
+    def _hot_key(self, config: RunnableConfig) -> Optional[str]:
+        configurable = config.get("configurable", {})
+        if configurable.get("checkpoint_id") or configurable.get("checkpoint_ns", ""):
+            return None
+        return str(configurable.get("thread_id"))
+
+    def _invalidate(self, thread_id: str):
+        with self._hot_lock:
+            self._hot.pop(str(thread_id), None)
+
+    def _remember(self, key: str, result: CheckpointTuple):
+        with self._hot_lock:
+            self._hot[key] = result
+            self._hot.move_to_end(key)
+            while len(self._hot) > self.hot_cache_size:
+                self._hot.popitem(last=False)
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        key = self._hot_key(config)
+        if key is not None:
+            with self._hot_lock:
+                cached = self._hot.get(key)
+                if cached is not None:
+                    self._hot.move_to_end(key)
+                    self.stats["hot_hits"] += 1
+                    return copy.deepcopy(cached)
+                self.stats["hot_misses"] += 1
+        result = super().get_tuple(config)
+        if key is not None and result is not None:
+            self._remember(key, copy.deepcopy(result))
+        return result
+
+    def put(self, config: RunnableConfig, checkpoint, metadata, new_versions) -> RunnableConfig:
+        thread_id = str(config["configurable"]["thread_id"])
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        saved = super().put(config, checkpoint, metadata, new_versions)
+        if checkpoint_ns:
+            self._invalidate(thread_id)
+        else:
+            parent_id = config["configurable"].get("checkpoint_id")
+            parent_config = (
+                {"configurable": {"thread_id": thread_id, "checkpoint_ns": "", "checkpoint_id": parent_id}}
+                if parent_id else None
+            )
+            self._remember(thread_id, CheckpointTuple(
+                config=saved,
+                checkpoint=copy.deepcopy(checkpoint),
+                metadata=get_checkpoint_metadata(config, metadata),
+                parent_config=parent_config,
+                pending_writes=[],
+            ))
+        self._after_put(thread_id, checkpoint_ns)
+        return saved
+
+    def put_writes(self, config: RunnableConfig, writes, task_id: str, task_path: str = "") -> None:
+        self._invalidate(config["configurable"]["thread_id"])
+        super().put_writes(config, writes, task_id, task_path)
+
+    def delete_thread(self, thread_id: str) -> None:
+        self._invalidate(thread_id)
+        super().delete_thread(thread_id)
+        with self.cursor() as cur:
+            cur.execute("DELETE FROM thread_activity WHERE thread_id = ?", (str(thread_id),))
+
+    # retention
+    def _after_put(self, thread_id: str, checkpoint_ns: str):
+        with self.cursor() as cur:
+            cur.execute(
+                "INSERT OR REPLACE INTO thread_activity (thread_id, last_access) VALUES (?, ?)",
+                (thread_id, time.time()),
+            )
+            keep = (
+                "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                "ORDER BY checkpoint_id DESC LIMIT ?"
+            )
+            params = (thread_id, checkpoint_ns, thread_id, checkpoint_ns, self.keep_checkpoints)
+            cur.execute(
+                f"DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id NOT IN ({keep})",
+                params,
+            )
+            cur.execute(
+                f"DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id NOT IN ({keep})",
+                params,
+            )
+        self._puts += 1
+        if self._puts % self.evict_every == 0:
+            self.evict()
+
+    def evict(self) -> int:
+        """
+            Deletes threads idle for longer than the TTL, then the least recently used
+            threads above `max_threads`. Returns the number of deleted threads.
+        """
+        with self.cursor() as cur:
+            cur.execute(
+                "SELECT thread_id FROM thread_activity WHERE last_access < ?",
+                (time.time() - self.ttl_seconds,),
+            )
+            expired = [row[0] for row in cur.fetchall()]
+            cur.execute("SELECT COUNT(*) FROM thread_activity")
+            overflow = cur.fetchone()[0] - len(expired) - self.max_threads
+            if overflow > 0:
+                cur.execute(
+                    "SELECT thread_id FROM thread_activity WHERE last_access >= ? ORDER BY last_access LIMIT ?",
+                    (time.time() - self.ttl_seconds, overflow),
+                )
+                expired += [row[0] for row in cur.fetchall()]
+        for thread_id in expired:
+            self.delete_thread(thread_id)
+        self.stats["evicted_threads"] += len(expired)
+        return len(expired)
+
+    def thread_count(self) -> int:
+        with self.cursor() as cur:
+            cur.execute("SELECT COUNT(*) FROM thread_activity")
+            return cur.fetchone()[0]
+
+    def info(self) -> dict:
+        return {**self.stats, "threads": self.thread_count(), "hot_entries": len(self._hot)}
+
+    # async versions, backed by the thread-safe sync implementation
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config: Optional[RunnableConfig], *, filter: Optional[dict] = None,
+                    before: Optional[RunnableConfig] = None, limit: Optional[int] = None) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for item in items:
+            yield item
+
+    async def aput(self, config: RunnableConfig, checkpoint, metadata, new_versions) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config: RunnableConfig, writes, task_id: str, task_path: str = "") -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+
+def default_checkpointer() -> Any:
+    """
+        CHECKPOINT_BACKEND=sqlite (default) persists threads in CHECKPOINT_PATH,
+        CHECKPOINT_BACKEND=memory keeps the previous unbounded InMemorySaver.
+    """
+    if os.getenv("CHECKPOINT_BACKEND", "sqlite") == "memory":
+        from langgraph.checkpoint.memory import InMemorySaver
+        return InMemorySaver()
+    return BoundedSqliteSaver()
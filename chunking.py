@@ -0,0 +1,248 @@
+import hashlib
+import os
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import Iterable, Iterator, List, Tuple
+
+from langchain_core.documents import Document
+
+
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "400"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "60"))
+TOKEN_ENCODING = "cl100k_base"  # tokenizer of text-embedding-3-*
+FURNITURE_SAMPLE_PAGES = 30
+FURNITURE_EDGE_LINES = 3
+FURNITURE_MIN_SHARE = 0.5
+FURNITURE_MAX_CHARS = 120
+SIMHASH_MAX_DISTANCE = 3
+# also split every page with the old 1024/512 character splitter and report the savings
+CHUNK_BASELINE = os.getenv("CHUNK_BASELINE", "0") == "1"
+
+# every alternative is linear: words are separated by mandatory whitespace, so a long
+# unspaced line (common pypdf output) cannot be split into words in many ways
+HEADING = re.compile(r"^(\d+(\.\d+)*\.?\s+\S.*|[A-Z][A-Z0-9&,'\-\s]{3,}|[A-Z][\w&'\-]*(?:\s+[A-Z][\w&'\-]*){0,7})$")
+NUMBER = re.compile(r"[-(]?\d[\d,]*(\.\d+)?%?\)?")
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(TOKEN_ENCODING)
+    except Exception:
+        return None
+
+
+def count_tokens(text: str) -> int:
+    encoding = _encoding()
+    if encoding is None:
+        return max(1, len(text) // 4)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def furniture_key(line: str) -> str:
+    """
+        Line normalised so "Page 12 | Annual Report" and "Page 13 | Annual Report" match.
+    """
+    return re.sub(r"\d+", "#", line.strip().lower())
+
+
+def edge_lines(lines: List[str]) -> List[int]:
+    """
+        Positions of the first and last non-empty lines that may hold page furniture: up to
+        FURNITURE_EDGE_LINES each, fewer on short pages so body text is never a candidate.
+    """
+    filled = [i for i, line in enumerate(lines) if line.strip()]
+    count = min(FURNITURE_EDGE_LINES, len(filled) // 4)
+    return filled[:count] + filled[len(filled) - count:] if count else []
+
+
+def is_heading(line: str) -> bool:
+    line = line.strip()
+    return 2 < len(line) <= 80 and not line.endswith((".", ",", ";", ":")) and bool(HEADING.match(line))
+
+
+def is_table_row(line: str) -> bool:
+    return len(NUMBER.findall(line)) >= 3 or line.count("\t") >= 2 or len(re.findall(r"\S\s{3,}\S", line)) >= 2
+
+
+def shingles(text: str, size: int = 3) -> List[str]:
+    words = re.findall(r"\w+", text.lower())
+    if len(words) <= size:
+        return [" ".join(words)]
+    return [" ".join(words[i:i + size]) for i in range(len(words) - size + 1)]
+
+
+def simhash(text: str) -> int:
+    weights = [0] * 64
+    for shingle, count in Counter(shingles(text)).items():
+        value = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(64):
+            weights[bit] += count if value >> bit & 1 else -count
+    return sum(1 << bit for bit in range(64) if weights[bit] > 0)
+
+
+class NearDuplicateFilter:
+    """
+        SimHash fingerprints bucketed by four 16-bit bands: two fingerprints within
+        SIMHASH_MAX_DISTANCE bits share at least one band, so only those buckets are compared.
+    """
+    def __init__(self, max_distance: int = SIMHASH_MAX_DISTANCE):
+        self.max_distance = max_distance
+        self.bands = [dict() for _ in range(4)]
+
+    def seen(self, text: str) -> bool:
+        """
+            True if a near-duplicate was added before; otherwise remembers the text.
+        """
+        fingerprint = simhash(text)
+        keys = [(fingerprint >> (16 * band)) & 0xFFFF for band in range(4)]
+        for band, key in enumerate(keys):
+            for other in self.bands[band].get(key, ()):
+                if bin(fingerprint ^ other).count("1") <= self.max_distance:
+                    return True
+        for band, key in enumerate(keys):
+            self.bands[band].setdefault(key, []).append(fingerprint)
+        return False
+
+
+class StructuredChunker:
+    """
+        Page text -> chunks measured in embedding tokens. Recurring headers/footers are
+        learned from the first pages and stripped, text is split into heading, table and
+        paragraph blocks and packed so a heading starts a new chunk and tables stay whole
+        where they fit, and near-duplicate chunks are dropped before they are embedded.
+
+        With compare_baseline=True (or CHUNK_BASELINE=1) `stats` also compares against the
+        previous 1024/512 character splitter on the same pages; that costs a second split
+        and token count per page, so ingestion leaves it off.
+    """
+    def __init__(self, chunk_tokens: int = CHUNK_TOKENS, overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+                 sample_pages: int = FURNITURE_SAMPLE_PAGES, dedupe: bool = True,
+                 compare_baseline: bool = CHUNK_BASELINE):
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        self.sample_pages = sample_pages
+        self.dedupe = dedupe
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
+        self.fallback = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_tokens, chunk_overlap=overlap_tokens, length_function=count_tokens
+        )
+        self.baseline = None
+        self.stats = {"pages": 0, "furniture_lines": 0, "chunks": 0, "duplicates": 0, "tokens": 0}
+        if compare_baseline:
+            self.baseline = RecursiveCharacterTextSplitter(chunk_size=1024, chunk_overlap=512, length_function=len)
+            self.stats.update(baseline_chunks=0, baseline_tokens=0)
+
+    def learn_furniture(self, pages: List[Document]) -> set:
+        counts = Counter()
+        for page in pages:
+            lines = page.page_content.splitlines()
+            counts.update({furniture_key(lines[i]) for i in edge_lines(lines) if len(lines[i].strip()) <= FURNITURE_MAX_CHARS})
+        minimum = max(3, int(len(pages) * FURNITURE_MIN_SHARE))
+        return {key for key, count in counts.items() if count >= minimum}
+
+    def strip_furniture(self, text: str, furniture: set) -> str:
+        """
+            Drops learned furniture lines at the page edges; body text is never touched.
+        """
+        lines = text.splitlines()
+        edges = set(edge_lines(lines))
+        kept = [line for i, line in enumerate(lines)
+                if i not in edges or len(line.strip()) > FURNITURE_MAX_CHARS or furniture_key(line) not in furniture]
+        self.stats["furniture_lines"] += len(lines) - len(kept)
+        return "\n".join(kept)
+
+    def blocks(self, text: str) -> List[Tuple[str, str]]:
+        """
+            (kind, text) blocks with kind heading, table or paragraph.
+        """
+        blocks = []
+        for line in text.splitlines():
+            if not line.strip():
+                if blocks and blocks[-1][0] == "paragraph":
+                    blocks.append(("break", ""))
+                continue
+            kind = "heading" if is_heading(line) else "table" if is_table_row(line) else "paragraph"
+            if blocks and blocks[-1][0] == kind and kind != "heading":
+                blocks[-1] = (kind, blocks[-1][1] + "\n" + line)
+            else:
+                blocks.append((kind, line))
+        return [block for block in blocks if block[0] != "break"]
+
+    def pack(self, text: str) -> List[str]:
+        chunks, current, current_tokens = [], [], 0
+        for kind, block in self.blocks(text):
+            tokens = count_tokens(block)
+            if tokens > self.chunk_tokens:
+                if current:
+                    chunks.append("\n".join(current))
+                chunks.extend(self.fallback.split_text(block))
+                current, current_tokens = [], 0
+                continue
+            starts_section = kind == "heading" and current_tokens >= self.chunk_tokens // 4
+            if current and (current_tokens + tokens > self.chunk_tokens or starts_section):
+                chunks.append("\n".join(current))
+                overlap = current[-1] if not starts_section and count_tokens(current[-1]) <= self.overlap_tokens else None
+                current = [overlap] if overlap else []
+                current_tokens = count_tokens(overlap) if overlap else 0
+            current.append(block)
+            current_tokens += tokens
+        if current:
+            chunks.append("\n".join(current))
+        return chunks
+
+    def split_page(self, page: Document, furniture: set, seen: NearDuplicateFilter) -> List[Document]:
+        self.stats["pages"] += 1
+        if self.baseline is not None:
+            for chunk in self.baseline.split_text(page.page_content):
+                self.stats["baseline_chunks"] += 1
+                self.stats["baseline_tokens"] += count_tokens(chunk)
+        documents = []
+        for text in self.pack(self.strip_furniture(page.page_content, furniture)):
+            if not text.strip():
+                continue
+            if seen is not None and seen.seen(text):
+                self.stats["duplicates"] += 1
+                continue
+            self.stats["chunks"] += 1
+            self.stats["tokens"] += count_tokens(text)
+            documents.append(Document(page_content=text, metadata=dict(page.metadata)))
+        return documents
+
+    def split_pages(self, pages: Iterable[Document]) -> Iterator[Tuple[int, List[Document]]]:
+        """
+            Yields (page_number, chunks) in page order. Only the first `sample_pages` pages
+            are buffered (to learn the page furniture), so pages can be streamed.
+        """
+        seen = NearDuplicateFilter() if self.dedupe else None
+        buffered, furniture = [], None
+        for page_number, page in enumerate(pages):
+            if furniture is None:
+                buffered.append(page)
+                if len(buffered) < self.sample_pages:
+                    continue
+                furniture = self.learn_furniture(buffered)
+                for number, sample in enumerate(buffered):
+                    yield number, self.split_page(sample, furniture, seen)
+                buffered = []
+                continue
+            yield page_number, self.split_page(page, furniture, seen)
+        if furniture is None:
+            furniture = self.learn_furniture(buffered)
+            for number, sample in enumerate(buffered):
+                yield number, self.split_page(sample, furniture, seen)
+
+    def split_documents(self, pages: List[Document]) -> List[Document]:
+        return [chunk for _, chunks in self.split_pages(pages) for chunk in chunks]
+
+    def report(self) -> dict:
+        stats = dict(self.stats)
+        if self.baseline is None:
+            return stats
+        stats["chunks_saved"] = stats["baseline_chunks"] - stats["chunks"]
+        stats["tokens_saved"] = stats["baseline_tokens"] - stats["tokens"]
+        if stats["baseline_tokens"]:
+            stats["tokens_saved_pct"] = round(100 * stats["tokens_saved"] / stats["baseline_tokens"], 1)
+        return stats
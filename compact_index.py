@@ -0,0 +1,198 @@
+import asyncio
+import json
+import os
+import shutil
+import threading
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+
+COMPACT_INDEX_DIR = "compact_index"
+# leading dimensions kept (text-embedding-3 vectors stay usable when shortened); 0 keeps all
+COMPACT_DIM = int(os.getenv("COMPACT_DIM", "512"))
+COMPACT_QUANTIZE = os.getenv("COMPACT_QUANTIZE", "1") == "1"
+# top k * COMPACT_RERANK candidates are rescored with the full vectors; 0 disables the rerank
+COMPACT_RERANK = int(os.getenv("COMPACT_RERANK", "4"))
+SCORE_BATCH = 16384
+CURRENT_FILE = "CURRENT"
+
+
+def compact_index_path(persist_directory: str = "chromadb") -> str:
+    return os.path.join(persist_directory, COMPACT_INDEX_DIR)
+
+
+def current_version(directory: str) -> Optional[str]:
+    """
+        Directory of the live build, named by the CURRENT pointer file.
+    """
+    try:
+        with open(os.path.join(directory, CURRENT_FILE), "r", encoding="utf-8") as f:
+            name = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return os.path.join(directory, name) if name else None
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def quantize_int8(matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+        Symmetric per-row int8 quantization: row ~= codes * scale.
+    """
+    scales = np.abs(matrix).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+class CompactVectorIndex:
+    """
+        Cosine search over embeddings truncated to `dim` leading dimensions and optionally
+        int8 quantized, stored as .npy files opened with mmap so only the pages touched are
+        resident. Scoring is one matrix-vector product per block of SCORE_BATCH rows followed
+        by argpartition; the best k * rerank candidates can be rescored against the full
+        precision vectors (also memory-mapped, only those rows are read).
+
+        Every build is written to a fresh version directory and published by atomically
+        replacing the CURRENT pointer, so a process that has the previous arrays mapped
+        keeps reading complete, consistent files.
+    """
+    def __init__(self, directory: str, rerank: int = COMPACT_RERANK):
+        self.directory = directory
+        self.rerank = rerank
+        self.version_directory = current_version(directory)
+        if self.version_directory is None:
+            raise FileNotFoundError(f"No compact index in '{directory}'")
+        version_directory = self.version_directory
+        with open(os.path.join(version_directory, "documents.json"), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        self.ids = data["ids"]
+        self.texts = data["texts"]
+        self.metadatas = data["metadatas"]
+        self.dim = data["dim"]
+        self.quantized = data["quantized"]
+        self.vectors = np.load(os.path.join(version_directory, "vectors.npy"), mmap_mode="r")
+        self.scales = np.load(os.path.join(version_directory, "scales.npy")) if self.quantized else None
+        full_path = os.path.join(version_directory, "full.npy")
+        self.full = np.load(full_path, mmap_mode="r") if os.path.exists(full_path) else None
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, directory: str, ids: List[str], embeddings, texts: List[str], metadatas: List[dict],
+              dim: int = COMPACT_DIM, quantize: bool = COMPACT_QUANTIZE, keep_full: bool = True,
+              rerank: int = COMPACT_RERANK) -> "CompactVectorIndex":
+        full = normalize_rows(np.asarray(embeddings, dtype=np.float32).reshape(len(ids), -1))
+        dim = min(dim or full.shape[1], full.shape[1])
+        truncated = normalize_rows(full[:, :dim].copy())
+        name = f"v{time.time_ns()}"
+        version_directory = os.path.join(directory, name)
+        os.makedirs(version_directory)
+        if quantize:
+            codes, scales = quantize_int8(truncated)
+            np.save(os.path.join(version_directory, "vectors.npy"), codes)
+            np.save(os.path.join(version_directory, "scales.npy"), scales)
+        else:
+            np.save(os.path.join(version_directory, "vectors.npy"), truncated.astype(np.float16))
+        if keep_full and rerank:
+            np.save(os.path.join(version_directory, "full.npy"), full)
+        with open(os.path.join(version_directory, "documents.json"), "w", encoding="utf-8") as f:
+            json.dump({"ids": list(ids), "texts": list(texts), "metadatas": [m or {} for m in metadatas],
+                       "dim": dim, "quantized": quantize}, f)
+        tmp_path = os.path.join(directory, CURRENT_FILE + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(name)
+        os.replace(tmp_path, os.path.join(directory, CURRENT_FILE))
+        remove_old_versions(directory, keep=name)
+        return cls(directory, rerank=rerank)
+
+    @classmethod
+    def from_collection(cls, vectordb, directory: str, **kwargs) -> "CompactVectorIndex":
+        """
+            Builds the index from the embeddings already stored in a chroma collection.
+        """
+        data = vectordb.get(include=["embeddings", "documents", "metadatas"])
+        embeddings = data["embeddings"] if len(data["ids"]) else np.zeros((0, 1), dtype=np.float32)
+        return cls.build(directory, data["ids"], embeddings, data["documents"], data["metadatas"], **kwargs)
+
+    def search(self, vector, k: int = 4) -> List[Tuple[int, float]]:
+        """
+            (row, cosine score) of the k best rows.
+        """
+        if not self.ids:
+            return []
+        query = np.asarray(vector, dtype=np.float32)
+        compact_query = query[: self.dim]
+        compact_query = compact_query / (np.linalg.norm(compact_query) or 1.0)
+        candidates = min(len(self.ids), k * self.rerank if self.rerank and self.full is not None else k)
+        scores = np.empty(len(self.ids), dtype=np.float32)
+        for start in range(0, len(self.ids), SCORE_BATCH):
+            block = np.asarray(self.vectors[start:start + SCORE_BATCH], dtype=np.float32)
+            scores[start:start + len(block)] = block @ compact_query
+        if self.scales is not None:
+            scores *= self.scales
+        top = np.argpartition(-scores, candidates - 1)[:candidates]
+        if candidates > k:
+            rows = np.sort(top)
+            full_query = query / (np.linalg.norm(query) or 1.0)
+            rescored = np.asarray(self.full[rows], dtype=np.float32) @ full_query
+            order = np.argsort(-rescored)[:k]
+            return [(int(rows[i]), float(rescored[i])) for i in order]
+        top = top[np.argsort(-scores[top])][:k]
+        return [(int(i), float(scores[i])) for i in top]
+
+    def get_document(self, row: int) -> Document:
+        return Document(id=self.ids[row], page_content=self.texts[row], metadata=self.metadatas[row])
+
+    def similarity_search_by_vector(self, embedding, k: int = 4) -> List[Document]:
+        return [self.get_document(row) for row, _ in self.search(embedding, k)]
+
+    async def asimilarity_search_by_vector(self, embedding, k: int = 4) -> List[Document]:
+        return await asyncio.to_thread(self.similarity_search_by_vector, embedding, k)
+
+    def memory_bytes(self) -> dict:
+        """
+            Bytes of the search structures; the full vectors are only read for reranking.
+        """
+        return {
+            "vectors": int(self.vectors.nbytes),
+            "scales": int(self.scales.nbytes) if self.scales is not None else 0,
+            "full_on_disk": int(self.full.nbytes) if self.full is not None else 0,
+        }
+
+
+def remove_old_versions(directory: str, keep: str):
+    """
+        Deletes superseded builds. Readers that still map their files keep them alive
+        (unlinked files stay readable on POSIX); where deletion fails the build is left
+        for the next run to remove.
+    """
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if name != keep and name.startswith("v") and os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+_build_lock = threading.Lock()
+
+
+def load_compact_index(persist_directory: str = "chromadb", vectordb=None) -> Optional[CompactVectorIndex]:
+    """
+        Opens the compact index next to the chroma collection, building it from the
+        collection first when it does not exist yet.
+    """
+    directory = compact_index_path(persist_directory)
+    with _build_lock:
+        if current_version(directory) is not None:
+            return CompactVectorIndex(directory)
+        if vectordb is None:
+            return None
+        return CompactVectorIndex.from_collection(vectordb, directory)
@@ -0,0 +1,129 @@
+import math
+import os
+import re
+from collections import Counter
+from typing import List
+
+from langchain_core.documents import Document
+
+from chunking import count_tokens
+from lexical_index import tokenize
+from metrics import metrics
+
+
+# candidates fetched from the retriever, chunks kept after MMR and token budget of the context
+CONTEXT_FETCH_K = int(os.getenv("CONTEXT_FETCH_K", "8"))
+CONTEXT_K = int(os.getenv("CONTEXT_K", "4"))
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "600"))
+CONTEXT_MMR_LAMBDA = float(os.getenv("CONTEXT_MMR_LAMBDA", "0.6"))
+CONTEXT_COMPRESSION = os.getenv("CONTEXT_COMPRESSION", "1") == "1"
+
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9(\"'])|\n+")
+
+
+def term_vector(text: str) -> Counter:
+    return Counter(tokenize(text))
+
+
+def cosine(a: Counter, b: Counter) -> float:
+    if not a or not b:
+        return 0.0
+    dot = sum(count * b[term] for term, count in a.items() if term in b)
+    return dot / (math.sqrt(sum(v * v for v in a.values())) * math.sqrt(sum(v * v for v in b.values())))
+
+
+def mmr(query: Counter, vectors: List[Counter], k: int, lambda_mult: float = CONTEXT_MMR_LAMBDA) -> List[int]:
+    """
+        Maximal marginal relevance over term vectors. Relevance blends the retriever rank
+        with the query overlap, so purely semantic hits are not discarded.
+    """
+    relevance = [0.5 / (1 + rank) + 0.5 * cosine(query, vector) for rank, vector in enumerate(vectors)]
+    selected, remaining = [], list(range(len(vectors)))
+    while remaining and len(selected) < k:
+        def score(i):
+            redundancy = max((cosine(vectors[i], vectors[j]) for j in selected), default=0.0)
+            return lambda_mult * relevance[i] - (1 - lambda_mult) * redundancy
+        best = max(remaining, key=score)
+        selected.append(best)
+        remaining.remove(best)
+    return selected
+
+
+def split_sentences(text: str) -> List[str]:
+    return [sentence.strip() for sentence in SENTENCE_BOUNDARY.split(text) if len(sentence.strip()) > 1]
+
+
+def citation(number: int, document: Document) -> str:
+    source = os.path.basename(str(document.metadata.get("source", "document")))
+    page = document.metadata.get("page")
+    return f"[{number}] {source}" + (f" p.{int(page) + 1}" if isinstance(page, (int, float)) else "")
+
+
+def as_documents(docs) -> List[Document]:
+    if isinstance(docs, (str, Document)):
+        docs = [docs]
+    return [doc if isinstance(doc, Document) else Document(page_content=str(doc)) for doc in docs or []]
+
+
+def compress_context(question: str, docs, k: int = CONTEXT_K, token_budget: int = CONTEXT_TOKEN_BUDGET,
+                     lambda_mult: float = CONTEXT_MMR_LAMBDA) -> str:
+    """
+        Over-fetched documents -> compact cited context: exact duplicates are dropped, MMR
+        keeps k non-redundant chunks, then the sentences sharing the most (idf weighted) terms with the question are
+        added greedily until the token budget is spent, skipping sentences already taken
+        from an overlapping chunk. Output keeps document and sentence order:
+
+            [1] report.pdf p.12: sentence ... sentence
+    """
+    documents, contents = [], set()
+    for doc in as_documents(docs):
+        if doc.page_content not in contents:
+            contents.add(doc.page_content)
+            documents.append(doc)
+    if not documents:
+        return ""
+    query = term_vector(question or "")
+    chosen = mmr(query, [term_vector(doc.page_content) for doc in documents], k, lambda_mult)
+
+    sentences = []
+    for position, index in enumerate(chosen):
+        for order, sentence in enumerate(split_sentences(documents[index].page_content)):
+            sentences.append({"doc": position, "order": order, "text": sentence, "terms": set(tokenize(sentence))})
+    frequency = Counter(term for sentence in sentences for term in sentence["terms"])
+    idf = {term: math.log(1 + len(sentences) / count) for term, count in frequency.items()}
+    for sentence in sentences:
+        overlap = sentence["terms"] & set(query)
+        sentence["score"] = sum(idf[term] for term in overlap) / math.sqrt(len(sentence["terms"]) or 1)
+
+    ranked = sorted(sentences, key=lambda s: (-s["score"], s["doc"], s["order"]))
+    # without any term overlap (a purely semantic match) each chunk contributes its lead sentence
+    lexical_match = bool(ranked) and ranked[0]["score"] > 0
+    # the budget covers the whole context: citation prefixes, line breaks and separators too
+    prefix_tokens = [count_tokens(f"{citation(position + 1, documents[index])}: ") + 1
+                     for position, index in enumerate(chosen)]
+    separator_tokens = count_tokens(" ... ")
+    kept, seen, started, used = [], set(), set(), 0
+    for sentence in ranked:
+        key = re.sub(r"\W+", " ", sentence["text"].lower()).strip()
+        if key in seen:
+            continue
+        if sentence["score"] == 0 and (lexical_match or sentence["doc"] in started):
+            continue
+        overhead = separator_tokens if sentence["doc"] in started else prefix_tokens[sentence["doc"]]
+        tokens = count_tokens(sentence["text"]) + overhead
+        if used + tokens > token_budget:
+            continue
+        seen.add(key)
+        started.add(sentence["doc"])
+        kept.append(sentence)
+        used += tokens
+
+    lines = []
+    for position, index in enumerate(chosen):
+        parts = sorted((s for s in kept if s["doc"] == position), key=lambda s: s["order"])
+        if parts:
+            lines.append(f"{citation(len(lines) + 1, documents[index])}: " + " ... ".join(s["text"] for s in parts))
+    context = "\n".join(lines)
+    metrics.observe("context_tokens", count_tokens(context))
+    metrics.inc("context_tokens_saved", max(0, count_tokens(str(documents)) - count_tokens(context)))
+    return context
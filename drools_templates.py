@@ -0,0 +1,172 @@
+import re
+from typing import List, Optional
+from sql_results import QueryResult
+
+
+PACKAGE = "com.company.rules"
+NUMERIC_TYPES = ("INTEGER", "REAL")
+MAX_TOP_N = 100
+MAX_COMMENT_CHARS = 200
+
+
+def camel(name: str, upper: bool = False) -> str:
+    parts = [part for part in re.split(r"[^0-9A-Za-z]+", name) if part]
+    if not parts:
+        return "value"
+    text = "".join(part[:1].upper() + part[1:] for part in parts)
+    text = text[:1].upper() + text[1:] if upper else text[:1].lower() + text[1:]
+    return text if not text[:1].isdigit() else "_" + text
+
+
+def literal(value) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    text = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+    return f'"{text}"'
+
+
+def comment_text(text, max_chars: int = MAX_COMMENT_CHARS) -> str:
+    """
+        Single-line text for a // comment: a line break would end the comment and turn the
+        rest into DRL.
+    """
+    return re.sub(r"\s+", " ", str(text or "")).strip()[:max_chars]
+
+
+def rule_name(text: str, names: set) -> str:
+    """
+        Quoted-safe rule name, suffixed when needed so names stay unique in the package.
+    """
+    base = str(text).replace('"', "'").replace("\n", " ")[:120]
+    name, counter = base, 2
+    while name in names:
+        name = f"{base} #{counter}"
+        counter += 1
+    names.add(name)
+    return name
+
+
+def fact_type(sql: str) -> str:
+    """
+        Fact class named after the first table the query reads from.
+    """
+    match = re.search(r"\bfrom\s+\"?(\w+)", sql or "", re.IGNORECASE)
+    return camel(match.group(1), upper=True) if match else "Record"
+
+
+def detect_shape(result: QueryResult) -> Optional[str]:
+    """
+        "top_n" for ordered, limited results; "lookup" for key -> text value pairs;
+        "threshold" for an entity key with numeric measures; None otherwise.
+    """
+    if not result.rows or not result.columns:
+        return None
+    types = [column_type or "NULL" for column_type in result.types]
+    numeric = [i for i, column_type in enumerate(types) if column_type in NUMERIC_TYPES]
+    keys = [i for i in range(len(types)) if i not in numeric]
+    bare = (result.sql or "").lower()
+    if re.search(r"\border\s+by\b", bare) and re.search(r"\blimit\s+\d+", bare) \
+            and len(result.rows) <= MAX_TOP_N and not result.truncated:
+        return "top_n"
+    if len(result.columns) == 2 and types[1] not in NUMERIC_TYPES:
+        return "lookup"
+    if numeric and (keys or len(numeric) > 1):
+        return "threshold"
+    return None
+
+
+def key_and_measures(result: QueryResult):
+    types = [column_type or "NULL" for column_type in result.types]
+    numeric = [i for i, column_type in enumerate(types) if column_type in NUMERIC_TYPES]
+    keys = [i for i in range(len(types)) if i not in numeric]
+    if keys:
+        return keys[0], [i for i in numeric]
+    return numeric[0], numeric[1:]
+
+
+def header(shape: str, question: str, result: QueryResult, package: str, description: str = None) -> List[str]:
+    lines = [f"package {package};", "", "import com.company.model.*;", "",
+             f"// {comment_text(description or question)}",
+             f"// Generated from {len(result.rows)} SQL rows ({shape})"]
+    if result.truncated:
+        lines.append("// SQL result was truncated, rules cover only the rows shown")
+    lines.append("")
+    return lines
+
+
+def threshold_rules(result: QueryResult, fact: str, names: set) -> List[str]:
+    key, measures = key_and_measures(result)
+    key_field = camel(result.columns[key])
+    lines = []
+    for row in result.rows:
+        for measure in measures:
+            if row[measure] is None:
+                continue
+            field = camel(result.columns[measure])
+            lines += [
+                f'rule "{rule_name(f"{fact} {row[key]} {field} threshold", names)}"',
+                "    when",
+                f"        $f : {fact}({key_field} == {literal(row[key])}, {field} >= {literal(row[measure])})",
+                "    then",
+                f'        System.out.println("{fact} " + $f.get{camel(key_field, upper=True)}() + " reached {field} {row[measure]}");',
+                "end",
+                "",
+            ]
+    return lines
+
+
+def lookup_rules(result: QueryResult, fact: str, names: set) -> List[str]:
+    key_field = camel(result.columns[0])
+    value_field = camel(result.columns[1])
+    lines = []
+    for row in result.rows:
+        lines += [
+            f'rule "{rule_name(f"{fact} {row[0]} {value_field} lookup", names)}"',
+            "    when",
+            f"        $f : {fact}({key_field} == {literal(row[0])}, {value_field} == null)",
+            "    then",
+            f"        modify($f) {{ set{camel(value_field, upper=True)}({literal(row[1])}) }}",
+            f'        System.out.println("{fact} " + $f.get{camel(key_field, upper=True)}() + " {value_field} set");',
+            "end",
+            "",
+        ]
+    return lines
+
+
+def top_n_rules(result: QueryResult, fact: str, names: set) -> List[str]:
+    key, _ = key_and_measures(result)
+    key_field = camel(result.columns[key])
+    lines = []
+    for rank, row in enumerate(result.rows, start=1):
+        lines += [
+            f'rule "{rule_name(f"{fact} top {len(result.rows)} rank {rank}: {row[key]}", names)}"',
+            "    when",
+            f"        $f : {fact}({key_field} == {literal(row[key])})",
+            "    then",
+            f"        modify($f) {{ setRank({rank}) }}",
+            f'        System.out.println("{fact} " + $f.get{camel(key_field, upper=True)}() + " is ranked {rank}");',
+            "end",
+            "",
+        ]
+    return lines
+
+
+TEMPLATES = {"threshold": threshold_rules, "lookup": lookup_rules, "top_n": top_n_rules}
+
+
+def generate_drools(question: str, result: QueryResult, package: str = PACKAGE, description: str = None,
+                    fact: str = None) -> Optional[str]:
+    """
+        Deterministic .drl for the common result shapes, or None when the result does not
+        fit a template and the LLM has to write the rules.
+    """
+    shape = detect_shape(result)
+    if shape is None:
+        return None
+    lines = header(shape, question, result, package, description)
+    lines += TEMPLATES[shape](result, fact or fact_type(result.sql), set())
+    return "\n".join(lines)
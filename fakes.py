@@ -0,0 +1,152 @@
+import asyncio
+import hashlib
+import json
+import math
+import re
+import threading
+import time
+from typing import Any, Callable, List, Optional
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+class FakeEmbeddings(Embeddings):
+    """
+        Deterministic offline embedding backend. The same text always maps to the same
+        unit vector, so similarity search behaves consistently without calling OpenAI.
+        Every call is recorded so tests and benchmarks can count backend round-trips.
+    """
+    def __init__(self, size: int = 64, model: str = "fake-embedding", fail_times: int = 0, latency: float = 0.0):
+        self.size = size
+        self.latency = latency
+        self.model = model
+        self.fail_times = fail_times
+        self.calls: List[List[str]] = []
+        self._lock = threading.Lock()
+
+    def _vector(self, text: str) -> List[float]:
+        values = []
+        counter = 0
+        while len(values) < self.size:
+            digest = hashlib.sha256(f"{counter}:{text}".encode("utf-8")).digest()
+            values.extend((b - 127.5) / 127.5 for b in digest)
+            counter += 1
+        values = values[: self.size]
+        norm = math.sqrt(sum(v * v for v in values)) or 1.0
+        return [v / norm for v in values]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.calls.append(list(texts))
+            if self.fail_times > 0:
+                self.fail_times -= 1
+                raise RuntimeError("fake embedding backend failure")
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        with self._lock:
+            self.calls.append(list(texts))
+            if self.fail_times > 0:
+                self.fail_times -= 1
+                raise RuntimeError("fake embedding backend failure")
+        return [self._vector(text) for text in texts]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+
+COMPANY_HINTS = re.compile(r"company|report|revenue|profit|tata|jlr|segment|fy", re.IGNORECASE)
+
+
+def agent_responder(messages: List[BaseMessage]) -> AIMessage:
+    """
+        Scripted answers for the prompts in agentic.py: the supervisor routes company
+        questions to `retreiveragent`, agent2 emits one pdf_chatter call and every other
+        prompt gets a JSON wrapped html answer.
+    """
+    prompt = messages[-1].content
+    match = re.search(r"question:\s*(.*)", prompt, re.IGNORECASE)
+    question = match.group(1).strip() if match else prompt
+    question = re.sub(r"^\(?'user',\s*'(.*)'\)?$", r"\1", question)
+    if "supervised agent" in prompt:
+        if COMPANY_HINTS.search(question):
+            return AIMessage(content=json.dumps({"answer": "retreiveragent"}))
+        return AIMessage(content=json.dumps({"answer": f"<p>General answer to: {question}</p>"}))
+    if "expert analyst" in prompt:
+        return AIMessage(content="", tool_calls=[{"name": "pdf_chatter", "args": {"query": question}, "id": "call_fake"}])
+    return AIMessage(content="```json" + json.dumps({"answer": f"<p>Answer to: {question}</p>"}) + "```")
+
+
+class FakeChatModel(BaseChatModel):
+    """
+        Offline chat model with a fixed simulated latency. `responder` maps the prompt
+        messages to the reply; `calls` counts generations so benchmarks can report LLM calls.
+        When streamed, the reply is emitted in `chunk_size` character pieces, the first
+        after `latency` and every further one after `token_latency`.
+    """
+    responder: Callable[[List[BaseMessage]], AIMessage] = agent_responder
+    latency: float = 0.0
+    token_latency: float = 0.0
+    chunk_size: int = 8
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def bind_tools(self, tools: Any, **kwargs: Any):
+        return self
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        if self.latency:
+            time.sleep(self.latency)
+        self.calls += 1
+        return ChatResult(generations=[ChatGeneration(message=self.responder(messages))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.calls += 1
+        return ChatResult(generations=[ChatGeneration(message=self.responder(messages))])
+
+    def _chunks(self, message: AIMessage):
+        if message.tool_calls:
+            yield ChatGenerationChunk(message=AIMessageChunk(content="", tool_call_chunks=[
+                {"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": index}
+                for index, call in enumerate(message.tool_calls)
+            ]))
+            return
+        for start in range(0, len(message.content), self.chunk_size):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=message.content[start:start + self.chunk_size]))
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any):
+        if self.latency:
+            time.sleep(self.latency)
+        self.calls += 1
+        for position, chunk in enumerate(self._chunks(self.responder(messages))):
+            if position and self.token_latency:
+                time.sleep(self.token_latency)
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.message.content, chunk=chunk)
+            yield chunk
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.calls += 1
+        for position, chunk in enumerate(self._chunks(self.responder(messages))):
+            if position and self.token_latency:
+                await asyncio.sleep(self.token_latency)
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.message.content, chunk=chunk)
+            yield chunk
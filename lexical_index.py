@@ -0,0 +1,161 @@
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+
+LEXICAL_INDEX_FILE = "bm25_rag.json"
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[.,/-][a-z0-9]+)*")
+
+STOPWORDS = frozenset(
+    "a an and are as at be been by can did do does for from had has have how i in is it its "
+    "me my of on or our that the their there this to was were what when where which who why "
+    "will with you your about tell give show please".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+        Lower-cased word/number tokens. Numbers keep their separators ("1,234.5", "2024-25")
+        so line items and fiscal years match exactly.
+    """
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class BM25Index:
+    """
+        Inverted index with Okapi BM25 scoring, persisted as JSON next to the chroma collection.
+    """
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.doc_lengths: Dict[str, int] = {}
+        self.documents: Dict[str, Tuple[str, dict]] = {}
+        self.total_length = 0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def __contains__(self, doc_id: str):
+        return doc_id in self.doc_lengths
+
+    def add(self, doc_id: str, text: str, metadata: Optional[dict] = None):
+        with self._lock:
+            if doc_id in self.doc_lengths:
+                self.remove(doc_id)
+            terms = Counter(tokenize(text))
+            for term, count in terms.items():
+                self.postings.setdefault(term, {})[doc_id] = count
+            length = sum(terms.values())
+            self.doc_lengths[doc_id] = length
+            self.total_length += length
+            self.documents[doc_id] = (text, metadata or {})
+
+    def add_documents(self, documents: List[Document], ids: List[str]):
+        for doc_id, document in zip(ids, documents):
+            self.add(doc_id, document.page_content, document.metadata)
+
+    def remove(self, doc_id: str):
+        with self._lock:
+            text, _ = self.documents.pop(doc_id, ("", None))
+            for term in set(tokenize(text)):
+                posting = self.postings.get(term)
+                if posting is not None:
+                    posting.pop(doc_id, None)
+                    if not posting:
+                        del self.postings[term]
+            self.total_length -= self.doc_lengths.pop(doc_id, 0)
+
+    def search(self, query: str, k: int = 4) -> List[Tuple[str, float]]:
+        with self._lock:
+            n_docs = len(self.doc_lengths)
+            if not n_docs:
+                return []
+            avg_length = self.total_length / n_docs
+            scores: Dict[str, float] = {}
+            for term in set(tokenize(query)):
+                posting = self.postings.get(term)
+                if not posting:
+                    continue
+                idf = math.log(1 + (n_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+                for doc_id, tf in posting.items():
+                    norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / avg_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def get_document(self, doc_id: str) -> Document:
+        text, metadata = self.documents[doc_id]
+        return Document(id=doc_id, page_content=text, metadata=metadata)
+
+    def similarity_search(self, query: str, k: int = 4) -> List[Document]:
+        return [self.get_document(doc_id) for doc_id, _ in self.search(query, k)]
+
+    def save(self, path: str):
+        with self._lock:
+            data = {
+                "k1": self.k1,
+                "b": self.b,
+                "documents": {doc_id: [text, metadata] for doc_id, (text, metadata) in self.documents.items()},
+            }
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        index = cls(k1=data.get("k1", 1.5), b=data.get("b", 0.75))
+        for doc_id, (text, metadata) in data["documents"].items():
+            index.add(doc_id, text, metadata)
+        return index
+
+    @classmethod
+    def from_collection(cls, vectordb) -> "BM25Index":
+        """
+            Builds the index from everything already stored in a chroma collection.
+        """
+        index = cls()
+        data = vectordb.get(include=["documents", "metadatas"])
+        for doc_id, text, metadata in zip(data["ids"], data["documents"], data["metadatas"]):
+            index.add(doc_id, text, metadata)
+        return index
+
+
+def lexical_index_path(persist_directory: str = "chromadb") -> str:
+    return os.path.join(persist_directory, LEXICAL_INDEX_FILE)
+
+
+def load_lexical_index(persist_directory: str = "chromadb") -> BM25Index:
+    path = lexical_index_path(persist_directory)
+    if os.path.exists(path):
+        return BM25Index.load(path)
+    return BM25Index()
+
+
+def doc_key(document: Document) -> str:
+    return document.id or str(hash(document.page_content))
+
+
+def reciprocal_rank_fusion(rankings: List[List[Document]], k: int, rrf_k: int = 60) -> List[Document]:
+    """
+        Fuses several ranked lists: score(d) = sum over lists of 1 / (rrf_k + rank).
+    """
+    scores: Dict[str, float] = {}
+    documents: Dict[str, Document] = {}
+    for ranking in rankings:
+        for rank, document in enumerate(ranking, start=1):
+            key = doc_key(document)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+            documents.setdefault(key, document)
+    ordered = sorted(scores, key=scores.get, reverse=True)
+    return [documents[key] for key in ordered[:k]]
@@ -0,0 +1,294 @@
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable, Dict, Tuple
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Histogram:
+    """
+        Rolling window of the last `window` observations plus running count and sum.
+        Percentiles are computed over the window, so old traffic ages out.
+    """
+    def __init__(self, window: int = 2048):
+        self.values = deque(maxlen=window)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self.values.append(value)
+            self.count += 1
+            self.sum += value
+
+    def percentiles(self, quantiles=QUANTILES) -> Dict[float, float]:
+        with self._lock:
+            ordered = sorted(self.values)
+        if not ordered:
+            return {q: 0.0 for q in quantiles}
+        return {q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] for q in quantiles}
+
+
+def _label_key(labels: dict) -> Tuple:
+    return tuple(sorted(labels.items()))
+
+
+class MetricsRegistry:
+    """
+        Process-wide histograms and counters keyed by metric name and labels, plus
+        collectors: callables returning a dict of numbers (cache stats, router stats...).
+    """
+    def __init__(self, window: int = 2048):
+        self.window = window
+        self.histograms: Dict[Tuple[str, Tuple], Histogram] = {}
+        self.counters: Dict[Tuple[str, Tuple], float] = {}
+        self.collectors: Dict[str, Callable[[], dict]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, _label_key(labels))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(key, Histogram(self.window))
+        histogram.observe(value)
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def register_collector(self, name: str, collector: Callable[[], dict]):
+        self.collectors[name] = collector
+
+    def snapshot(self) -> dict:
+        histograms = {}
+        for (name, labels), histogram in sorted(self.histograms.items()):
+            label_text = ",".join(f"{k}={v}" for k, v in labels)
+            values = histogram.percentiles()
+            histograms[f"{name}{{{label_text}}}" if label_text else name] = {
+                "count": histogram.count,
+                "mean": round(histogram.sum / histogram.count, 6) if histogram.count else 0.0,
+                "p50": round(values[0.5], 6),
+                "p95": round(values[0.95], 6),
+                "p99": round(values[0.99], 6),
+            }
+        counters = {}
+        for (name, labels), value in sorted(self.counters.items()):
+            label_text = ",".join(f"{k}={v}" for k, v in labels)
+            counters[f"{name}{{{label_text}}}" if label_text else name] = value
+        collected = {}
+        for name, collector in self.collectors.items():
+            try:
+                collected[name] = collector()
+            except Exception as e:
+                collected[name] = {"error": str(e)}
+        return {"histograms": histograms, "counters": counters, "collectors": collected}
+
+    def prometheus_text(self) -> str:
+        """
+            Prometheus text exposition format: histograms as summaries, counters as counters
+            and numeric collector values as gauges.
+        """
+        lines = []
+        seen_types = set()
+
+        def type_line(name, kind):
+            if name not in seen_types:
+                seen_types.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+
+        def render(labels, extra=None):
+            items = list(labels) + (list(extra.items()) if extra else [])
+            if not items:
+                return ""
+            return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+        for (name, labels), histogram in sorted(self.histograms.items()):
+            type_line(name, "summary")
+            for q, value in histogram.percentiles().items():
+                lines.append(f"{name}{render(labels, {'quantile': q})} {value}")
+            lines.append(f"{name}_count{render(labels)} {histogram.count}")
+            lines.append(f"{name}_sum{render(labels)} {histogram.sum}")
+        for (name, labels), value in sorted(self.counters.items()):
+            type_line(f"{name}_total", "counter")
+            lines.append(f"{name}_total{render(labels)} {value}")
+        for collector_name, values in self.snapshot()["collectors"].items():
+            for key, value in _flatten(values):
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    name = f"{collector_name}_{key}"
+                    type_line(name, "gauge")
+                    lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+
+def _flatten(values: dict, prefix: str = ""):
+    for key, value in values.items():
+        key = f"{prefix}{key}".replace("-", "_").replace(".", "_")
+        if isinstance(value, dict):
+            yield from _flatten(value, key + "_")
+        else:
+            yield key, value
+
+
+metrics = MetricsRegistry()
+
+# wall time of each startup / first-use initialisation step, in milliseconds
+startup_timings: Dict[str, float] = {}
+
+
+@contextmanager
+def startup_step(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        startup_timings[name] = round((time.perf_counter() - start) * 1000, 2)
+
+
+def timed_node(name: str, func: Callable, afunc: Callable = None):
+    """
+        Wraps a graph node (and its async twin) so every call records `node_latency_seconds{node=name}`.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with metrics.timer("node_latency_seconds", node=name):
+            return func(*args, **kwargs)
+
+    if afunc is None:
+        return wrapper, None
+
+    @wraps(afunc)
+    async def awrapper(*args, **kwargs):
+        with metrics.timer("node_latency_seconds", node=name):
+            return await afunc(*args, **kwargs)
+
+    return wrapper, awrapper
+
+
+def response_model(response) -> str:
+    """
+        Model name of an LLMResult; streamed calls have no llm_output and carry it in the
+        message's response_metadata instead.
+    """
+    model = (response.llm_output or {}).get("model_name")
+    if model:
+        return model
+    for generations in response.generations:
+        for generation in generations:
+            metadata = getattr(getattr(generation, "message", None), "response_metadata", None) or {}
+            if metadata.get("model_name"):
+                return metadata["model_name"]
+    return "unknown"
+
+
+class LLMMetricsCallback(BaseCallbackHandler):
+    """
+        Records wall time and token usage of every chat model call, and the time to the
+        first streamed token when the call streams.
+    """
+    def __init__(self, registry: MetricsRegistry = None):
+        self.registry = registry or metrics
+        self._started = {}
+        self._streaming = set()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._started[run_id] = time.perf_counter()
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._started[run_id] = time.perf_counter()
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        start = self._started.get(run_id)
+        if start is not None and run_id not in self._streaming:
+            self._streaming.add(run_id)
+            self.registry.observe("llm_time_to_first_token_seconds", time.perf_counter() - start)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._streaming.discard(run_id)
+        start = self._started.pop(run_id, None)
+        model = response_model(response)
+        if start is not None:
+            self.registry.observe("llm_latency_seconds", time.perf_counter() - start, model=model)
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        prompt_tokens = usage.get("prompt_tokens")
+        completion_tokens = usage.get("completion_tokens")
+        if prompt_tokens is None:
+            for generations in response.generations:
+                for generation in generations:
+                    usage_metadata = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                    if usage_metadata:
+                        prompt_tokens = (prompt_tokens or 0) + usage_metadata.get("input_tokens", 0)
+                        completion_tokens = (completion_tokens or 0) + usage_metadata.get("output_tokens", 0)
+        if prompt_tokens is not None:
+            self.registry.observe("llm_prompt_tokens", prompt_tokens, model=model)
+            self.registry.observe("llm_completion_tokens", completion_tokens or 0, model=model)
+            self.registry.inc("llm_tokens", prompt_tokens + (completion_tokens or 0), model=model)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._streaming.discard(run_id)
+        self._started.pop(run_id, None)
+        self.registry.inc("llm_errors")
+
+
+llm_metrics_callback = LLMMetricsCallback()
+
+
+# fraction of requests traced to stdout with the console callback (replaces set_debug(True))
+DEBUG_SAMPLE_RATE = float(os.getenv("DEBUG_SAMPLE_RATE", "0"))
+
+
+def sampled_debug_callbacks(rate: float = None):
+    """
+        Returns the console tracer for a sampled fraction of requests and nothing otherwise.
+    """
+    rate = DEBUG_SAMPLE_RATE if rate is None else rate
+    if rate > 0 and random.random() < rate:
+        from langchain_core.tracers.stdout import ConsoleCallbackHandler
+        return [ConsoleCallbackHandler()]
+    return []
+
+
+def start_metrics_server(port: int):
+    """
+        Serves `prometheus_text()` on http://0.0.0.0:<port>/metrics from a daemon thread.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = metrics.prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("0.0.0.0", port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
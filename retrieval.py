@@ -0,0 +1,391 @@
+import asyncio
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Hashable, Optional
+
+from compact_index import load_compact_index
+from lexical_index import load_lexical_index, reciprocal_rank_fusion
+from metrics import metrics
+
+
+COLLECTION_VERSION_FILE = "collection_version"
+RETRIEVAL_MODES = ("vector", "hybrid", "lexical", "compact")
+
+
+def bump_collection_version(persist_directory: str = "chromadb"):
+    """
+        Called by ingestion after the collection was modified, so that query caches drop their results.
+    """
+    os.makedirs(persist_directory, exist_ok=True)
+    path = os.path.join(persist_directory, COLLECTION_VERSION_FILE)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(str(time.time_ns()))
+
+
+def normalize_query(query: str) -> str:
+    return re.sub(r"\s+", " ", query).strip().lower().rstrip("?!. ")
+
+
+class LRUCache:
+    """
+        Thread-safe LRU cache with an optional time-to-live per entry and hit/miss counters.
+    """
+    def __init__(self, max_entries: int = 1024, ttl: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key: Hashable, value: Any):
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+class CachedRetriever:
+    """
+        Caches query -> embedding and (query, k) -> documents in front of a Chroma store.
+        Queries are normalized (case, whitespace, trailing punctuation) so near-identical
+        questions share an entry. Document entries are dropped whenever the collection
+        changes; the version is checked at most every `version_check_interval` seconds.
+
+        `mode` selects dense search ("vector"), the BM25 index built at ingest ("lexical",
+        no embedding call at all) or both fused with reciprocal rank fusion ("hybrid").
+        "compact" searches the truncated/int8 memory-mapped copy of the embeddings
+        (compact_index.py) instead of Chroma.
+    """
+    def __init__(self, vectordb, embeddings, max_entries: int = 1024, ttl: float = 600.0,
+                 persist_directory: str = "chromadb", version_check_interval: float = 2.0,
+                 mode: str = "vector", fusion_candidates: int = 4, lexical_index=None):
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode '{mode}', expected one of {RETRIEVAL_MODES}")
+        self.vectordb = vectordb
+        self.embeddings = embeddings
+        self.mode = mode
+        self.fusion_candidates = fusion_candidates
+        self._lexical_index = lexical_index
+        self._compact_index = None
+        self.persist_directory = persist_directory
+        self.version_check_interval = version_check_interval
+        self.query_embeddings = LRUCache(max_entries=max_entries, ttl=ttl)
+        self.documents = LRUCache(max_entries=max_entries, ttl=ttl)
+        self.invalidations = 0
+        self._version = None
+        self._version_checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def collection_version(self):
+        path = os.path.join(self.persist_directory, COLLECTION_VERSION_FILE)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                marker = f.read()
+        except FileNotFoundError:
+            marker = None
+        return marker, self.vectordb._collection.count()
+
+    def _check_version(self):
+        now = time.monotonic()
+        if now - self._version_checked_at < self.version_check_interval:
+            return
+        with self._lock:
+            if now - self._version_checked_at < self.version_check_interval:
+                return
+            version = self.collection_version()
+            if self._version is not None and version != self._version:
+                self.documents.clear()
+                self._lexical_index = None
+                self._compact_index = None
+                self.invalidations += 1
+            self._version = version
+            self._version_checked_at = now
+
+    def generation(self) -> int:
+        """
+            Number of invalidations so far; results computed under an older generation are stale.
+        """
+        self._check_version()
+        return self.invalidations
+
+    def embed_query(self, query: str):
+        key = normalize_query(query)
+        vector = self.query_embeddings.get(key)
+        if vector is None:
+            vector = self.embeddings.embed_query(query)
+            self.query_embeddings.put(key, vector)
+        return vector
+
+    @property
+    def lexical_index(self):
+        if self._lexical_index is None:
+            self._lexical_index = load_lexical_index(self.persist_directory)
+        return self._lexical_index
+
+    @property
+    def compact_index(self):
+        if self._compact_index is None:
+            self._compact_index = load_compact_index(self.persist_directory, self.vectordb)
+        return self._compact_index
+
+    def _fetch_k(self, mode: str, k: int) -> int:
+        return k if mode == "vector" else k * self.fusion_candidates
+
+    def _lexical_search(self, query: str, k: int):
+        return self.lexical_index.similarity_search(query, k)
+
+    def _compact_search(self, vector, k: int):
+        return self.compact_index.similarity_search_by_vector(vector, k)
+
+    def _search(self, query: str, k: int, mode: str):
+        if mode == "lexical":
+            return self._lexical_search(query, k)
+        if mode == "compact":
+            return self._compact_search(self.embed_query(query), k)
+        vector_docs = self.vectordb.similarity_search_by_vector(self.embed_query(query), k=self._fetch_k(mode, k))
+        if mode == "vector":
+            return vector_docs
+        lexical_docs = self._lexical_search(query, self._fetch_k(mode, k))
+        return reciprocal_rank_fusion([vector_docs, lexical_docs], k)
+
+    async def _asearch(self, query: str, k: int, mode: str):
+        # loading the BM25 / compact index (possibly building it from Chroma) and scoring
+        # are CPU and disk bound, so they run in a worker thread and never on the event loop
+        if mode == "lexical":
+            return await asyncio.to_thread(self._lexical_search, query, k)
+        vector = await self.aembed_query(query)
+        if mode == "compact":
+            return await asyncio.to_thread(self._compact_search, vector, k)
+        if mode == "vector":
+            return await self.vectordb.asimilarity_search_by_vector(vector, k=k)
+        vector_docs, lexical_docs = await asyncio.gather(
+            self.vectordb.asimilarity_search_by_vector(vector, k=self._fetch_k(mode, k)),
+            asyncio.to_thread(self._lexical_search, query, self._fetch_k(mode, k)),
+        )
+        return reciprocal_rank_fusion([vector_docs, lexical_docs], k)
+
+    def similarity_search(self, query: str, k: int = 2, mode: Optional[str] = None):
+        self._check_version()
+        mode = mode or self.mode
+        key = (mode, normalize_query(query), k)
+        docs = self.documents.get(key)
+        if docs is None:
+            with metrics.timer("retrieval_latency_seconds", mode=mode):
+                docs = self._search(query, k, mode)
+            self.documents.put(key, docs)
+        return list(docs)
+
+    async def aembed_query(self, query: str):
+        key = normalize_query(query)
+        vector = self.query_embeddings.get(key)
+        if vector is None:
+            vector = await self.embeddings.aembed_query(query)
+            self.query_embeddings.put(key, vector)
+        return vector
+
+    async def asimilarity_search(self, query: str, k: int = 2, mode: Optional[str] = None):
+        if time.monotonic() - self._version_checked_at >= self.version_check_interval:
+            # reads the version file and counts the collection
+            await asyncio.to_thread(self._check_version)
+        mode = mode or self.mode
+        key = (mode, normalize_query(query), k)
+        docs = self.documents.get(key)
+        if docs is None:
+            with metrics.timer("retrieval_latency_seconds", mode=mode):
+                docs = await self._asearch(query, k, mode)
+            self.documents.put(key, docs)
+        return list(docs)
+
+    def stats(self) -> dict:
+        return {
+            "query_embeddings": self.query_embeddings.stats(),
+            "documents": self.documents.stats(),
+            "invalidations": self.invalidations,
+        }
+
+
+class _Prefetch:
+    __slots__ = ("future", "generation", "started_at", "finished_at", "refs")
+
+    def __init__(self, future, generation):
+        self.future = future
+        self.generation = generation
+        self.started_at = time.perf_counter()
+        self.finished_at = None
+        self.refs = 1
+        future.add_done_callback(self._finished)
+
+    def _finished(self, _):
+        self.finished_at = time.perf_counter()
+
+
+class SpeculativePrefetcher:
+    """
+        Starts retrieval for a question while the supervisor is still deciding the route.
+        The consumer node calls `take()` to use the prefetched documents (waiting if the
+        search is still running); any other route calls `discard()`, which cancels the
+        search when it has not started yet. Entries are keyed by the normalized routed
+        question, the same key for start, take and discard.
+
+        An entry older than `ttl` seconds, or started before the collection last changed
+        (CachedRetriever.generation), is never reused: a request that finds one drops it
+        and starts afresh, so leaked or stale futures cannot outlive an ingest.
+
+        saved_seconds: retrieval time that overlapped with routing instead of following it.
+        wasted_seconds: retrieval time spent on prefetches that were discarded.
+    """
+    def __init__(self, retriever: CachedRetriever, k: int = 2, max_workers: int = 8, ttl: float = 60.0):
+        self.retriever = retriever
+        self.k = k
+        self.ttl = ttl
+        self.counters = {"started": 0, "used": 0, "wasted": 0, "cancelled": 0, "failed": 0, "expired": 0}
+        self.saved_seconds = 0.0
+        self.wasted_seconds = 0.0
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def _stale(self, entry: _Prefetch, now: float, generation: int) -> bool:
+        return now - entry.started_at > self.ttl or entry.generation != generation
+
+    def _drop(self, entry: _Prefetch, now: float):
+        # caller holds the lock
+        if not entry.future.done() and entry.future.cancel():
+            self.counters["cancelled"] += 1
+            self.wasted_seconds += now - entry.started_at
+        else:
+            self.counters["wasted"] += 1
+            self.wasted_seconds += (entry.finished_at or now) - entry.started_at
+
+    def _expire(self, now: float, generation: int):
+        # caller holds the lock
+        for key, entry in list(self._pending.items()):
+            if self._stale(entry, now, generation):
+                del self._pending[key]
+                self._drop(entry, now)
+                self.counters["expired"] += 1
+
+    def _start(self, query: str, submit):
+        key = normalize_query(query)
+        generation = self.retriever.generation()
+        with self._lock:
+            self._expire(time.perf_counter(), generation)
+            entry = self._pending.get(key)
+            if entry is not None:
+                entry.refs += 1
+                return
+            self._pending[key] = _Prefetch(submit(), generation)
+            self.counters["started"] += 1
+
+    def start(self, query: str):
+        self._start(query, lambda: self._executor.submit(self.retriever.similarity_search, query, self.k))
+
+    def astart(self, query: str):
+        self._start(query, lambda: asyncio.ensure_future(self.retriever.asimilarity_search(query, self.k)))
+
+    def _pop(self, query: str) -> Optional[_Prefetch]:
+        key = normalize_query(query)
+        generation = self.retriever.generation()
+        with self._lock:
+            entry = self._pending.get(key)
+            if entry is None:
+                return None
+            entry.refs -= 1
+            if entry.refs <= 0:
+                del self._pending[key]
+            if self._stale(entry, time.perf_counter(), generation):
+                self.counters["expired"] += 1
+                if entry.refs <= 0:
+                    self._drop(entry, time.perf_counter())
+                return None
+            return entry
+
+    def _record_used(self, entry: _Prefetch, asked_at: float):
+        with self._lock:
+            self.counters["used"] += 1
+            self.saved_seconds += min(asked_at, entry.finished_at or asked_at) - entry.started_at
+
+    def _record_failed(self):
+        with self._lock:
+            self.counters["failed"] += 1
+
+    def take(self, query: str):
+        entry = self._pop(query)
+        if entry is None:
+            return None
+        asked_at = time.perf_counter()
+        try:
+            docs = entry.future.result()
+        except Exception:
+            self._record_failed()
+            return None
+        self._record_used(entry, asked_at)
+        return docs
+
+    async def atake(self, query: str):
+        entry = self._pop(query)
+        if entry is None:
+            return None
+        asked_at = time.perf_counter()
+        future = entry.future if asyncio.isfuture(entry.future) else asyncio.wrap_future(entry.future)
+        try:
+            docs = await future
+        except Exception:
+            self._record_failed()
+            return None
+        self._record_used(entry, asked_at)
+        return docs
+
+    def discard(self, query: str):
+        entry = self._pop(query)
+        if entry is None:
+            return
+        with self._lock:
+            self._drop(entry, time.perf_counter())
+
+    def stats(self) -> dict:
+        return {
+            **self.counters,
+            "in_flight": len(self._pending),
+            "saved_ms": round(self.saved_seconds * 1000, 2),
+            "wasted_ms": round(self.wasted_seconds * 1000, 2),
+        }
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,222 @@
+import asyncio
+import math
+import re
+import threading
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from metrics import metrics
+
+
+RETRIEVER_ROUTE = "retreiveragent"
+GREETING_ROUTE = "greeting"
+GENERAL_ROUTE = "general"
+# routing is an optimisation: a failing embedding service gives up quickly and the supervisor decides
+ROUTER_EMBEDDING_RETRIES = 1
+
+
+class RouteDecision(NamedTuple):
+    route: str
+    answer: str
+    source: str
+    confidence: float
+
+
+GREETING_PATTERN = re.compile(
+    r"^\s*(hi|hii+|hello|hey|hey there|good (morning|afternoon|evening)|thanks|thank you|thank you so much|thx|ok|okay|bye|goodbye)"
+    r"( (there|bot|assistant))?[\s!.,🙂😊]*$",
+    re.IGNORECASE,
+)
+
+# names and report vocabulary from the indexed Tata Motors annual report only; generic finance
+# terms ("what is cash flow", "explain revenue") are left to the centroid rule and the supervisor
+COMPANY_PATTERN = re.compile(
+    r"\b(tata( motors)?|tml|jlr|jaguar|land rover|range rover|nexon|harrier|tiago|altroz|curvv|"
+    r"annual report|integrated report|fy ?(20)?2[45]|the company'?s?|your company|board of directors)\b",
+    re.IGNORECASE,
+)
+
+DEFAULT_EXAMPLES = {
+    RETRIEVER_ROUTE: [
+        "What was the company's revenue last year?",
+        "How did the commercial vehicle business perform?",
+        "Summarise the company's financial results",
+        "What are the key risks mentioned in the report?",
+        "Who is on the board of the company?",
+        "What is the company's strategy for electric vehicles?",
+        "How much debt does the company have?",
+        "What were the sustainability targets of the company?",
+    ],
+    GENERAL_ROUTE: [
+        "What is the capital of France?",
+        "Explain what machine learning is",
+        "Write a short poem about the sea",
+        "How do I cook pasta?",
+        "What is the difference between a list and a tuple in python?",
+        "Tell me a joke",
+    ],
+}
+
+
+def greeting_answer(query: str) -> str:
+    if re.search(r"thank|thx", query, re.IGNORECASE):
+        return "<p>You're welcome! Let me know if there is anything else I can help with.</p>"
+    if re.search(r"bye", query, re.IGNORECASE):
+        return "<p>Goodbye! Have a great day.</p>"
+    return "<p>Hello! How can I help you today?</p>"
+
+
+def keyword_rule(query: str) -> Optional[RouteDecision]:
+    """
+        Obvious greetings get a canned answer, explicit report vocabulary goes to the retriever.
+    """
+    if GREETING_PATTERN.match(query):
+        return RouteDecision(GREETING_ROUTE, greeting_answer(query), "keyword", 1.0)
+    if COMPANY_PATTERN.search(query):
+        return RouteDecision(RETRIEVER_ROUTE, RETRIEVER_ROUTE, "keyword", 1.0)
+    return None
+
+
+def _normalize(vector: List[float]) -> List[float]:
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+class CentroidRule:
+    """
+        Nearest-centroid classifier over embeddings of example queries. Only retriever
+        decisions are returned, because a general question still needs the LLM to answer it.
+        A decision is taken when the best centroid wins by at least `margin`.
+
+        `query_embeddings` embeds the incoming query; pass the CachedRetriever so the vector
+        is computed once and reused by the retrieval that follows the routing decision.
+    """
+    def __init__(self, embeddings, examples: Dict[str, List[str]] = None, margin: float = 0.1, min_similarity: float = 0.2,
+                 query_embeddings=None):
+        self.embeddings = embeddings
+        self.query_embeddings = query_embeddings or embeddings
+        self.examples = examples or DEFAULT_EXAMPLES
+        self.margin = margin
+        self.min_similarity = min_similarity
+        self._centroids = None
+        self._lock = threading.Lock()
+
+    def centroids(self) -> Dict[str, List[float]]:
+        if self._centroids is None:
+            with self._lock:
+                if self._centroids is None:
+                    centroids = {}
+                    for label, texts in self.examples.items():
+                        vectors = self.embeddings.embed_documents(texts)
+                        centroids[label] = _normalize([sum(column) / len(vectors) for column in zip(*vectors)])
+                    self._centroids = centroids
+        return self._centroids
+
+    def classify(self, vector: List[float]) -> Optional[RouteDecision]:
+        vector = _normalize(vector)
+        scores = sorted(
+            ((sum(a * b for a, b in zip(vector, centroid)), label) for label, centroid in self.centroids().items()),
+            reverse=True,
+        )
+        best_score, best_label = scores[0]
+        runner_up = scores[1][0] if len(scores) > 1 else -1.0
+        if best_label == RETRIEVER_ROUTE and best_score >= self.min_similarity and best_score - runner_up >= self.margin:
+            return RouteDecision(RETRIEVER_ROUTE, RETRIEVER_ROUTE, "centroid", round(best_score - runner_up, 4))
+        return None
+
+    def __call__(self, query: str) -> Optional[RouteDecision]:
+        return self.classify(self.query_embeddings.embed_query(query))
+
+    async def acall(self, query: str) -> Optional[RouteDecision]:
+        if self._centroids is None:
+            # embeds every example on first use, keep it off the event loop
+            await asyncio.to_thread(self.centroids)
+        return self.classify(await self.query_embeddings.aembed_query(query))
+
+
+class LocalRouter:
+    """
+        Runs the configured rules in order before the supervisor LLM. The first rule that
+        returns a decision wins; when none is confident the caller falls back to the LLM
+        and reports it with `record_llm()`. Decisions are counted per source. A rule that
+        raises (e.g. the embedding service is down) counts as undecided.
+    """
+    def __init__(self, rules: List[Callable[[str], Optional[RouteDecision]]]):
+        self.rules = rules
+        self.decisions = {"keyword": 0, "centroid": 0, "llm": 0}
+        self.errors = 0
+        self.routes = {}
+        self.local_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def _record(self, source: str, route: Optional[str], elapsed: float = 0.0):
+        with self._lock:
+            self.decisions[source] = self.decisions.get(source, 0) + 1
+            if route:
+                self.routes[route] = self.routes.get(route, 0) + 1
+            self.local_seconds += elapsed
+
+    def _failed(self, rule):
+        name = getattr(rule, "__name__", type(rule).__name__)
+        metrics.inc("router_errors", rule=name)
+        with self._lock:
+            self.errors += 1
+
+    def route(self, query: str) -> Optional[RouteDecision]:
+        start = time.perf_counter()
+        for rule in self.rules:
+            try:
+                decision = rule(query)
+            except Exception:
+                self._failed(rule)
+                continue
+            if decision is not None:
+                self._record(decision.source, decision.route, time.perf_counter() - start)
+                return decision
+        self._record_miss(time.perf_counter() - start)
+        return None
+
+    async def aroute(self, query: str) -> Optional[RouteDecision]:
+        start = time.perf_counter()
+        for rule in self.rules:
+            acall = getattr(rule, "acall", None)
+            try:
+                decision = await acall(query) if acall else rule(query)
+            except Exception:
+                self._failed(rule)
+                continue
+            if decision is not None:
+                self._record(decision.source, decision.route, time.perf_counter() - start)
+                return decision
+        self._record_miss(time.perf_counter() - start)
+        return None
+
+    def _record_miss(self, elapsed: float):
+        with self._lock:
+            self.local_seconds += elapsed
+
+    def record_llm(self, route: Optional[str] = None):
+        self._record("llm", route)
+
+    def stats(self) -> dict:
+        local = sum(count for source, count in self.decisions.items() if source != "llm")
+        total = local + self.decisions["llm"]
+        return {
+            "decisions": dict(self.decisions),
+            "routes": dict(self.routes),
+            "errors": self.errors,
+            "llm_calls_saved": local,
+            "local_ratio": round(local / total, 4) if total else 0.0,
+            "avg_local_us": round(self.local_seconds / total * 1e6, 2) if total else 0.0,
+        }
+
+
+def default_router(embeddings=None, query_embeddings=None) -> LocalRouter:
+    rules = [keyword_rule]
+    if embeddings is not None:
+        if hasattr(embeddings, "with_retries"):
+            embeddings = embeddings.with_retries(ROUTER_EMBEDDING_RETRIES)
+        if hasattr(query_embeddings, "with_retries"):
+            query_embeddings = query_embeddings.with_retries(ROUTER_EMBEDDING_RETRIES)
+        rules.append(CentroidRule(embeddings, query_embeddings=query_embeddings))
+    return LocalRouter(rules)
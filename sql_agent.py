@@ -1,3 +1,7 @@
+import asyncio
+import json
+import os
+import re
 from langchain_community.utilities import SQLDatabase
 from langchain.chat_models import init_chat_model
 from langchain.tools import tool
@@ -5,22 +9,61 @@ from dotenv import load_dotenv
 load_dotenv()
 from langchain.prompts import PromptTemplate
 from langchain_core.messages import ToolMessage
+from metrics import metrics
+from sql_schema import get_schema_index
+from sql_results import SQLResultCache, run_query
+from sql_guard import QueryGuard, QueryRejected, QueryTimeout
+from sql_pool import ReadOnlyConnectionPool
+from drools_templates import PACKAGE, comment_text, detect_shape, generate_drools
 
 llm = init_chat_model(model="openai:gpt-5-nano")
 
-db = SQLDatabase.from_uri("sqlite:///Chinook.db")
+DB_PATH = "Chinook.db"
+# auto: templates for known result shapes, LLM otherwise | template | llm
+DROOLS_MODE = os.getenv("DROOLS_MODE", "auto")
+# let the LLM name and describe template rules (small prompt, rules stay deterministic)
+DROOLS_LLM_NAMING = os.getenv("DROOLS_LLM_NAMING", "0") == "1"
+db = SQLDatabase.from_uri(f"sqlite:///{DB_PATH}")
+result_cache = SQLResultCache(DB_PATH)
+metrics.register_collector("sql_cache", result_cache.stats)
+query_guard = QueryGuard(DB_PATH)
+connection_pool = ReadOnlyConnectionPool(DB_PATH)
+metrics.register_collector("sql_pool", connection_pool.stats)
+metrics.register_collector("sql_guard", query_guard.stats)
 # print(db.dialect)
 # print(db.get_usable_table_names())
 # print(db.run("SELECT * FROM Artist LIMIT 100;"))
 
+def run_sql(sql_query: str):
+    """
+        Runs the query on a pooled read-only connection with bounded, paged reads and
+        returns a typed QueryResult. Safe to call from several threads.
+        Results are served from the cache until the database file changes. The query is
+        checked by the guard first and runs read-only under its time budget; raises
+        QueryRejected or QueryTimeout.
+    """
+    result = result_cache.get(sql_query)
+    if result is not None:
+        return result
+    with metrics.timer("sql_query_seconds"):
+        with connection_pool.connection() as conn:
+            checked_query = query_guard.check(conn, sql_query)
+            with query_guard.budget(conn):
+                result = run_query(conn, checked_query)
+    result_cache.put(sql_query, result)
+    return result
+
+
 @tool
 def sql_tool(sql_query: str):
     """
         Must call this function to execute the sql query and get the results.
     """
-    
-    return db.run(sql_query)
-    
+    try:
+        return run_sql(sql_query).to_text()
+    except (QueryRejected, QueryTimeout) as e:
+        return f"Query not executed: {e}"
+
 
 
 prompt = """
@@ -65,25 +108,13 @@ Call the `sql_tool` function with your generated SQL query. The tool will execut
 
 Remember to be precise, accurate, and provide context that helps the user understand both the answer and how it was derived.
 """
-print("User question: \n")
-user_question = input("Enter the question!")
-pp_template = PromptTemplate.from_template(prompt)
-
-chain = pp_template | llm.bind_tools([sql_tool])
-import json 
-tool_map = {"sql_tool": sql_tool}
-
-response = chain.invoke({"question": user_question, "db_schema": db.get_usable_table_names(), "db_type":db.dialect})
-output = None
-for tool_call in response.tool_calls:
-    tool_name = tool_call["name"]
-    tool_args = tool_call["args"]
-    tool_call_id = tool_call["id"]
-    output = tool_map[tool_name].invoke(tool_args["sql_query"])
-    
-print("---"*100)
-print(output)
-print("\n\n")
+
+
+def schema_context(question, max_tables=4):
+    """
+        Compact schema of the tables relevant to the question and the tables joining them.
+    """
+    return get_schema_index(DB_PATH).context_for(question, max_tables=max_tables)
 
 
 drools_prompt = """
@@ -127,10 +158,138 @@ Generate practical Drools rules that a business user could understand and modify
 """
 
 
-final_execution = PromptTemplate.from_template(drools_prompt)
+drools_naming_prompt = """
+You are a Drools expert. Rules were generated from SQL results for the question below.
+Suggest a Java package name under com.company.rules, the fact class the rules match on and a one sentence description of what the rules do.
+
+- **Question**: {question}
+- **Result shape**: {shape}
+- **Example rule**:
+{example}
+
+Respond only with JSON: {{"package": "...", "fact": "...", "description": "..."}}
+"""
+
+
+def sql_chain():
+    return PromptTemplate.from_template(prompt) | llm.bind_tools([sql_tool])
+
+
+def drools_chain():
+    return PromptTemplate.from_template(drools_prompt) | llm
+
+
+def sql_inputs(question):
+    return {"question": question, "db_schema": schema_context(question), "db_type": db.dialect}
+
+
+def execute_tool_calls(response, record):
+    result = None
+    for tool_call in response.tool_calls:
+        record["sql"] = tool_call["args"]["sql_query"]
+        try:
+            result = run_sql(record["sql"])
+        except (QueryRejected, QueryTimeout) as e:
+            record["error"] = f"Query not executed: {e}"
+    if result is not None:
+        record["columns"] = result.columns
+        record["row_count"] = len(result.rows)
+        record["truncated"] = result.truncated
+    return result
+
+
+def drools_inputs(question, result):
+    return {"question": question, "sql_output": result.summary() if result is not None else "No query was executed."}
+
+
+JAVA_IDENTIFIER = r"[A-Za-z_$][A-Za-z0-9_$]*"
+JAVA_PACKAGE = re.compile(rf"{JAVA_IDENTIFIER}(\.{JAVA_IDENTIFIER})*")
+JAVA_CLASS = re.compile(JAVA_IDENTIFIER)
+RULE_START = re.compile(r"^rule\s", re.M)
+
+
+def naming_inputs(question, result, drools):
+    # the first rule of the template output; the header comment may itself mention "rule "
+    match = RULE_START.search(drools)
+    example = drools[match.start():].split("\nend", 1)[0] + "\nend" if match else drools
+    return {"question": question, "shape": detect_shape(result), "example": example}
+
+
+def parse_naming(content):
+    """
+        Package, description and fact type suggested by the LLM. A package or fact that is
+        not a valid Java name falls back to PACKAGE and the template's fact type; the
+        description is reduced to one capped line, as it becomes a // comment.
+    """
+    try:
+        naming = json.loads(content.strip().strip("`").removeprefix("json"))
+        package, fact, description = naming.get("package"), naming.get("fact"), naming.get("description")
+        return {"package": package if isinstance(package, str) and JAVA_PACKAGE.fullmatch(package) else PACKAGE,
+                "description": comment_text(description) if isinstance(description, str) else None,
+                "fact": fact if isinstance(fact, str) and JAVA_CLASS.fullmatch(fact) else None}
+    except (ValueError, AttributeError):
+        return {}
+
+
+def template_drools(question, result, record):
+    """
+        Rules from the local templates when the result has a known shape; None means the
+        LLM has to write them.
+    """
+    if DROOLS_MODE == "llm" or result is None:
+        return None
+    drools = generate_drools(question, result)
+    if drools is not None:
+        record["drools_source"] = f"template:{detect_shape(result)}"
+    return drools
+
+
+def run_pipeline(question):
+    """
+        Question -> generated SQL -> bounded execution -> Drools rules, as one record.
+    """
+    record = {"question": question, "sql": None, "error": None}
+    response = sql_chain().invoke(sql_inputs(question))
+    result = execute_tool_calls(response, record)
+    drools = template_drools(question, result, record)
+    if drools is not None and DROOLS_LLM_NAMING:
+        naming = (PromptTemplate.from_template(drools_naming_prompt) | llm).invoke(naming_inputs(question, result, drools))
+        drools = generate_drools(question, result, **parse_naming(naming.content))
+    if drools is None:
+        record["drools_source"] = "llm"
+        drools = drools_chain().invoke(drools_inputs(question, result)).content
+    record["drools"] = drools
+    return record, result
+
+
+async def arun_pipeline(question):
+    record = {"question": question, "sql": None, "error": None}
+    response = await sql_chain().ainvoke(sql_inputs(question))
+    result = await asyncio.to_thread(execute_tool_calls, response, record)
+    drools = template_drools(question, result, record)
+    if drools is not None and DROOLS_LLM_NAMING:
+        naming = await (PromptTemplate.from_template(drools_naming_prompt) | llm).ainvoke(naming_inputs(question, result, drools))
+        drools = generate_drools(question, result, **parse_naming(naming.content))
+    if drools is None:
+        record["drools_source"] = "llm"
+        drools = (await drools_chain().ainvoke(drools_inputs(question, result))).content
+    record["drools"] = drools
+    return record, result
+
+
+def main():
+    print("User question: \n")
+    user_question = input("Enter the question!")
+    record, result = run_pipeline(user_question)
+    if record["error"]:
+        print(record["error"])
+
+    print("---"*100)
+    print(result)
+    print("\n\n")
+    print("---"*100)
+    print(record["drools"])
 
-chain = final_execution | llm 
 
-drools_output = chain.invoke({"question": user_question, "sql_output":output})
-print("---"*100)
-print(drools_output.content)
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+import sql_agent
+
+
+SQL_BATCH_CONCURRENCY = int(os.getenv("SQL_BATCH_CONCURRENCY", "8"))
+
+
+def read_questions(path):
+    """
+        One question per JSONL line, either {"id": ..., "question": ...} or a bare string.
+        Lines without an id get their line number.
+    """
+    questions = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            if isinstance(item, str):
+                item = {"question": item}
+            questions.append({"id": str(item.get("id", line_number)), "question": item["question"]})
+    return questions
+
+
+def completed_ids(path):
+    """
+        Ids already written to the output file; a truncated last line from an interrupted
+        run is ignored and that question is run again.
+    """
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                done.add(str(json.loads(line)["id"]))
+            except (ValueError, KeyError):
+                continue
+    return done
+
+
+async def process(item, semaphore):
+    async with semaphore:
+        started = time.perf_counter()
+        try:
+            record, _ = await sql_agent.arun_pipeline(item["question"])
+        except Exception as e:
+            record = {"question": item["question"], "sql": None, "error": f"{type(e).__name__}: {e}"}
+        record["id"] = item["id"]
+        record["seconds"] = round(time.perf_counter() - started, 3)
+        return record
+
+
+async def run_batch(input_path, output_path, concurrency=SQL_BATCH_CONCURRENCY):
+    """
+        Runs the generate -> execute -> Drools pipeline for every question not yet in the
+        output file, at most `concurrency` at a time, appending each record as soon as it
+        completes.
+    """
+    done = completed_ids(output_path)
+    pending = [item for item in read_questions(input_path) if item["id"] not in done]
+    print(f"{len(done)} questions already done, {len(pending)} to run with concurrency {concurrency}")
+    if pending and os.path.exists(output_path) and os.path.getsize(output_path):
+        with open(output_path, "rb+") as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+    semaphore = asyncio.Semaphore(concurrency)
+    started = time.perf_counter()
+    stats = {"completed": 0, "errors": 0}
+    with open(output_path, "a", encoding="utf-8") as out:
+        for task in asyncio.as_completed([process(item, semaphore) for item in pending]):
+            record = await task
+            out.write(json.dumps(record, default=str) + "\n")
+            out.flush()
+            stats["completed"] += 1
+            stats["errors"] += bool(record["error"])
+    stats["seconds"] = round(time.perf_counter() - started, 3)
+    print(f"Batch finished: {stats}")
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert a JSONL file of business questions into SQL results and Drools rules")
+    parser.add_argument("input", help="JSONL with {\"id\", \"question\"} per line")
+    parser.add_argument("output", help="JSONL results, appended to and used to resume")
+    parser.add_argument("--concurrency", type=int, default=SQL_BATCH_CONCURRENCY)
+    args = parser.parse_args()
+    asyncio.run(run_batch(args.input, args.output, args.concurrency))
@@ -0,0 +1,162 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from sql_results import MAX_ROWS, STRING_LITERAL
+from sql_schema import get_schema_index
+
+
+SQL_MAX_ESTIMATED_ROWS = int(os.getenv("SQL_MAX_ESTIMATED_ROWS", "1000000"))
+SQL_LIMIT_OVER_ROWS = int(os.getenv("SQL_LIMIT_OVER_ROWS", "10000"))
+SQL_TIME_BUDGET_SECONDS = float(os.getenv("SQL_TIME_BUDGET_SECONDS", "5"))
+PROGRESS_INSTRUCTIONS = 10_000
+
+NOT_ALIASES = {
+    "where", "join", "on", "inner", "left", "right", "cross", "natural", "full", "outer", "group",
+    "order", "limit", "using", "union", "except", "intersect", "having", "window", "indexed", "not",
+}
+AGGREGATE = re.compile(r"\b(count|sum|avg|min|max|total|group_concat)\s*\(")
+
+
+class QueryRejected(ValueError):
+    pass
+
+
+class QueryTimeout(RuntimeError):
+    pass
+
+
+def connect_readonly(path: str, check_same_thread: bool = True) -> sqlite3.Connection:
+    """
+        Opens the database with mode=ro and query_only so generated SQL can never write.
+    """
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=check_same_thread)
+    conn.execute("PRAGMA query_only = ON")
+    return conn
+
+
+def strip_literals(sql: str) -> str:
+    return STRING_LITERAL.sub("''", sql)
+
+
+def table_aliases(sql: str, tables) -> dict:
+    """
+        Maps every alias (and the table name itself) used in the query to its table.
+    """
+    aliases = {}
+    for table in tables:
+        aliases[table.lower()] = table
+        pattern = rf'(?<![\w.])"?{re.escape(table)}"?(?:\s+(?:as\s+)?(\w+))?'
+        for match in re.finditer(pattern, sql, flags=re.IGNORECASE):
+            alias = match.group(1)
+            if alias and alias.lower() not in NOT_ALIASES:
+                aliases[alias.lower()] = table
+    return aliases
+
+
+def has_top_level_limit(bare: str) -> bool:
+    """
+        True when the outermost statement has a LIMIT; one inside a subquery or CTE body
+        (between parentheses) does not bound the rows returned.
+    """
+    depth = 0
+    for match in re.finditer(r"[()]|\blimit\b", bare):
+        token = match.group(0)
+        if token == "(":
+            depth += 1
+        elif token == ")":
+            depth -= 1
+        elif depth == 0:
+            return True
+    return False
+
+
+class QueryGuard:
+    """
+        Checks LLM generated SQL before it runs: EXPLAIN QUERY PLAN gives the full scans,
+        whose row counts are multiplied into an estimate of the rows visited. Streaming
+        queries without a top-level LIMIT get one appended, so they read at most auto_limit
+        rows with their columns unchanged; queries that
+        would still visit more than max_estimated_rows are rejected. Execution itself is
+        aborted by a progress handler once the wall-clock budget is spent.
+    """
+    def __init__(self, db_path: str, max_estimated_rows: int = SQL_MAX_ESTIMATED_ROWS,
+                 limit_over_rows: int = SQL_LIMIT_OVER_ROWS, auto_limit: int = MAX_ROWS + 1,
+                 time_budget: float = SQL_TIME_BUDGET_SECONDS):
+        self.db_path = db_path
+        self.max_estimated_rows = max_estimated_rows
+        self.limit_over_rows = limit_over_rows
+        self.auto_limit = auto_limit
+        self.time_budget = time_budget
+        self.counters = {"checked": 0, "rewritten": 0, "rejected": 0, "timeouts": 0}
+        self._lock = threading.Lock()
+
+    def _count(self, name: str):
+        with self._lock:
+            self.counters[name] += 1
+
+    def estimate(self, conn, sql: str):
+        """
+            Returns (estimated rows visited, query plan lines).
+        """
+        row_counts = {name: table["rows"] for name, table in get_schema_index(self.db_path).tables.items()}
+        aliases = table_aliases(strip_literals(sql), row_counts)
+        plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}")]
+        estimate = 1
+        for detail in plan:
+            match = re.match(r"SCAN (\w+)", detail)
+            if match:
+                table = aliases.get(match.group(1).lower(), match.group(1))
+                estimate *= max(row_counts.get(table, 1), 1)
+        return estimate, plan
+
+    def check(self, conn, sql: str) -> str:
+        """
+            Returns the SQL to execute (possibly with a LIMIT added) or raises QueryRejected.
+        """
+        self._count("checked")
+        statement = sql.strip().rstrip(";").strip()
+        bare = strip_literals(statement).lower()
+        if ";" in bare or not re.match(r"(select|with)\b", bare):
+            self._count("rejected")
+            raise QueryRejected("Only a single SELECT statement is allowed.")
+        try:
+            estimate, plan = self.estimate(conn, statement)
+        except sqlite3.Error as e:
+            self._count("rejected")
+            raise QueryRejected(f"Invalid query: {e}")
+        streaming = not any("TEMP B-TREE" in detail for detail in plan) and not AGGREGATE.search(bare)
+        if not has_top_level_limit(bare) and streaming and estimate > self.limit_over_rows:
+            self._count("rewritten")
+            # on its own line, so a trailing -- comment cannot swallow it
+            return f"{statement}\nLIMIT {self.auto_limit}"
+        if estimate > self.max_estimated_rows:
+            self._count("rejected")
+            raise QueryRejected(
+                f"Query would visit about {estimate:,} rows (limit {self.max_estimated_rows:,}). "
+                f"Plan: {'; '.join(plan)}. Add join conditions, filters or a LIMIT."
+            )
+        return statement
+
+    @contextmanager
+    def budget(self, conn):
+        """
+            Aborts any statement on the connection that runs longer than time_budget.
+        """
+        deadline = time.monotonic() + self.time_budget
+        conn.set_progress_handler(lambda: 1 if time.monotonic() > deadline else 0, PROGRESS_INSTRUCTIONS)
+        try:
+            yield
+        except sqlite3.OperationalError as e:
+            if "interrupted" not in str(e):
+                raise
+            self._count("timeouts")
+            raise QueryTimeout(f"Query exceeded the {self.time_budget:g}s time budget and was aborted.")
+        finally:
+            conn.set_progress_handler(None, 0)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self.counters)
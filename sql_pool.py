@@ -0,0 +1,84 @@
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from sql_guard import connect_readonly
+
+
+SQL_POOL_SIZE = int(os.getenv("SQL_POOL_SIZE", str(min(8, (os.cpu_count() or 1) * 2))))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_KIB = int(os.getenv("SQLITE_CACHE_KIB", str(64 * 1024)))
+
+
+class ReadOnlyConnectionPool:
+    """
+        Fixed-size pool of read-only SQLite connections tuned for reads (mmap, larger page
+        cache, in-memory temp store, query_only). Connections are created on demand and
+        handed to one thread at a time, so concurrent callers run their queries in parallel
+        instead of serialising on a single connection.
+    """
+    def __init__(self, path: str, size: int = SQL_POOL_SIZE, mmap_size: int = SQLITE_MMAP_SIZE,
+                 cache_kib: int = SQLITE_CACHE_KIB, timeout: float = 30.0):
+        self.path = path
+        self.size = size
+        self.mmap_size = mmap_size
+        self.cache_kib = cache_kib
+        self.timeout = timeout
+        self.created = 0
+        self.waits = 0
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._all = []
+
+    def _connect(self):
+        conn = connect_readonly(self.path, check_same_thread=False)
+        conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        conn.execute(f"PRAGMA cache_size = {-int(self.cache_kib)}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        return conn
+
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self.created < self.size:
+                self.created += 1
+                conn = self._connect()
+                self._all.append(conn)
+                return conn
+            self.waits += 1
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No SQLite connection available after {self.timeout}s")
+
+    def release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self):
+        with self._lock:
+            for conn in self._all:
+                conn.close()
+            self._all.clear()
+            self.created = 0
+            self._idle = queue.LifoQueue()
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size,
+            "created": self.created,
+            "idle": self._idle.qsize(),
+            "waits": self.waits,
+        }
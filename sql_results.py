@@ -0,0 +1,236 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterator, List, Optional
+
+
+MAX_ROWS = 500
+MAX_BYTES = 256_000
+PAGE_SIZE = 100
+TRUNCATION_MARKER = "... [truncated: {shown} rows shown, more rows available]"
+
+SQL_CACHE_MAX_ENTRIES = int(os.getenv("SQL_CACHE_MAX_ENTRIES", "256"))
+SQL_CACHE_MAX_BYTES = int(os.getenv("SQL_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+SQLITE_TYPES = {int: "INTEGER", float: "REAL", str: "TEXT", bytes: "BLOB", bool: "INTEGER"}
+
+
+def iter_pages(cursor, page_size: int = PAGE_SIZE) -> Iterator[list]:
+    """
+        Rows of an executed cursor in fixed-size pages, never the whole result at once.
+    """
+    while True:
+        page = cursor.fetchmany(page_size)
+        if not page:
+            return
+        yield page
+
+
+def value_size(value) -> int:
+    if value is None:
+        return 4
+    if isinstance(value, (bytes, str)):
+        return len(value)
+    return 8
+
+
+class QueryResult:
+    """
+        Typed, columnar result of a query: column names, inferred column types and the
+        rows that fitted under the row/byte caps.
+    """
+    def __init__(self, sql: str, columns: List[str]):
+        self.sql = sql
+        self.columns = columns
+        self.types: List[Optional[str]] = [None] * len(columns)
+        self.rows: List[tuple] = []
+        self.bytes = 0
+        self.truncated = False
+        self.elapsed = 0.0
+
+    def add(self, row: tuple):
+        for position, value in enumerate(row):
+            if value is not None and self.types[position] is None:
+                self.types[position] = SQLITE_TYPES.get(type(value), "TEXT")
+        self.rows.append(tuple(row))
+
+    def column(self, name: str) -> list:
+        position = self.columns.index(name)
+        return [row[position] for row in self.rows]
+
+    def to_dict(self) -> dict:
+        return {
+            "columns": self.columns,
+            "types": [column_type or "NULL" for column_type in self.types],
+            "rows": [list(row) for row in self.rows],
+            "row_count": len(self.rows),
+            "truncated": self.truncated,
+        }
+
+    def to_text(self, max_rows: Optional[int] = None) -> str:
+        """
+            Pipe separated table, ending with an explicit marker when rows were cut.
+        """
+        rows = self.rows if max_rows is None else self.rows[:max_rows]
+        lines = [" | ".join(self.columns)]
+        lines.extend(" | ".join("NULL" if value is None else str(value) for value in row) for row in rows)
+        if self.truncated or len(rows) < len(self.rows):
+            lines.append(TRUNCATION_MARKER.format(shown=len(rows)))
+        return "\n".join(lines)
+
+    def summary(self, sample_rows: int = 10) -> str:
+        """
+            Compact description for downstream prompts: per-column type and statistics
+            (min/max/mean for numbers, distinct count and most common values for text)
+            followed by the first rows.
+        """
+        total = f"{len(self.rows)}{'+' if self.truncated else ''}"
+        lines = [f"Rows: {total}", "Columns:"]
+        for position, name in enumerate(self.columns):
+            values = [row[position] for row in self.rows if row[position] is not None]
+            column_type = self.types[position] or "NULL"
+            line = f"- {name} ({column_type})"
+            if values and column_type in ("INTEGER", "REAL"):
+                line += f": min={min(values)}, max={max(values)}, mean={sum(values) / len(values):.2f}"
+            elif values:
+                counts = {}
+                for value in values:
+                    counts[value] = counts.get(value, 0) + 1
+                common = sorted(counts, key=lambda value: -counts[value])[:3]
+                line += f": {len(counts)} distinct, e.g. " + ", ".join(repr(str(value)[:40]) for value in common)
+            lines.append(line)
+        lines.append("Sample:")
+        lines.append(self.to_text(max_rows=sample_rows))
+        return "\n".join(lines)
+
+    def __str__(self):
+        return self.to_text()
+
+
+def run_query(conn, sql: str, max_rows: int = MAX_ROWS, max_bytes: int = MAX_BYTES,
+              page_size: int = PAGE_SIZE) -> QueryResult:
+    """
+        Executes the query and reads it page by page until the result ends or the row or
+        byte cap is hit; in the latter case the cursor is abandoned and the result marked
+        truncated.
+    """
+    started = time.perf_counter()
+    cursor = conn.execute(sql)
+    try:
+        columns = [column[0] for column in cursor.description or []]
+        result = QueryResult(sql, columns)
+        for page in iter_pages(cursor, page_size):
+            for row in page:
+                size = sum(value_size(value) for value in row)
+                if len(result.rows) >= max_rows or result.bytes + size > max_bytes:
+                    result.truncated = True
+                    break
+                result.bytes += size
+                result.add(row)
+            if result.truncated:
+                break
+    finally:
+        cursor.close()
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+STRING_LITERAL = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")")
+
+
+def normalize_sql(sql: str) -> str:
+    """
+        Cache key of a query: whitespace collapsed and keywords/identifiers lower-cased,
+        quoted literals kept verbatim, trailing semicolons dropped.
+    """
+    parts = []
+    for position, part in enumerate(STRING_LITERAL.split(sql.strip().rstrip(";").strip())):
+        if position % 2:
+            parts.append(part)
+        else:
+            parts.append(re.sub(r"\s+", " ", part.lower()))
+    return "".join(parts).strip()
+
+
+class SQLResultCache:
+    """
+        LRU cache of QueryResults keyed by normalized SQL, bounded by entry count and by the
+        result bytes. Everything is dropped as soon as the database file changes, detected by
+        the file size/mtime and by PRAGMA data_version on a watcher connection.
+    """
+    def __init__(self, db_path: str, max_entries: int = SQL_CACHE_MAX_ENTRIES,
+                 max_bytes: int = SQL_CACHE_MAX_BYTES):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._watcher = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, check_same_thread=False)
+        self._version = self.database_version()
+
+    def database_version(self):
+        stat = os.stat(self.db_path)
+        data_version = self._watcher.execute("PRAGMA data_version").fetchone()[0]
+        return stat.st_size, stat.st_mtime_ns, data_version
+
+    def _check_version(self):
+        version = self.database_version()
+        if version != self._version:
+            self._version = version
+            if self._data:
+                self.invalidations += 1
+            self._data.clear()
+            self.bytes = 0
+
+    def get(self, sql: str) -> Optional[QueryResult]:
+        key = normalize_sql(sql)
+        with self._lock:
+            self._check_version()
+            result = self._data.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, sql: str, result: QueryResult):
+        if result.bytes > self.max_bytes:
+            return
+        key = normalize_sql(sql)
+        with self._lock:
+            self._check_version()
+            previous = self._data.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous.bytes
+            self._data[key] = result
+            self.bytes += result.bytes
+            while len(self._data) > self.max_entries or self.bytes > self.max_bytes:
+                _, evicted = self._data.popitem(last=False)
+                self.bytes -= evicted.bytes
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
@@ -0,0 +1,258 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+from contextlib import closing
+from collections import deque
+from typing import Dict, List, Optional
+
+
+SCHEMA_CACHE_DIR = ".schema_cache"
+SAMPLE_VALUES = 3
+# text columns with at most this many distinct values are indexed for value matching
+MAX_INDEXED_VALUES = 50
+
+SYNONYMS = {
+    "song": "track", "songs": "track", "tune": "track", "music": "track",
+    "sale": "invoice", "sales": "invoice", "revenue": "invoice", "order": "invoice",
+    "purchase": "invoice", "bought": "invoice", "spent": "invoice", "spend": "invoice",
+    "singer": "artist", "band": "artist", "musician": "artist",
+    "staff": "employee", "rep": "employee", "manager": "employee",
+    "category": "genre", "style": "genre", "format": "mediatype", "record": "album",
+}
+
+
+def split_identifier(name: str) -> List[str]:
+    """
+        "InvoiceLine" -> ["invoice", "line"], "media_type_id" -> ["media", "type", "id"].
+    """
+    parts = re.findall(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+", name)
+    return [part.lower() for part in parts]
+
+
+def question_terms(question: str) -> set:
+    terms = set()
+    for word in re.findall(r"[a-z0-9]+", question.lower()):
+        terms.add(word)
+        if word.endswith("ies"):
+            terms.add(word[:-3] + "y")
+        elif word.endswith("s") and len(word) > 3:
+            terms.add(word[:-1])
+        if word in SYNONYMS:
+            terms.add(SYNONYMS[word])
+    return terms
+
+
+_fingerprints: Dict[str, tuple] = {}
+
+
+def file_state(path: str) -> tuple:
+    # a write in WAL mode only touches the -wal file until the next checkpoint
+    states = []
+    for name in (path, path + "-wal"):
+        try:
+            stat = os.stat(name)
+        except FileNotFoundError:
+            continue
+        states.append((stat.st_size, stat.st_mtime_ns))
+    if not states:
+        raise FileNotFoundError(path)
+    return tuple(states)
+
+
+def db_fingerprint(path: str) -> str:
+    """
+        Size, mtime and PRAGMA schema_version of the database. The schema version is only
+        read (with a new connection) when the files changed since the last call; otherwise
+        this is two stat() calls.
+    """
+    state = file_state(path)
+    cached = _fingerprints.get(path)
+    if cached is not None and cached[0] == state:
+        return cached[1]
+    stat = os.stat(path)
+    with closing(sqlite3.connect(f"file:{path}?mode=ro", uri=True)) as conn:
+        schema_version = conn.execute("PRAGMA schema_version").fetchone()[0]
+    fingerprint = f"{stat.st_size}:{stat.st_mtime_ns}:{schema_version}"
+    _fingerprints[path] = (state, fingerprint)
+    return fingerprint
+
+
+class SchemaIndex:
+    """
+        Tables, columns, types, foreign keys and a few sample values of a SQLite database,
+        built once and used to put only the tables relevant to a question (plus the tables
+        needed to join them) into the prompt.
+    """
+    def __init__(self, tables: Dict[str, dict], fingerprint: str = ""):
+        self.tables = tables
+        self.fingerprint = fingerprint
+        self._name_terms = {name: set(split_identifier(name)) | {name.lower()} for name in tables}
+
+    @classmethod
+    def build(cls, path: str) -> "SchemaIndex":
+        fingerprint = db_fingerprint(path)
+        tables = {}
+        with closing(sqlite3.connect(f"file:{path}?mode=ro", uri=True)) as conn:
+            names = [row[0] for row in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
+            )]
+            for name in names:
+                columns = []
+                for _, column, column_type, notnull, _, pk in conn.execute(f'PRAGMA table_info("{name}")'):
+                    samples = [row[0] for row in conn.execute(
+                        f'SELECT DISTINCT "{column}" FROM "{name}" WHERE "{column}" IS NOT NULL LIMIT {SAMPLE_VALUES}'
+                    )]
+                    values = []
+                    if column_type.upper().startswith(("NVARCHAR", "VARCHAR", "TEXT", "CHAR")):
+                        distinct = conn.execute(
+                            f'SELECT DISTINCT "{column}" FROM "{name}" WHERE "{column}" IS NOT NULL LIMIT {MAX_INDEXED_VALUES + 1}'
+                        ).fetchall()
+                        if len(distinct) <= MAX_INDEXED_VALUES:
+                            values = [str(row[0]) for row in distinct]
+                    columns.append({
+                        "name": column,
+                        "type": column_type,
+                        "pk": bool(pk),
+                        "notnull": bool(notnull),
+                        "samples": [str(sample)[:40] for sample in samples],
+                        "values": values,
+                    })
+                foreign_keys = [
+                    {"column": row[3], "table": row[2], "ref_column": row[4]}
+                    for row in conn.execute(f'PRAGMA foreign_key_list("{name}")')
+                ]
+                rows = conn.execute(f'SELECT COUNT(*) FROM "{name}"').fetchone()[0]
+                tables[name] = {"columns": columns, "foreign_keys": foreign_keys, "rows": rows}
+        return cls(tables, fingerprint)
+
+    def to_json(self) -> dict:
+        return {"fingerprint": self.fingerprint, "tables": self.tables}
+
+    # relevance
+    def score_tables(self, question: str) -> Dict[str, float]:
+        terms = question_terms(question)
+        lowered = question.lower()
+        scores = {}
+        for name, table in self.tables.items():
+            score = 0.0
+            if self._name_terms[name] & terms or name.lower() in terms:
+                score += 3.0
+            for column in table["columns"]:
+                column_terms = set(split_identifier(column["name"])) - {"id"}
+                if column_terms and column_terms <= terms:
+                    score += 1.0
+                elif column_terms & terms:
+                    score += 0.3
+                for value in column["values"]:
+                    if len(value) > 2 and re.search(rf"\b{re.escape(value.lower())}\b", lowered):
+                        score += 2.0
+                        break
+            if score:
+                scores[name] = score
+        return scores
+
+    def neighbours(self) -> Dict[str, set]:
+        graph = {name: set() for name in self.tables}
+        for name, table in self.tables.items():
+            for fk in table["foreign_keys"]:
+                if fk["table"] in graph and fk["table"] != name:
+                    graph[name].add(fk["table"])
+                    graph[fk["table"]].add(name)
+        return graph
+
+    def join_path(self, source: str, target: str, graph: Dict[str, set]) -> List[str]:
+        previous = {source: None}
+        queue = deque([source])
+        while queue:
+            current = queue.popleft()
+            if current == target:
+                path = []
+                while current is not None:
+                    path.append(current)
+                    current = previous[current]
+                return path[::-1]
+            for nxt in sorted(graph[current]):
+                if nxt not in previous:
+                    previous[nxt] = current
+                    queue.append(nxt)
+        return []
+
+    def select_tables(self, question: str, max_tables: int = 4) -> List[str]:
+        """
+            The best scoring tables plus every table on the shortest foreign-key path
+            connecting them. Falls back to all tables when nothing matches.
+        """
+        scores = self.score_tables(question)
+        if not scores:
+            return list(self.tables)
+        ranked = sorted(scores, key=lambda name: (-scores[name], name))[:max_tables]
+        graph = self.neighbours()
+        selected = [ranked[0]]
+        for table in ranked[1:]:
+            paths = [self.join_path(anchor, table, graph) for anchor in selected]
+            paths = [path for path in paths if path]
+            if not paths:
+                selected.append(table)
+                continue
+            for name in min(paths, key=len):
+                if name not in selected:
+                    selected.append(name)
+        return selected
+
+    def render(self, names: List[str]) -> str:
+        """
+            Compact schema text: one line per table with column types, keys and sample values.
+        """
+        lines = []
+        for name in names:
+            table = self.tables[name]
+            references = {fk["column"]: f'{fk["table"]}.{fk["ref_column"]}' for fk in table["foreign_keys"]}
+            columns = []
+            for column in table["columns"]:
+                text = f'{column["name"]} {column["type"]}'
+                if column["pk"]:
+                    text += " PK"
+                if column["name"] in references:
+                    text += f' -> {references[column["name"]]}'
+                elif not column["pk"] and column["samples"] and not column["name"].endswith("Id"):
+                    text += " e.g. " + ", ".join(repr(sample) for sample in column["samples"])
+                columns.append(text)
+            lines.append(f'{name} ({table["rows"]} rows): ' + "; ".join(columns))
+        return "\n".join(lines)
+
+    def context_for(self, question: str, max_tables: int = 4) -> str:
+        return self.render(self.select_tables(question, max_tables))
+
+
+_indexes: Dict[str, SchemaIndex] = {}
+_lock = threading.Lock()
+
+
+def get_schema_index(path: str, cache_dir: Optional[str] = SCHEMA_CACHE_DIR) -> SchemaIndex:
+    """
+        In-process and on-disk cached SchemaIndex; rebuilt when the file size, mtime or
+        PRAGMA schema_version change.
+    """
+    fingerprint = db_fingerprint(path)
+    with _lock:
+        index = _indexes.get(path)
+        if index is not None and index.fingerprint == fingerprint:
+            return index
+        cache_path = None
+        if cache_dir:
+            cache_path = os.path.join(cache_dir, os.path.basename(path) + ".schema.json")
+            if os.path.exists(cache_path):
+                with open(cache_path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if data.get("fingerprint") == fingerprint:
+                    index = SchemaIndex(data["tables"], fingerprint)
+        if index is None or index.fingerprint != fingerprint:
+            index = SchemaIndex.build(path)
+            if cache_path:
+                os.makedirs(cache_dir, exist_ok=True)
+                with open(cache_path, "w", encoding="utf-8") as f:
+                    json.dump(index.to_json(), f)
+        _indexes[path] = index
+        return index
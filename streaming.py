@@ -0,0 +1,188 @@
+import re
+import time
+
+from metrics import metrics
+from router import RETRIEVER_ROUTE
+
+
+# nodes whose LLM output is the answer shown to the user
+ANSWER_NODES = ("boss", "final_answer", "direct_answer")
+ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+ANSWER_KEY = re.compile(r'"answer"\s*:\s*"')
+PARTIAL_TAG = re.compile(r"<[^<>]*$")
+LOW_SURROGATE = re.compile(r"\\u[dD][c-fC-F][0-9a-fA-F]{2}")
+LOW_SURROGATE_PREFIX = re.compile(r"\\(u([dD]([c-fC-F][0-9a-fA-F]{0,1})?)?)?")
+
+
+class AnswerStreamExtractor:
+    """
+        Incrementally decodes the "answer" string out of streamed ```json{"answer": "..."}```
+        output, so text is shown while the wrapper is still open. Escapes split across
+        chunks (\\, \\u00e9, surrogate pairs) wait for the next chunk; a lone surrogate
+        becomes U+FFFD so the text always encodes as UTF-8. Output that does not start
+        with a JSON object is passed through as is.
+    """
+    def __init__(self):
+        self.buffer = ""
+        self.position = 0
+        self.state = "seek"
+        self.answer = ""
+
+    def feed(self, chunk: str) -> str:
+        """
+            Adds raw model output and returns the answer text decoded from it.
+        """
+        before = len(self.answer)
+        self.buffer += chunk
+        if self.state == "seek":
+            head = self.buffer.lstrip()
+            head = head[len("```json"):] if head.startswith("```json") else head.lstrip("`")
+            head = head.lstrip()
+            if head and not head.startswith("{") and not "```json".startswith(self.buffer.lstrip()):
+                self.state = "raw"
+                self.answer = self.buffer
+                return self.answer[before:]
+            match = ANSWER_KEY.search(self.buffer)
+            if match:
+                self.state = "value"
+                self.position = match.end()
+        if self.state == "value":
+            self._decode()
+        elif self.state == "raw":
+            self.answer += chunk
+        return self.answer[before:]
+
+    def _decode(self):
+        buffer, position, out = self.buffer, self.position, []
+        while position < len(buffer):
+            char = buffer[position]
+            if char == '"':
+                self.state = "done"
+                position += 1
+                break
+            if char != "\\":
+                out.append(char)
+                position += 1
+                continue
+            if position + 1 >= len(buffer):
+                break
+            escape = buffer[position + 1]
+            if escape == "u":
+                digits = buffer[position + 2:position + 6]
+                if len(digits) < 4:
+                    break
+                code = int(digits, 16)
+                if 0xD800 <= code < 0xDC00:
+                    # high surrogate: combine with the low one that follows (json.dumps
+                    # writes emoji as a pair), waiting for it if it is still in flight
+                    low = buffer[position + 6:position + 12]
+                    if low and not LOW_SURROGATE.match(low):
+                        if len(low) < 6 and LOW_SURROGATE_PREFIX.fullmatch(low):
+                            break
+                        out.append("\ufffd")
+                        position += 6
+                        continue
+                    if len(low) < 6:
+                        break
+                    code = 0x10000 + ((code - 0xD800) << 10) + (int(low[2:], 16) - 0xDC00)
+                    position += 6
+                elif 0xDC00 <= code < 0xE000:
+                    code = 0xFFFD
+                out.append(chr(code))
+                position += 6
+            else:
+                out.append(ESCAPES.get(escape, escape))
+                position += 2
+        self.position = position
+        self.answer += "".join(out)
+
+
+def visible_html(text: str) -> str:
+    """
+        Drops a tag that is still being streamed ("<stro") so it is not rendered as text.
+    """
+    return PARTIAL_TAG.sub("", text)
+
+
+def answer_text(message) -> str:
+    if isinstance(message, dict):
+        return str(message.get("answer", message))
+    if isinstance(message, tuple) and len(message) >= 2:
+        return str(message[1])
+    if hasattr(message, "content"):
+        return message.content
+    return str(message)
+
+
+class AnswerStream:
+    """
+        Turns workflow.stream/astream(stream_mode=["messages", "values"]) events into the
+        text to display. The supervisor's route ("retreiveragent") is held back, and
+        time_to_first_token_seconds / answer_latency_seconds are recorded per request.
+    """
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.first_token_at = None
+        self.extractors = {}
+        self.final_state = None
+        self.text = ""
+
+    def _first_token(self):
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+            metrics.observe("time_to_first_token_seconds", self.first_token_at - self.started)
+
+    def handle(self, mode, data):
+        """
+            Returns the updated answer text, or None when nothing visible changed.
+        """
+        if mode == "values":
+            self.final_state = data
+            return None
+        chunk, metadata = data
+        node = metadata.get("langgraph_node")
+        content = getattr(chunk, "content", "")
+        if node not in ANSWER_NODES or not isinstance(content, str) or not content:
+            return None
+        extractor = self.extractors.setdefault((node, metadata.get("langgraph_checkpoint_ns")), AnswerStreamExtractor())
+        extractor.feed(content)
+        if node == "boss" and RETRIEVER_ROUTE.startswith(extractor.answer.strip()):
+            return None
+        text = visible_html(extractor.answer)
+        if not text or text == self.text:
+            return None
+        self._first_token()
+        self.text = text
+        return text
+
+    def finish(self) -> str:
+        """
+            The complete answer from the final graph state (covers answers that were not
+            streamed, e.g. local router replies).
+        """
+        self._first_token()
+        metrics.observe("answer_latency_seconds", time.perf_counter() - self.started)
+        messages = (self.final_state or {}).get("messages") or []
+        self.text = answer_text(messages[-1]) if messages else self.text
+        return self.text
+
+
+def stream_answer(workflow, payload, config=None):
+    """
+        Yields the growing answer text while the graph runs, then the final answer.
+    """
+    stream = AnswerStream()
+    for mode, data in workflow.stream(payload, config=config, stream_mode=["messages", "values"]):
+        text = stream.handle(mode, data)
+        if text is not None:
+            yield text
+    yield stream.finish()
+
+
+async def astream_answer(workflow, payload, config=None):
+    stream = AnswerStream()
+    async for mode, data in workflow.astream(payload, config=config, stream_mode=["messages", "values"]):
+        text = stream.handle(mode, data)
+        if text is not None:
+            yield text
+    yield stream.finish()
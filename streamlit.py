@@ -1,35 +1,57 @@
+import time
+_startup_started = time.perf_counter()
 import gradio as gr
+import os
+import threading
 import uuid
 from datetime import datetime
 import json
-from agentic import get_workflow
+from metrics import metrics, sampled_debug_callbacks, start_metrics_server, startup_step, startup_timings
+from retrieval import LRUCache
+from streaming import astream_answer
 
-# Import your workflow function
-# from your_module import get_workflow  # Replace with your actual import
+with startup_step("import_workflow"):
+    import agentic
 
-# Initialize the workflow
+# Initialize the workflow (clients, vector store and graph image are created lazily)
 print("🚀 Initializing LangGraph workflow...")
 try:
-    workflow = get_workflow()
+    workflow = agentic.get_workflow()
     print("✅ Workflow initialized successfully!")
 except Exception as e:
     print(f"❌ Error initializing workflow: {e}")
     workflow = None
+startup_timings["ready"] = round((time.perf_counter() - _startup_started) * 1000, 2)
+print(f"⏱️ Startup breakdown (ms): {json.dumps(startup_timings)}")
 
-# Global variable to store conversation state
-conversation_state = {}
+# Build LLM clients and the vector store in the background so the first request does not pay for them
+if workflow and os.getenv("WARMUP", "1") == "1":
+    threading.Thread(target=agentic.get_registry().warmup, daemon=True).start()
 
-def chat_with_workflow(message, history, thread_id):
+# Number of chat requests one process serves at the same time (workflow runs on the event loop)
+GRADIO_CONCURRENCY = int(os.getenv("GRADIO_CONCURRENCY", "64"))
+GRADIO_MAX_QUEUE = int(os.getenv("GRADIO_MAX_QUEUE", "256"))
+
+# Global variable to store conversation state, bounded so idle threads are dropped
+conversation_state = LRUCache(
+    max_entries=int(os.getenv("CONVERSATION_STATE_MAX", "1000")),
+    ttl=float(os.getenv("CONVERSATION_STATE_TTL", "3600"))
+)
+
+async def chat_with_workflow(message, history, thread_id):
     """
-    Main chat function that integrates with your LangGraph workflow
+    Main chat function that integrates with your LangGraph workflow.
+    Yields (history, thread_id) as answer tokens arrive so the reply renders incrementally.
     """
     global conversation_state
     
     if not workflow:
-        return history + [["Error: Workflow not initialized", None]], thread_id
+        yield history + [["Error: Workflow not initialized", None]], thread_id
+        return
     
     if not message.strip():
-        return history, thread_id
+        yield history, thread_id
+        return
     
     # Generate thread ID if not provided
     if not thread_id:
@@ -40,30 +62,17 @@ def chat_with_workflow(message, history, thread_id):
         print(f"📨 Processing message: {message}")
         print(f"🧵 Thread ID: {thread_id}")
         
-        # Invoke your workflow with the exact format you specified
-        result = workflow.invoke(
-            {
-                "messages": [("user", message)]
-            },
-            config={"configurable": {"thread_id": thread_id}}
-        )
+        # Stream the workflow asynchronously so other sessions keep being served; the
+        # answer nodes' tokens arrive as they are generated
+        bot_response = ""
+        async for bot_response in astream_answer(
+            workflow,
+            {"messages": [("user", message)]},
+            config={"configurable": {"thread_id": thread_id}, "callbacks": sampled_debug_callbacks()}
+        ):
+            yield history + [[message, bot_response]], thread_id
         
-        # Extract the bot response from the workflow result
-        if "messages" in result and len(result["messages"]) > 0:
-            # Get the last message which should be the bot's response
-            last_message = result["messages"][-1]
-            print(last_message)
-            
-            # Handle different message formats
-            if isinstance(last_message, tuple) and len(last_message) >= 2:
-                bot_response = last_message[1]  # (role, content) format
-            elif hasattr(last_message, 'content'):
-                bot_response = last_message.content  # Message object with content attribute
-            elif isinstance(last_message, str):
-                bot_response = last_message
-            else:
-                bot_response = str(last_message)
-        else:
+        if not bot_response:
             bot_response = "I apologize, but I couldn't generate a response. Please try again."
         
         print(f"🤖 Bot response: {bot_response}")
@@ -72,17 +81,17 @@ def chat_with_workflow(message, history, thread_id):
         new_history = history + [[message, bot_response]]
         
         # Store conversation state
-        conversation_state[thread_id] = {
+        conversation_state.put(thread_id, {
             "history": new_history,
             "last_updated": datetime.now().isoformat()
-        }
+        })
         
-        return new_history, thread_id
+        yield new_history, thread_id
         
     except Exception as e:
         error_message = f"❌ Error processing request: {str(e)}"
         print(error_message)
-        return history + [[message, error_message]], thread_id
+        yield history + [[message, error_message]], thread_id
 
 def clear_conversation():
     """Clear the current conversation"""
@@ -118,91 +127,26 @@ def get_workflow_info():
     if workflow:
         try:
             # Try to get workflow graph information
+            snapshot = metrics.snapshot()
             info = {
                 "status": "✅ Initialized",
                 "type": str(type(workflow)),
                 "thread_support": "✅ Enabled",
-                "timestamp": datetime.now().isoformat()
+                "timestamp": datetime.now().isoformat(),
+                "latency_and_tokens (p50 / p95 / p99)": {
+                    name: f"{values['p50']:.4f} / {values['p95']:.4f} / {values['p99']:.4f}  (n={values['count']})"
+                    for name, values in snapshot["histograms"].items()
+                },
+                "counters": snapshot["counters"],
+                "caches_and_routing": {k: v for k, v in snapshot["collectors"].items() if k != "startup_ms"},
+                "startup_ms": dict(startup_timings),
             }
-            return json.dumps(info, indent=2)
+            return json.dumps(info, indent=2, default=str)
         except Exception as e:
             return f"✅ Workflow initialized but info unavailable: {str(e)}"
     else:
         return "❌ Workflow not initialized"
 
-# Your existing workflow function (replace this with your actual implementation)
-def get_workflow():
-    """
-    Replace this with your actual get_workflow function
-    This is just a placeholder - uncomment and use your actual code below
-    """
-    
-    # Uncomment and replace with your actual workflow code:
-    """
-    from langgraph.graph import StateGraph, END
-    from langgraph.checkpoint.memory import InMemorySaver
-    
-    graph = StateGraph(state_schema=State)
-    graph.add_node("boss", node_1)
-    graph.add_node("node_2", agent_2)
-    graph.add_node("tool_node", tool_node)
-    graph.add_node("final_answer", final_answer)
-    graph.set_entry_point("boss")
-    graph.add_conditional_edges(
-        "boss", conditional_check, 
-        {
-            "call_next": "node_2",
-            "__end__": END
-        }
-    )
-    graph.add_conditional_edges("node_2", should_continue, {
-        "continue": "tool_node",
-        "__end__": END
-    })
-    graph.add_edge("tool_node", "final_answer")
-    graph.add_edge("final_answer", END)
-    
-    workflow = graph.compile(checkpointer=InMemorySaver())
-    
-    # Optional: Save graph visualization
-    try:
-        import os 
-        png_graph_bytes = workflow.get_graph().draw_mermaid_png()
-        output_file_path = "my_langgraph.png"
-        with open(output_file_path, "wb") as f:
-            f.write(png_graph_bytes)
-        print(f"Graph saved as '{output_file_path}' in {os.getcwd()}")
-    except Exception as e:
-        print(f"Could not save graph visualization: {e}")
-    
-    return workflow
-    """
-    
-    # Mock workflow for demonstration - remove this when using your actual code
-    class MockWorkflow:
-        def invoke(self, data, config=None):
-            user_msg = data["messages"][0][1]
-            thread_id = config.get("configurable", {}).get("thread_id", "unknown") if config else "unknown"
-            
-            # Simulate different types of responses based on message content
-            if "error" in user_msg.lower():
-                response = "This is a simulated error response for testing."
-            elif "hello" in user_msg.lower() or "hi" in user_msg.lower():
-                response = f"Hello! I'm your LangGraph assistant. Thread ID: {thread_id[:8]}..."
-            elif "workflow" in user_msg.lower():
-                response = "I'm powered by a LangGraph workflow with multiple nodes including boss, agent_2, tool_node, and final_answer nodes."
-            else:
-                response = f"I received your message: '{user_msg}'. This is a response from the LangGraph workflow simulation."
-            
-            return {
-                "messages": [
-                    ("user", user_msg),
-                    ("assistant", response)
-                ]
-            }
-    
-    return MockWorkflow()
-
 # Custom CSS for better styling
 custom_css = """
 .gradio-container {
@@ -309,6 +253,13 @@ def create_gradio_interface():
                 interactive=False
             )
             refresh_info_btn = gr.Button("🔄 Refresh Info", variant="secondary")
+            prometheus_metrics = gr.Textbox(
+                label="Prometheus metrics",
+                value=metrics.prometheus_text(),
+                lines=10,
+                interactive=False,
+                show_copy_button=True
+            )
         
         with gr.Tab("📖 Instructions"):
             gr.Markdown("""
@@ -335,21 +286,25 @@ def create_gradio_interface():
             ### ⚙️ Technical Details
             - Built with Gradio for easy deployment
             - Integrates directly with your `get_workflow()` function
-            - Supports the exact invoke format: `workflow.invoke({"messages": [("user", message)]}, config={"configurable": {"thread_id": thread_id}})`
+            - Streams the workflow asynchronously: `workflow.astream({"messages": [("user", message)]}, config=..., stream_mode=["messages", "values"])`
+            - Answer tokens from the supervisor, final answer and direct answer nodes render as they arrive
+            - The JSON answer wrapper is decoded incrementally; time to first token is shown in the Workflow Info tab
             - Handles various response formats from your workflow
             
-            ### 🎯 To Use Your Actual Workflow
-            1. Replace the mock `get_workflow()` function with your actual implementation
-            2. Ensure all your imports and dependencies are available
-            3. The interface will automatically use your workflow nodes and logic
+            ### ⚡ Startup
+            - LLM clients, the vector store and the graph image are created on first use
+            - A background warmup builds them right after startup (set `WARMUP=0` to disable)
+            - Set `DRAW_GRAPH=1` to write `my_langgraph.png`; renders are cached per graph structure
+            - The startup breakdown is shown in the Workflow Info tab
             """)
         
         # Event handlers
-        def send_message(message, history, thread_id):
+        async def send_message(message, history, thread_id):
             if message.strip():
-                new_history, new_thread_id = chat_with_workflow(message, history, thread_id)
-                return "", new_history, new_thread_id, new_thread_id
-            return message, history, thread_id, thread_id
+                async for new_history, new_thread_id in chat_with_workflow(message, history, thread_id):
+                    yield "", new_history, new_thread_id, new_thread_id
+                return
+            yield message, history, thread_id, thread_id
         
         def clear_chat():
             return [], "", ""
@@ -364,7 +319,7 @@ def create_gradio_interface():
             return gr.File(visible=False)
         
         def refresh_workflow_info():
-            return get_workflow_info()
+            return get_workflow_info(), metrics.prometheus_text()
         
         # Connect event handlers
         msg_input.submit(
@@ -400,7 +355,7 @@ def create_gradio_interface():
         
         refresh_info_btn.click(
             refresh_workflow_info,
-            outputs=[workflow_info]
+            outputs=[workflow_info, prometheus_metrics]
         )
         
         # Initialize with welcome message
@@ -417,6 +372,10 @@ def create_gradio_interface():
 if __name__ == "__main__":
     # Create and launch the interface
     demo = create_gradio_interface()
+    demo.queue(default_concurrency_limit=GRADIO_CONCURRENCY, max_size=GRADIO_MAX_QUEUE)
+    if os.getenv("METRICS_PORT"):
+        # Prometheus scrape endpoint at http://<host>:METRICS_PORT/metrics
+        start_metrics_server(int(os.getenv("METRICS_PORT")))
     
     # Launch with custom settings
     demo.launch(
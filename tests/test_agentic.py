@@ -0,0 +1,21 @@
+import asyncio
+
+import agentic
+
+
+def test_close_closes_both_http_clients():
+    registry = agentic.AgentRegistry()
+    registry.llm
+    registry.close()
+    assert registry.http_client.is_closed and registry.http_async_client.is_closed
+
+
+def test_aclose_closes_the_async_client_on_the_running_loop():
+    registry = agentic.AgentRegistry()
+
+    async def use_and_close():
+        registry.llm
+        await registry.aclose()
+
+    asyncio.run(use_and_close())
+    assert registry.http_client.is_closed and registry.http_async_client.is_closed
@@ -0,0 +1,101 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from cached_embeddings import CachedEmbeddings, EmbeddingCache
+from fakes import FakeEmbeddings
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return EmbeddingCache(str(tmp_path / "embeddings.sqlite"))
+
+
+def embedder(cache, backend=None, **kwargs):
+    kwargs.setdefault("backoff_base", 0.0)
+    return CachedEmbeddings(backend or FakeEmbeddings(), cache, **kwargs)
+
+
+def test_second_call_is_served_from_cache(cache):
+    embeddings = embedder(cache)
+    first = embeddings.embed_documents(["revenue", "profit", "revenue"])
+    assert embeddings.stats["misses"] == 2 and embeddings.stats["hits"] == 0
+    assert embeddings.backend.calls == [["revenue", "profit"]]
+
+    second = embeddings.embed_documents(["profit", "revenue"])
+    assert embeddings.backend.calls == [["revenue", "profit"]]
+    assert embeddings.stats["hits"] == 2
+    assert np.allclose(second, [first[1], first[0]])
+
+
+def test_cache_is_shared_across_instances_and_keyed_by_model(cache):
+    embedder(cache).embed_documents(["revenue"])
+    same_model = embedder(cache)
+    same_model.embed_query("revenue")
+    assert same_model.backend.calls == []
+    other_model = embedder(cache, FakeEmbeddings(model="other"))
+    other_model.embed_query("revenue")
+    assert other_model.backend.calls == [["revenue"]]
+
+
+def test_batches_are_bounded_by_count_and_characters(cache):
+    embeddings = embedder(cache, batch_size=3, max_batch_chars=14, max_concurrency=1)
+    assert embeddings.make_batches(["a", "b", "c", "d"]) == [["a", "b", "c"], ["d"]]
+    assert embeddings.make_batches(["aaaaaaaa", "bbbbbbbb", "c"]) == [["aaaaaaaa"], ["bbbbbbbb", "c"]]
+    texts = [f"text {n}" for n in range(7)]
+    embeddings.embed_documents(texts)
+    assert embeddings.stats["batches"] == len(embeddings.backend.calls) == 4
+    assert all(len(batch) <= 2 and sum(map(len, batch)) <= 14 for batch in embeddings.backend.calls)
+
+
+def test_concurrent_batches_keep_order(cache):
+    texts = [f"text {n}" for n in range(20)]
+    vectors = embedder(cache, batch_size=4, max_concurrency=4).embed_documents(texts)
+    assert np.allclose(vectors, FakeEmbeddings().embed_documents(texts))
+
+
+def test_retries_with_backoff_then_succeeds(cache, monkeypatch):
+    sleeps = []
+    monkeypatch.setattr("cached_embeddings.time.sleep", sleeps.append)
+    embeddings = embedder(cache, FakeEmbeddings(fail_times=2), backoff_base=1.0, backoff_max=1.5)
+    embeddings.embed_query("revenue")
+    assert embeddings.stats["retries"] == 2
+    assert 0.5 <= sleeps[0] <= 1.0 and 0.75 <= sleeps[1] <= 1.5
+
+
+def test_gives_up_after_max_retries(cache):
+    embeddings = embedder(cache, FakeEmbeddings(fail_times=5), max_retries=2)
+    with pytest.raises(RuntimeError):
+        embeddings.embed_query("revenue")
+    assert len(embeddings.backend.calls) == 3
+
+
+def test_async_cache_and_batching(cache):
+    embeddings = embedder(cache, batch_size=2)
+    texts = ["revenue", "profit", "debt", "revenue"]
+    first = asyncio.run(embeddings.aembed_documents(texts))
+    assert embeddings.stats["batches"] == 2 and embeddings.stats["misses"] == 3
+    again = asyncio.run(embeddings.aembed_query("debt"))
+    assert len(embeddings.backend.calls) == 2
+    assert np.allclose(again, first[2])
+    assert np.allclose(first, FakeEmbeddings().embed_documents(texts))
+
+
+def test_async_retries_with_backoff(cache, monkeypatch):
+    sleeps = []
+
+    async def record(delay):
+        sleeps.append(delay)
+
+    monkeypatch.setattr("cached_embeddings.asyncio.sleep", record)
+    embeddings = embedder(cache, FakeEmbeddings(fail_times=2), backoff_base=1.0)
+    asyncio.run(embeddings.aembed_query("revenue"))
+    assert embeddings.stats["retries"] == 2 and len(sleeps) == 2
+
+
+def test_async_gives_up_after_max_retries(cache):
+    embeddings = embedder(cache, FakeEmbeddings(fail_times=5), max_retries=1)
+    with pytest.raises(RuntimeError):
+        asyncio.run(embeddings.aembed_documents(["revenue"]))
+    assert len(embeddings.backend.calls) == 2
@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+from langgraph.checkpoint.base import empty_checkpoint
+
+import checkpoint
+from checkpoint import BoundedSqliteSaver
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(checkpoint.time, "time", clock)
+    return clock
+
+
+def saver(tmp_path, **kwargs):
+    return BoundedSqliteSaver(str(tmp_path / "checkpoints.sqlite"), **kwargs)
+
+
+def config(thread_id):
+    return {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+
+
+def put(checkpointer, thread_id, step=0, messages=()):
+    state = empty_checkpoint()
+    state["channel_values"] = {"messages": list(messages)}
+    return checkpointer.put(config(thread_id), state, {"step": step}, {})
+
+
+def test_only_the_last_checkpoints_are_kept(tmp_path):
+    checkpointer = saver(tmp_path, keep_checkpoints=5)
+    saved = [put(checkpointer, "t", step) for step in range(8)]
+    history = list(checkpointer.list(config("t")))
+    assert len(history) == 5
+    assert history[0].config["configurable"]["checkpoint_id"] == saved[-1]["configurable"]["checkpoint_id"]
+
+
+def test_least_recently_used_threads_are_evicted_after_n_puts(tmp_path, clock):
+    checkpointer = saver(tmp_path, max_threads=3, evict_every=5)
+    for number in range(5):
+        clock.now += 1
+        put(checkpointer, f"t{number}")
+    assert checkpointer.thread_count() == 3
+    assert checkpointer.stats["evicted_threads"] == 2
+    assert checkpointer.get_tuple(config("t0")) is None and checkpointer.get_tuple(config("t1")) is None
+    assert checkpointer.get_tuple(config("t4")) is not None
+
+
+def test_idle_threads_expire_after_the_ttl(tmp_path, clock):
+    checkpointer = saver(tmp_path, ttl_seconds=60)
+    put(checkpointer, "idle")
+    clock.now += 100
+    put(checkpointer, "active")
+    clock.now += 10
+    assert checkpointer.evict() == 1
+    assert checkpointer.get_tuple(config("idle")) is None
+    assert checkpointer.get_tuple(config("active")) is not None
+
+
+def test_aget_tuple_serves_the_latest_checkpoint_from_the_hot_cache(tmp_path):
+    checkpointer = saver(tmp_path)
+    saved = put(checkpointer, "t", messages=["hello"])
+    first = asyncio.run(checkpointer.aget_tuple(config("t")))
+    assert checkpointer.stats == {"hot_hits": 1, "hot_misses": 0, "evicted_threads": 0}
+    assert first.config["configurable"]["checkpoint_id"] == saved["configurable"]["checkpoint_id"]
+    # callers get copies: a node mutating its state must not change the cached entry
+    first.checkpoint["channel_values"]["messages"].append("mutated")
+    second = asyncio.run(checkpointer.aget_tuple(config("t")))
+    assert second.checkpoint["channel_values"]["messages"] == ["hello"]
+
+
+def test_cold_reads_fill_the_hot_cache(tmp_path):
+    put(saver(tmp_path), "t", messages=["hello"])
+    restarted = saver(tmp_path)
+    assert restarted.get_tuple(config("t")).checkpoint["channel_values"]["messages"] == ["hello"]
+    asyncio.run(restarted.aget_tuple(config("t")))
+    assert restarted.stats["hot_misses"] == 1 and restarted.stats["hot_hits"] == 1
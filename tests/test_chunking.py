@@ -0,0 +1,42 @@
+import time
+
+import pytest
+
+from langchain_core.documents import Document
+
+from chunking import StructuredChunker, is_heading
+
+
+@pytest.mark.parametrize("line", [
+    "CONSOLIDATEDSTATEMENTOFPROFITANDLOSS(₹crore)",
+    "A" * 40 + "!",
+    "A" * 79 + "!",
+    "Ab" * 39 + "!",
+])
+def test_is_heading_is_linear_on_unspaced_lines(line):
+    started = time.perf_counter()
+    is_heading(line)
+    assert time.perf_counter() - started < 0.05
+
+
+@pytest.mark.parametrize("line, expected", [
+    ("MANAGEMENT DISCUSSION AND ANALYSIS", True),
+    ("Financial Performance", True),
+    ("2.1 Revenue by segment", True),
+    ("Revenue grew in the commercial vehicle segment.", False),
+    ("the company reported a profit", False),
+])
+def test_is_heading(line, expected):
+    assert is_heading(line) is expected
+
+
+def test_baseline_is_only_computed_on_request():
+    pages = [Document(page_content=f"Revenue grew {n}% in the year.\n" * 40, metadata={"page": n}) for n in range(3)]
+    chunker = StructuredChunker()
+    chunker.split_documents(pages)
+    assert chunker.baseline is None and "baseline_chunks" not in chunker.report()
+
+    compared = StructuredChunker(compare_baseline=True)
+    compared.split_documents(pages)
+    report = compared.report()
+    assert report["baseline_chunks"] > 0 and "tokens_saved" in report
@@ -0,0 +1,27 @@
+import os
+
+import numpy as np
+
+from compact_index import CompactVectorIndex, current_version
+
+
+def test_rebuild_publishes_a_new_version_without_touching_mapped_files(tmp_path):
+    rng = np.random.default_rng(0)
+    directory = str(tmp_path / "compact")
+    first = CompactVectorIndex.build(directory, ["a", "b"], rng.normal(size=(2, 16)), ["a", "b"], [{}, {}], dim=8)
+    first_vectors = np.array(first.vectors)
+
+    second = CompactVectorIndex.build(directory, ["c", "d", "e"], rng.normal(size=(3, 16)), ["c", "d", "e"],
+                                      [{}, {}, {}], dim=8)
+
+    assert current_version(directory) == second.version_directory != first.version_directory
+    assert np.array_equal(np.array(first.vectors), first_vectors)
+    assert len(CompactVectorIndex(directory)) == 3
+    assert [name for name in os.listdir(directory) if name.startswith("v")] == [os.path.basename(second.version_directory)]
+
+
+def test_search_returns_nearest_rows(tmp_path):
+    vectors = np.eye(8, 16, dtype=np.float32)
+    index = CompactVectorIndex.build(str(tmp_path), [str(i) for i in range(8)], vectors,
+                                     [str(i) for i in range(8)], [{}] * 8, dim=8, rerank=2)
+    assert index.search(vectors[6], k=1)[0][0] == 6
@@ -0,0 +1,47 @@
+import re
+
+import pytest
+from langchain_core.documents import Document
+
+from chunking import count_tokens
+from context_compression import CONTEXT_TOKEN_BUDGET, compress_context
+
+
+def page(number, topic):
+    sentences = [
+        f"Tata Motors {topic} on page {number} rose {number * 3}% in FY25 on strong demand.",
+        f"The {topic} discussion continues with regional details for segment {number}.",
+        "Management expects the trend to continue next year across all businesses.",
+        f"Additional commentary about {topic} covers capital allocation, pricing and cost programmes.",
+    ] * 6
+    return Document(page_content=" ".join(sentences), metadata={"source": "/data/tata-motor-IAR-2024-25.pdf",
+                                                                 "page": number})
+
+
+def candidates():
+    topics = ["revenue", "revenue", "ebitda margin", "free cash flow", "jlr revenue", "debt", "dividend", "revenue"]
+    return [page(number, topic) for number, topic in enumerate(topics)]
+
+
+@pytest.mark.parametrize("budget", [CONTEXT_TOKEN_BUDGET, 120, 40])
+def test_context_stays_within_the_token_budget(budget):
+    context = compress_context("How did Tata Motors revenue change in FY25?", candidates(), token_budget=budget)
+    assert context and count_tokens(context) <= budget
+
+
+def test_citations_point_to_the_page_each_sentence_came_from():
+    docs = candidates()
+    context = compress_context("revenue and free cash flow in FY25", docs, k=4)
+    lines = context.splitlines()
+    assert 1 < len(lines) <= 4
+    for number, line in enumerate(lines, start=1):
+        match = re.match(rf"\[{number}\] tata-motor-IAR-2024-25\.pdf p\.(\d+): (.*)$", line)
+        assert match, line
+        source = docs[int(match.group(1)) - 1].page_content
+        assert all(part in source for part in match.group(2).split(" ... "))
+
+
+def test_exact_duplicates_are_cited_once():
+    doc = page(3, "revenue")
+    context = compress_context("revenue", [doc, Document(page_content=doc.page_content, metadata={"page": 9})])
+    assert context.count("\n") == 0 and "p.4" in context
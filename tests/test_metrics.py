@@ -0,0 +1,31 @@
+import uuid
+
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+
+from metrics import LLMMetricsCallback, MetricsRegistry
+
+
+def finish(llm_output, message):
+    registry = MetricsRegistry()
+    callback = LLMMetricsCallback(registry)
+    run_id = uuid.uuid4()
+    callback.on_chat_model_start({}, [[]], run_id=run_id)
+    callback.on_llm_new_token("a", run_id=run_id)
+    callback.on_llm_end(LLMResult(generations=[[ChatGeneration(message=message)]], llm_output=llm_output), run_id=run_id)
+    return registry.snapshot()
+
+
+def test_streamed_call_is_labelled_from_response_metadata():
+    message = AIMessage(content="hi", response_metadata={"model_name": "gpt-4o-mini-2024-07-18"},
+                        usage_metadata={"input_tokens": 12, "output_tokens": 3, "total_tokens": 15})
+    snapshot = finish(None, message)
+    assert "llm_latency_seconds{model=gpt-4o-mini-2024-07-18}" in snapshot["histograms"]
+    assert snapshot["counters"]["llm_tokens{model=gpt-4o-mini-2024-07-18}"] == 15
+
+
+def test_llm_output_model_name_wins_and_unknown_is_the_last_resort():
+    labelled = finish({"model_name": "gpt-4o"}, AIMessage(content="hi", response_metadata={"model_name": "other"}))
+    assert "llm_latency_seconds{model=gpt-4o}" in labelled["histograms"]
+    unlabelled = finish(None, AIMessage(content="hi"))
+    assert "llm_latency_seconds{model=unknown}" in unlabelled["histograms"]
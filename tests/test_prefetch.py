@@ -0,0 +1,95 @@
+import asyncio
+import time
+
+import pytest
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+
+import agentic
+from retrieval import SpeculativePrefetcher
+
+
+class FakeRetriever:
+    def __init__(self):
+        self.invalidations = 0
+        self.searches = []
+
+    def generation(self):
+        return self.invalidations
+
+    def similarity_search(self, query, k=2):
+        self.searches.append(query)
+        return [query]
+
+    async def asimilarity_search(self, query, k=2):
+        return self.similarity_search(query, k)
+
+
+class Registry:
+    router = None
+
+    def __init__(self, prefetcher, supervisor_reply="", agent_reply=None):
+        self.prefetcher = prefetcher
+        self.supervisor = RunnableLambda(lambda _: AIMessage(content=supervisor_reply))
+        self.agent2 = RunnableLambda(lambda _: agent_reply)
+
+
+@pytest.fixture
+def prefetcher():
+    prefetcher = SpeculativePrefetcher(FakeRetriever())
+    yield prefetcher
+    prefetcher.close()
+
+
+def test_take_is_keyed_by_normalized_question(prefetcher):
+    prefetcher.start("What was Tata Steel's revenue?")
+    assert prefetcher.take("what was tata steel's revenue") == ["What was Tata Steel's revenue?"]
+    assert prefetcher.stats()["in_flight"] == 0
+
+
+def test_stale_generation_is_not_reused(prefetcher):
+    prefetcher.start("revenue")
+    prefetcher.retriever.invalidations += 1
+    assert prefetcher.take("revenue") is None
+    assert prefetcher.stats()["expired"] == 1
+    assert prefetcher.stats()["in_flight"] == 0
+
+
+def test_expired_entries_are_dropped_on_start(prefetcher):
+    prefetcher.ttl = 0.0
+    prefetcher.start("revenue")
+    time.sleep(0.01)
+    prefetcher.start("profit")
+    stats = prefetcher.stats()
+    assert stats["in_flight"] == 1 and stats["expired"] == 1 and stats["started"] == 2
+
+
+def test_unparseable_supervisor_reply_releases_prefetch(prefetcher):
+    registry = Registry(prefetcher, supervisor_reply="not json")
+    with pytest.raises(ValueError):
+        agentic.node_1({"messages": [("user", "revenue")]}, registry)
+    assert prefetcher.stats()["in_flight"] == 0
+
+
+def test_general_route_releases_prefetch(prefetcher):
+    registry = Registry(prefetcher, supervisor_reply='{"answer": "general"}')
+    asyncio.run(agentic.anode_1({"messages": [("user", "revenue")]}, registry))
+    assert prefetcher.stats()["in_flight"] == 0
+
+
+def test_agent_without_tool_call_releases_prefetch(prefetcher):
+    registry = Registry(prefetcher, agent_reply=AIMessage(content="no tools needed"))
+    prefetcher.start("revenue")
+    state = agentic.agent_2({"messages": [("user", "revenue"), AIMessage(content=agentic.RETRIEVER_ROUTE)]}, registry)
+    assert agentic.should_continue(state) == "__end__"
+    assert prefetcher.stats()["in_flight"] == 0
+
+
+def test_tool_node_uses_prefetch_for_rewritten_query(prefetcher):
+    registry = Registry(prefetcher)
+    prefetcher.start("revenue")
+    call = AIMessage(content="", tool_calls=[{"name": agentic.pdf_chatter.name, "args": {"query": "tata steel revenue fy23"}, "id": "1"}])
+    state = {"messages": [("user", "revenue"), AIMessage(content=agentic.RETRIEVER_ROUTE), call]}
+    agentic.tool_node(state, registry)
+    stats = prefetcher.stats()
+    assert stats["used"] == 1 and stats["in_flight"] == 0
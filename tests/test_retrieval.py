@@ -0,0 +1,112 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+from langchain_core.documents import Document
+
+import retrieval
+from fakes import FakeEmbeddings
+from lexical_index import BM25Index
+from retrieval import CachedRetriever
+
+
+class FakeVectorStore:
+    def __init__(self, documents=()):
+        self.documents = list(documents)
+        self.searches = 0
+        self._collection = SimpleNamespace(count=lambda: len(self.documents))
+
+    def similarity_search_by_vector(self, vector, k=4):
+        self.searches += 1
+        return self.documents[:k]
+
+    async def asimilarity_search_by_vector(self, vector, k=4):
+        return self.similarity_search_by_vector(vector, k)
+
+
+def lexical_index():
+    index = BM25Index()
+    index.add("1", "tata motors revenue grew", {"page": 1})
+    index.add("2", "jlr margins improved", {"page": 2})
+    return index
+
+
+def test_async_index_load_and_search_run_off_the_event_loop(tmp_path, monkeypatch):
+    threads = []
+
+    def load_lexical(directory):
+        threads.append(threading.current_thread())
+        return lexical_index()
+
+    class CompactIndex:
+        def similarity_search_by_vector(self, vector, k):
+            threads.append(threading.current_thread())
+            return [Document(page_content="compact")]
+
+    monkeypatch.setattr(retrieval, "load_lexical_index", load_lexical)
+    monkeypatch.setattr(retrieval, "load_compact_index", lambda directory, vectordb: CompactIndex())
+    retriever = CachedRetriever(FakeVectorStore(), FakeEmbeddings(), persist_directory=str(tmp_path))
+
+    lexical = asyncio.run(retriever.asimilarity_search("revenue", k=1, mode="lexical"))
+    compact = asyncio.run(retriever.asimilarity_search("revenue", k=1, mode="compact"))
+    assert lexical[0].page_content == "tata motors revenue grew"
+    assert compact[0].page_content == "compact"
+    assert len(threads) == 2 and threading.main_thread() not in threads
+
+
+def test_lru_evicts_least_recently_used_and_expires_after_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(retrieval.time, "monotonic", lambda: now[0])
+    cache = retrieval.LRUCache(max_entries=2, ttl=10)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None and cache.get("a") == 1 and cache.get("c") == 3
+    now[0] += 11
+    assert cache.get("a") is None and len(cache) == 1
+
+
+def retriever_for(tmp_path, documents, **kwargs):
+    vectordb = FakeVectorStore(documents)
+    embeddings = FakeEmbeddings()
+    kwargs.setdefault("version_check_interval", 0.0)
+    return CachedRetriever(vectordb, embeddings, persist_directory=str(tmp_path), **kwargs), vectordb, embeddings
+
+
+def test_repeated_and_reworded_queries_are_served_from_cache(tmp_path):
+    retriever, vectordb, embeddings = retriever_for(tmp_path, [Document(page_content="revenue")])
+    retriever.similarity_search("What was the revenue?", k=1)
+    retriever.similarity_search("  what was the REVENUE ", k=1)
+    asyncio.run(retriever.asimilarity_search("what was the revenue", k=1))
+    assert vectordb.searches == 1 and len(embeddings.calls) == 1
+    assert retriever.stats()["documents"]["hits"] == 2
+
+
+def test_version_file_change_invalidates_documents_but_keeps_embeddings(tmp_path):
+    retriever, vectordb, embeddings = retriever_for(tmp_path, [Document(page_content="revenue")])
+    retriever.similarity_search("revenue", k=1)
+    retriever.similarity_search("revenue", k=1)
+    assert vectordb.searches == 1
+
+    retrieval.bump_collection_version(str(tmp_path))
+    retriever.similarity_search("revenue", k=1)
+    assert vectordb.searches == 2 and retriever.invalidations == 1
+    # query vectors do not depend on the collection
+    assert len(embeddings.calls) == 1
+
+
+def test_collection_count_change_invalidates(tmp_path):
+    retriever, vectordb, _ = retriever_for(tmp_path, [Document(page_content="revenue")])
+    retriever.similarity_search("revenue", k=1)
+    vectordb.documents.append(Document(page_content="profit"))
+    retriever.similarity_search("revenue", k=1)
+    assert vectordb.searches == 2 and retriever.generation() == 1
+
+
+def test_version_is_checked_at_most_every_interval(tmp_path):
+    retriever, vectordb, _ = retriever_for(tmp_path, [Document(page_content="revenue")], version_check_interval=60.0)
+    retriever.similarity_search("revenue", k=1)
+    retrieval.bump_collection_version(str(tmp_path))
+    retriever.similarity_search("revenue", k=1)
+    assert vectordb.searches == 1 and retriever.invalidations == 0
@@ -0,0 +1,106 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+
+import agentic
+from cached_embeddings import CachedEmbeddings, EmbeddingCache
+from fakes import FakeEmbeddings
+from router import (GREETING_ROUTE, RETRIEVER_ROUTE, ROUTER_EMBEDDING_RETRIES, CentroidRule, default_router,
+                    keyword_rule)
+
+
+@pytest.mark.parametrize("query", [
+    "What was Tata Motors' revenue in FY25?",
+    "How did JLR perform this year?",
+    "Who is on the board of directors?",
+    "Summarise the company's cash flow",
+])
+def test_report_questions_route_to_retriever(query):
+    assert keyword_rule(query).route == RETRIEVER_ROUTE
+
+
+@pytest.mark.parametrize("query", ["what is cash flow", "explain revenue", "how is ebitda calculated?",
+                                   "what is a dividend"])
+def test_generic_finance_questions_are_not_decided_by_keywords(query):
+    assert keyword_rule(query) is None
+
+
+def test_greeting():
+    assert keyword_rule("thank you!").route == GREETING_ROUTE
+
+
+class QueryEmbeddings:
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+        self.queries = []
+
+    def embed_query(self, query):
+        self.queries.append(query)
+        return self.embeddings.embed_query(query)
+
+    async def aembed_query(self, query):
+        self.queries.append(query)
+        return await self.embeddings.aembed_query(query)
+
+
+def test_queries_use_the_shared_query_embeddings():
+    embeddings = FakeEmbeddings()
+    shared = QueryEmbeddings(FakeEmbeddings())
+    rule = CentroidRule(embeddings, query_embeddings=shared)
+    rule("how many cars were sold")
+    asyncio.run(rule.acall("how many trucks were sold"))
+    assert shared.queries == ["how many cars were sold", "how many trucks were sold"]
+    # the rule's own backend only embedded the examples, once per route
+    assert len(embeddings.calls) == 2
+
+
+def test_acall_builds_centroids_off_the_event_loop():
+    embeddings = FakeEmbeddings()
+    threads = []
+    embed_documents = embeddings.embed_documents
+
+    def record_thread(texts):
+        threads.append(threading.current_thread())
+        return embed_documents(texts)
+
+    embeddings.embed_documents = record_thread
+    rule = CentroidRule(embeddings)
+    asyncio.run(rule.acall("how many cars were sold"))
+    assert threads and threading.main_thread() not in threads
+
+
+class FailingEmbeddings(FakeEmbeddings):
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        raise RuntimeError("embedding service unavailable")
+
+    async def aembed_documents(self, texts):
+        return self.embed_documents(texts)
+
+
+def failing_router(tmp_path):
+    backend = FailingEmbeddings()
+    embeddings = CachedEmbeddings(backend, EmbeddingCache(str(tmp_path / "embeddings.sqlite")), backoff_base=0.0)
+    return default_router(embeddings), backend
+
+
+def test_failing_embeddings_leave_the_decision_to_the_supervisor(tmp_path):
+    router, backend = failing_router(tmp_path)
+    assert router.route("tell me a joke") is None
+    assert asyncio.run(router.aroute("tell me a joke")) is None
+    assert router.stats()["errors"] == 2
+    # one attempt plus ROUTER_EMBEDDING_RETRIES per call, not the ingestion retry budget
+    assert len(backend.calls) == 2 * (1 + ROUTER_EMBEDDING_RETRIES)
+
+
+def test_node_1_falls_back_to_supervisor_when_routing_fails(tmp_path):
+    router, _ = failing_router(tmp_path)
+    registry = SimpleNamespace(router=router, prefetcher=None,
+                               supervisor=RunnableLambda(lambda _: AIMessage(content='{"answer": "<p>joke</p>"}')))
+    state = agentic.node_1({"messages": [("user", "tell me a joke")]}, registry)
+    assert state["messages"][-1].content == "<p>joke</p>"
+    assert router.stats()["decisions"]["llm"] == 1
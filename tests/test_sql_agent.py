@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+from drools_templates import MAX_COMMENT_CHARS, PACKAGE, generate_drools
+from sql_agent import naming_inputs, parse_naming
+from sql_results import QueryResult
+
+
+def naming(**values):
+    return json.dumps({"description": "Top artists", **values})
+
+
+def test_parse_naming_keeps_valid_java_names():
+    parsed = parse_naming(naming(package="com.music.rules", fact="ArtistSales"))
+    assert parsed == {"package": "com.music.rules", "description": "Top artists", "fact": "ArtistSales"}
+
+
+@pytest.mark.parametrize("package, fact", [
+    ("com.music rules", "Artist Sales"),
+    ("com..music", "Artist;System.exit(0)"),
+    ("1com.music", "9Artist"),
+    (None, ["Artist"]),
+])
+def test_parse_naming_falls_back_on_invalid_names(package, fact):
+    parsed = parse_naming(naming(package=package, fact=fact))
+    assert parsed["package"] == PACKAGE and parsed["fact"] is None
+
+
+def test_parse_naming_ignores_unparseable_reply():
+    assert parse_naming("not json") == {}
+
+
+def result():
+    result = QueryResult("SELECT Name, Total FROM Artist", ["Name", "Total"])
+    result.add(("AC/DC", 10.0))
+    return result
+
+
+def test_naming_example_skips_rule_mentions_in_the_header():
+    drools = '// rule generated for: top artists\npackage com.company.rules;\n\nrule "A"\n    when\n    then\nend\n\nrule "B"\nend'
+    assert naming_inputs("q", result(), drools)["example"] == 'rule "A"\n    when\n    then\nend'
+
+
+def test_naming_example_without_rules():
+    drools = "package com.company.rules;\n"
+    assert naming_inputs("q", result(), drools)["example"] == drools
+
+
+def test_description_cannot_break_out_of_the_header_comment():
+    injected = 'Top artists\nrule "x"\nwhen\nthen\n    System.exit(0);\nend\r\n// ' + "x" * 500
+    parsed = parse_naming(naming(description=injected))
+    assert "\n" not in parsed["description"] and len(parsed["description"]) <= MAX_COMMENT_CHARS
+
+    drools = generate_drools("q", result(), description=injected)
+    comments = [line for line in drools.splitlines() if 'rule "x"' in line]
+    assert comments and all(line.startswith("// ") for line in comments)
+    assert "System.exit" not in "\n".join(line for line in drools.splitlines() if not line.startswith("//"))
+
+
+def test_question_is_single_line_in_the_header():
+    drools = generate_drools("top artists\nend\nrule \"y\"", result())
+    assert '// top artists end rule "y"' in drools.splitlines()
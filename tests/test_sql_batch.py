@@ -0,0 +1,65 @@
+import asyncio
+import json
+
+import pytest
+
+import sql_batch
+
+
+class Killed(BaseException):
+    pass
+
+
+def pipeline(asked, kill_after=None):
+    async def arun_pipeline(question):
+        if kill_after is not None and len(asked) >= kill_after:
+            raise Killed()
+        asked.append(question)
+        return {"question": question, "sql": f"SELECT '{question}'", "error": None}, None
+    return arun_pipeline
+
+
+@pytest.fixture
+def questions(tmp_path):
+    path = tmp_path / "questions.jsonl"
+    lines = [json.dumps({"id": f"q{n}", "question": f"question {n}"}) for n in range(6)]
+    path.write_text("\n".join(lines) + "\n\n" + json.dumps("bare question") + "\n", encoding="utf-8")
+    return str(path)
+
+
+def records(path):
+    parsed = []
+    for line in open(path, encoding="utf-8"):
+        try:
+            parsed.append(json.loads(line))
+        except ValueError:
+            continue
+    return parsed
+
+
+def test_read_questions_numbers_lines_without_id(questions):
+    items = sql_batch.read_questions(questions)
+    assert [item["id"] for item in items] == ["q0", "q1", "q2", "q3", "q4", "q5", "8"]
+
+
+def test_killed_run_resumes_without_repeating_completed_questions(questions, tmp_path, monkeypatch):
+    output = str(tmp_path / "results.jsonl")
+    first = []
+    monkeypatch.setattr(sql_batch.sql_agent, "arun_pipeline", pipeline(first, kill_after=3))
+    with pytest.raises(Killed):
+        asyncio.run(sql_batch.run_batch(questions, output, concurrency=1))
+    assert len(records(output)) == 3
+    # the process died while writing the next record
+    with open(output, "a", encoding="utf-8") as f:
+        f.write('{"id": "q3", "question": "quest')
+
+    second = []
+    monkeypatch.setattr(sql_batch.sql_agent, "arun_pipeline", pipeline(second))
+    stats = asyncio.run(sql_batch.run_batch(questions, output, concurrency=1))
+    assert stats["completed"] == 4 and not set(first) & set(second)
+    ids = [record["id"] for record in records(output)]
+    assert sorted(ids) == ["8", "q0", "q1", "q2", "q3", "q4", "q5"]
+
+    third = []
+    monkeypatch.setattr(sql_batch.sql_agent, "arun_pipeline", pipeline(third))
+    assert asyncio.run(sql_batch.run_batch(questions, output))["completed"] == 0 and third == []
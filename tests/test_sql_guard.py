@@ -0,0 +1,78 @@
+import sqlite3
+
+import pytest
+
+from sql_guard import QueryGuard, QueryRejected, QueryTimeout, connect_readonly, has_top_level_limit
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "music.db")
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE album (AlbumId INTEGER PRIMARY KEY, Title TEXT)")
+        conn.execute("CREATE TABLE track (TrackId INTEGER PRIMARY KEY, AlbumId INTEGER, Name TEXT)")
+        conn.executemany("INSERT INTO album VALUES (?, ?)", [(n, f"album {n}") for n in range(50)])
+        conn.executemany("INSERT INTO track VALUES (?, ?, ?)", [(n, n % 50, f"track {n}") for n in range(500)])
+    return path
+
+
+@pytest.fixture
+def conn(db_path):
+    conn = connect_readonly(db_path)
+    yield conn
+    conn.close()
+
+
+def guard(db_path, **kwargs):
+    kwargs.setdefault("limit_over_rows", 100)
+    kwargs.setdefault("auto_limit", 20)
+    return QueryGuard(db_path, **kwargs)
+
+
+@pytest.mark.parametrize("sql", [
+    "DELETE FROM track",
+    "SELECT 1; DROP TABLE track",
+    "UPDATE track SET Name = 'x'",
+])
+def test_writes_and_multiple_statements_are_rejected(db_path, conn, sql):
+    with pytest.raises(QueryRejected):
+        guard(db_path).check(conn, sql)
+
+
+def test_rewrite_appends_a_limit_and_keeps_join_columns(db_path, conn):
+    sql = "SELECT * FROM track t JOIN album a ON a.AlbumId = t.AlbumId;"
+    checked = guard(db_path).check(conn, sql)
+    assert checked == "SELECT * FROM track t JOIN album a ON a.AlbumId = t.AlbumId\nLIMIT 20"
+    cursor = conn.execute(checked)
+    assert [column[0] for column in cursor.description] == ["TrackId", "AlbumId", "Name", "AlbumId", "Title"]
+    assert len(cursor.fetchall()) == 20
+
+
+def test_limit_inside_a_subquery_does_not_bound_the_outer_query(db_path, conn):
+    sql = "SELECT Name FROM track WHERE AlbumId IN (SELECT AlbumId FROM album LIMIT 40)"
+    assert guard(db_path).check(conn, sql).endswith("\nLIMIT 20")
+    cte = "WITH few AS (SELECT * FROM album LIMIT 2) SELECT t.Name FROM track t, few -- every track"
+    assert len(conn.execute(guard(db_path).check(conn, cte)).fetchall()) == 20
+
+
+def test_top_level_limit_is_kept(db_path, conn):
+    sql = "SELECT Name FROM track LIMIT 5"
+    checked_guard = guard(db_path)
+    assert checked_guard.check(conn, sql) == sql
+    assert checked_guard.stats()["rewritten"] == 0
+
+
+def test_has_top_level_limit():
+    assert has_top_level_limit("select * from t limit 3")
+    assert not has_top_level_limit("select * from (select * from t limit 3)")
+    assert has_top_level_limit("with x as (select 1 limit 1) select * from x limit 2")
+
+
+def test_budget_aborts_long_queries(db_path, conn):
+    slow = guard(db_path, time_budget=0.05)
+    sql = "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) SELECT count(*) FROM n"
+    with pytest.raises(QueryTimeout):
+        with slow.budget(conn):
+            conn.execute(sql).fetchall()
+    assert slow.stats()["timeouts"] == 1
+    assert conn.execute("SELECT count(*) FROM track").fetchone()[0] == 500
@@ -0,0 +1,65 @@
+import sqlite3
+
+import pytest
+
+from sql_results import SQLResultCache, normalize_sql, run_query
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "music.db")
+    with sqlite3.connect(path) as conn:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE artist (ArtistId INTEGER PRIMARY KEY, Name TEXT)")
+        conn.executemany("INSERT INTO artist VALUES (?, ?)", [(n, f"artist {n}") for n in range(30)])
+    return path
+
+
+def query(db_path, sql):
+    with sqlite3.connect(db_path) as conn:
+        return run_query(conn, sql)
+
+
+def test_normalize_sql_keeps_literals_verbatim():
+    assert normalize_sql("SELECT  Name\n FROM Artist WHERE Name = 'AC/DC  Live';") == \
+        "select name from artist where name = 'AC/DC  Live'"
+    assert normalize_sql("select name from artist where name = 'ac/dc  live'") != \
+        normalize_sql("SELECT Name FROM Artist WHERE Name = 'AC/DC  Live'")
+
+
+def test_equivalent_queries_share_an_entry(db_path):
+    cache = SQLResultCache(db_path)
+    result = query(db_path, "SELECT Name FROM artist")
+    cache.put("SELECT Name FROM artist;", result)
+    assert cache.get("select name\n  from ARTIST") is result
+    assert cache.stats()["hits"] == 1
+
+
+def test_write_invalidates_through_data_version(db_path):
+    cache = SQLResultCache(db_path)
+    cache.put("SELECT Name FROM artist", query(db_path, "SELECT Name FROM artist"))
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("INSERT INTO artist VALUES (100, 'new artist')")
+    assert cache.get("SELECT Name FROM artist") is None
+    assert cache.stats()["invalidations"] == 1 and cache.stats()["entries"] == 0
+
+
+def test_cache_is_bounded_by_result_bytes(db_path):
+    results = [query(db_path, f"SELECT Name FROM artist WHERE ArtistId < {n}") for n in (10, 11, 12)]
+    cache = SQLResultCache(db_path, max_bytes=results[1].bytes + results[2].bytes)
+    for position, result in enumerate(results):
+        cache.put(f"q{position}", result)
+    assert cache.get("q0") is None and cache.get("q2") is results[2]
+    assert cache.stats()["bytes"] <= cache.max_bytes and cache.stats()["evictions"] == 1
+
+    too_big = query(db_path, "SELECT Name FROM artist")
+    assert too_big.bytes > cache.max_bytes
+    cache.put("all", too_big)
+    assert cache.get("all") is None
+
+
+def test_cache_is_bounded_by_entries(db_path):
+    cache = SQLResultCache(db_path, max_entries=2)
+    for position in range(3):
+        cache.put(f"q{position}", query(db_path, f"SELECT Name FROM artist LIMIT {position + 1}"))
+    assert cache.get("q0") is None and cache.stats()["entries"] == 2
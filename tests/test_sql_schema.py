@@ -0,0 +1,53 @@
+import sqlite3
+
+import sql_schema
+from sql_schema import get_schema_index
+
+
+def test_unchanged_database_is_not_reopened(tmp_path, monkeypatch):
+    path = str(tmp_path / "shop.db")
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE customer (id INTEGER PRIMARY KEY, name TEXT)")
+    index = get_schema_index(path, cache_dir=None)
+
+    connects = []
+    connect = sqlite3.connect
+    monkeypatch.setattr(sql_schema.sqlite3, "connect", lambda *args, **kwargs: connects.append(args) or connect(*args, **kwargs))
+    for _ in range(5):
+        assert get_schema_index(path, cache_dir=None) is index
+    assert connects == []
+
+
+def test_schema_change_rebuilds_the_index(tmp_path):
+    path = str(tmp_path / "shop.db")
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE customer (id INTEGER PRIMARY KEY, name TEXT)")
+    assert list(get_schema_index(path, cache_dir=None).tables) == ["customer"]
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE invoice (id INTEGER PRIMARY KEY, customer_id INTEGER REFERENCES customer(id))")
+    assert sorted(get_schema_index(path, cache_dir=None).tables) == ["customer", "invoice"]
+
+
+def test_schema_reads_close_their_connections(tmp_path, monkeypatch):
+    path = str(tmp_path / "shop.db")
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE customer (id INTEGER PRIMARY KEY, name TEXT)")
+    opened = []
+    connect = sqlite3.connect
+
+    class Tracked:
+        def __init__(self, *args, **kwargs):
+            self.conn = connect(*args, **kwargs)
+            self.closed = False
+            opened.append(self)
+
+        def __getattr__(self, name):
+            return getattr(self.conn, name)
+
+        def close(self):
+            self.closed = True
+            self.conn.close()
+
+    monkeypatch.setattr(sql_schema.sqlite3, "connect", Tracked)
+    get_schema_index(path, cache_dir=None)
+    assert opened and all(conn.closed for conn in opened)
@@ -0,0 +1,50 @@
+import json
+import random
+
+import pytest
+
+from streaming import AnswerStreamExtractor, visible_html
+
+
+ANSWER = 'Revenue rose 😀 to ₹4,39,695 crore — "strong" year\n<b>JLR</b> \\ path/é 𝄞'
+
+
+def stream(text, sizes):
+    extractor, out, position = AnswerStreamExtractor(), [], 0
+    for size in sizes:
+        out.append(extractor.feed(text[position:position + size]))
+        position += size
+    out.append(extractor.feed(text[position:]))
+    return extractor, "".join(out)
+
+
+@pytest.mark.parametrize("ensure_ascii", [True, False])
+def test_random_chunk_splits_decode_to_the_json_value(ensure_ascii):
+    raw = "```json\n" + json.dumps({"answer": ANSWER}, ensure_ascii=ensure_ascii) + "\n```"
+    rng = random.Random(7)
+    for _ in range(300):
+        extractor, text = stream(raw, [rng.randint(1, 6) for _ in range(len(raw))])
+        assert text == ANSWER == extractor.answer
+        text.encode("utf-8")
+
+
+def test_surrogate_pair_split_between_chunks():
+    raw = json.dumps({"answer": "😀"})
+    escape = raw.index("\\ud83d")
+    for cut in range(escape, escape + 12):
+        extractor, text = stream(raw, [cut])
+        assert text == "😀"
+
+
+def test_lone_surrogates_become_replacement_characters():
+    extractor, text = stream('{"answer": "a\\ud83d b \\ude00 c\\ud83d"}', [13, 9])
+    assert text == "a� b � c�"
+
+
+def test_plain_text_is_passed_through():
+    extractor, text = stream("<p>Hello! How can I help?</p>", [2, 5, 3])
+    assert extractor.state == "raw" and text == "<p>Hello! How can I help?</p>"
+
+
+def test_partial_tag_is_hidden():
+    assert visible_html("<p>Revenue <stro") == "<p>Revenue "
@@ -0,0 +1,47 @@
+import pytest
+from langchain_core.documents import Document
+
+import vectorstore
+from fakes import FakeEmbeddings
+from lexical_index import BM25Index, load_lexical_index
+
+
+@pytest.fixture
+def source(tmp_path, monkeypatch):
+    persist_directory = str(tmp_path / "chromadb")
+    monkeypatch.setattr(vectorstore, "PERSIST_DIRECTORY", persist_directory)
+    monkeypatch.setattr(vectorstore, "PROGRESS_FILE", str(tmp_path / "chromadb" / "ingest_progress.json"))
+    monkeypatch.setattr(vectorstore, "CHUNKER", "recursive")
+    path = tmp_path / "report.pdf"
+    path.write_bytes(b"%PDF")
+    return str(path)
+
+
+def pages(count, fail_at=None):
+    for number in range(count):
+        if number == fail_at:
+            raise RuntimeError("interrupted")
+        yield Document(page_content=f"page {number} revenue segment {number * 7}", metadata={"page": number})
+
+
+def test_lexical_index_is_saved_at_checkpoints_only(source, monkeypatch):
+    saves = []
+    save = BM25Index.save
+    monkeypatch.setattr(BM25Index, "save", lambda self, path: (saves.append(len(self)), save(self, path)))
+    vectordb = vectorstore.get_vectordb(FakeEmbeddings())
+    vectorstore.ingest_incremental(source, vectordb, batch_size=1, pages=pages(40), refresh=False,
+                                   checkpoint_batches=16)
+    assert saves == [16, 32, 40]
+
+
+def test_interrupted_run_resumes_and_completes_lexical_index(source):
+    vectordb = vectorstore.get_vectordb(FakeEmbeddings())
+    with pytest.raises(RuntimeError):
+        vectorstore.ingest_incremental(source, vectordb, batch_size=1, pages=pages(40, fail_at=20), refresh=False,
+                                       checkpoint_batches=8)
+    assert len(load_lexical_index(vectorstore.PERSIST_DIRECTORY)) == 16
+    assert vectordb._collection.count() == 20
+
+    vectorstore.ingest_incremental(source, vectordb, batch_size=1, pages=pages(40), refresh=False,
+                                   checkpoint_batches=8)
+    assert len(load_lexical_index(vectorstore.PERSIST_DIRECTORY)) == vectordb._collection.count() == 40
@@ -1,20 +1,401 @@
-from dotenv import load_dotenv 
+from dotenv import load_dotenv
 load_dotenv()
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.document_loaders import PyPDFLoader
-from langchain_openai import OpenAIEmbeddings
 from langchain_community.vectorstores import Chroma
+from langchain_core.documents import Document
+from cached_embeddings import cached_openai_embeddings
+from retrieval import bump_collection_version
+from lexical_index import BM25Index, load_lexical_index, lexical_index_path
+from compact_index import CompactVectorIndex, compact_index_path
+from chunking import StructuredChunker
 
 
-pdf_read = PyPDFLoader("/Users/apple/Documents/TeachAIToFamily/tata-motor-IAR-2024-25.pdf")
-data = pdf_read.load()
-    
+PDF_PATH = "/Users/apple/Documents/TeachAIToFamily/tata-motor-IAR-2024-25.pdf"
+PERSIST_DIRECTORY = "chromadb"
+COLLECTION_NAME = "rag"
+PROGRESS_FILE = os.path.join(PERSIST_DIRECTORY, "ingest_progress.json")
+BATCH_SIZE = 64
+# the BM25 index and the progress file are saved together every CHECKPOINT_BATCHES flushes
+CHECKPOINT_BATCHES = int(os.getenv("CHECKPOINT_BATCHES", "16"))
+MANIFEST_FILE = os.path.join(PERSIST_DIRECTORY, "ingest_manifest.json")
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(os.cpu_count() or 1)))
+PAGES_PER_TASK = int(os.getenv("PAGES_PER_TASK", "16"))
+
 splitter = RecursiveCharacterTextSplitter(
-    chunk_size=1024, 
+    chunk_size=1024,
     chunk_overlap = 512,
     length_function=len
 )
-splitted_documents = splitter.split_documents(data)
-embeddings = OpenAIEmbeddings(model="text-embedding-3-large")
-vectordb = Chroma.from_documents(documents=splitted_documents, embedding=embeddings,
-                                 persist_directory="chromadb",collection_name="rag")
+# structured: token sized, heading/table aware, furniture stripped, near-duplicates dropped
+# recursive: the 1024/512 character splitter above
+CHUNKER = os.getenv("CHUNKER", "structured")
+
+
+def get_chunker():
+    return StructuredChunker() if CHUNKER == "structured" else None
+
+
+def split_pages(pages, chunker):
+    """
+        (page_number, chunks) for every page, with either splitter.
+    """
+    if chunker is not None:
+        yield from chunker.split_pages(pages)
+        return
+    for page_number, page in enumerate(pages):
+        yield page_number, splitter.split_documents([page])
+
+
+def get_embeddings():
+    return cached_openai_embeddings(model="text-embedding-3-large")
+
+
+def get_vectordb(embeddings=None):
+    return Chroma(
+        embedding_function=embeddings or get_embeddings(),
+        persist_directory=PERSIST_DIRECTORY,
+        collection_name=COLLECTION_NAME,
+    )
+
+
+def chunk_id(source, text):
+    """
+        Stable id of a chunk: sha256 over the source path and the chunk text.
+    """
+    return hashlib.sha256(f"{source}\n{text}".encode("utf-8")).hexdigest()
+
+
+def file_fingerprint(path):
+    stat = os.stat(path)
+    return f"{stat.st_size}:{int(stat.st_mtime)}"
+
+
+def load_progress(source, fingerprint):
+    """
+        Returns the progress of an interrupted run for the same file, or a fresh one.
+    """
+    if os.path.exists(PROGRESS_FILE):
+        with open(PROGRESS_FILE, "r", encoding="utf-8") as f:
+            progress = json.load(f)
+        if progress.get("source") == source and progress.get("fingerprint") == fingerprint:
+            return progress
+    return {"source": source, "fingerprint": fingerprint, "pages_done": 0, "seen_ids": []}
+
+
+def save_progress(progress):
+    os.makedirs(PERSIST_DIRECTORY, exist_ok=True)
+    tmp_path = PROGRESS_FILE + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(progress, f)
+    os.replace(tmp_path, PROGRESS_FILE)
+
+
+def ingest_full(pdf_path=PDF_PATH):
+    """
+        Original behaviour: load the whole pdf and embed every chunk.
+    """
+    data = PyPDFLoader(pdf_path).load()
+    chunker = get_chunker()
+    splitted_documents = [chunk for _, chunks in split_pages(data, chunker) for chunk in chunks]
+    if chunker is not None:
+        print(f"Chunking for '{pdf_path}': {chunker.report()}")
+    vectordb = Chroma.from_documents(documents=splitted_documents, embedding=get_embeddings(),
+                                 persist_directory=PERSIST_DIRECTORY,collection_name=COLLECTION_NAME)
+    rebuild_lexical_index(vectordb)
+    refresh_compact_index(vectordb)
+    bump_collection_version(PERSIST_DIRECTORY)
+    return vectordb
+
+
+def rebuild_lexical_index(vectordb=None):
+    """
+        Rebuilds the BM25 index from the current content of the collection.
+    """
+    index = BM25Index.from_collection(vectordb if vectordb is not None else get_vectordb())
+    index.save(lexical_index_path(PERSIST_DIRECTORY))
+    return index
+
+
+def rebuild_compact_index(vectordb=None):
+    """
+        Rebuilds the truncated/int8 copy of the embeddings used by RETRIEVAL_MODE=compact.
+    """
+    return CompactVectorIndex.from_collection(vectordb if vectordb is not None else get_vectordb(),
+                                              compact_index_path(PERSIST_DIRECTORY))
+
+
+def refresh_compact_index(vectordb):
+    """
+        Keeps an existing compact index in sync after ingestion; nothing is built until
+        the compact mode is used or --rebuild-compact is run.
+    """
+    if os.path.exists(compact_index_path(PERSIST_DIRECTORY)):
+        rebuild_compact_index(vectordb)
+
+
+def ingest_incremental(pdf_path=PDF_PATH, vectordb=None, batch_size=BATCH_SIZE, pages=None, refresh=True,
+                       checkpoint_batches=CHECKPOINT_BATCHES):
+    """
+        Streams pages, hashes every chunk and only embeds chunks that are not yet
+        in the collection. Chunks of this source that no longer exist are deleted.
+        Every `checkpoint_batches` flushed batches the BM25 index is saved together with
+        the progress file, so an interrupted run resumes from the last checkpointed page;
+        chunks embedded after it are found in the collection and only re-added to BM25.
+
+        `pages` replaces the PyPDFLoader page stream (used by ingest_directory);
+        refresh=False leaves the compact index and version marker to the caller.
+    """
+    if vectordb is None:
+        vectordb = get_vectordb()
+    lexical_index = load_lexical_index(PERSIST_DIRECTORY)
+    progress = load_progress(pdf_path, file_fingerprint(pdf_path))
+    existing_ids = set(vectordb.get(where={"source": pdf_path}, include=[])["ids"])
+    seen_ids = set(progress["seen_ids"])
+    stats = {"pages": 0, "chunks": 0, "added": 0, "skipped": 0, "deleted": 0}
+
+    pending_docs, pending_ids = [], []
+    pages_seen = progress["pages_done"]
+    unsaved_batches = 0
+
+    def flush():
+        nonlocal unsaved_batches
+        if pending_docs:
+            vectordb.add_documents(pending_docs, ids=pending_ids)
+            lexical_index.add_documents(pending_docs, pending_ids)
+            existing_ids.update(pending_ids)
+            stats["added"] += len(pending_docs)
+            pending_docs.clear()
+            pending_ids.clear()
+            unsaved_batches += 1
+
+    def checkpoint(pages_done):
+        nonlocal unsaved_batches
+        lexical_index.save(lexical_index_path(PERSIST_DIRECTORY))
+        progress["pages_done"] = pages_done
+        progress["seen_ids"] = sorted(seen_ids)
+        save_progress(progress)
+        unsaved_batches = 0
+
+    chunker = get_chunker()
+    # pages before pages_done are still chunked (no embedding) so furniture and duplicate
+    # detection see the same history as an uninterrupted run
+    if pages is None:
+        pages = PyPDFLoader(pdf_path).lazy_load()
+    for page_number, chunks in split_pages(pages, chunker):
+        if page_number < progress["pages_done"]:
+            continue
+        stats["pages"] += 1
+        pages_seen = page_number + 1
+        for chunk in chunks:
+            cid = chunk_id(pdf_path, chunk.page_content)
+            stats["chunks"] += 1
+            if cid in seen_ids or cid in existing_ids:
+                seen_ids.add(cid)
+                stats["skipped"] += 1
+                if cid not in lexical_index:
+                    # embedded after the last checkpoint of an interrupted run
+                    chunk.metadata["chunk_hash"] = cid
+                    lexical_index.add(cid, chunk.page_content, chunk.metadata)
+                    stats["relexed"] = stats.get("relexed", 0) + 1
+                continue
+            seen_ids.add(cid)
+            chunk.metadata["chunk_hash"] = cid
+            pending_docs.append(chunk)
+            pending_ids.append(cid)
+        if len(pending_docs) >= batch_size:
+            flush()
+            if unsaved_batches >= checkpoint_batches:
+                checkpoint(pages_seen)
+    flush()
+
+    stale_ids = list(existing_ids - seen_ids)
+    if stale_ids:
+        vectordb.delete(ids=stale_ids)
+        for stale_id in stale_ids:
+            lexical_index.remove(stale_id)
+        stats["deleted"] = len(stale_ids)
+    lexical_index.save(lexical_index_path(PERSIST_DIRECTORY))
+    if refresh and (stats["added"] or stats["deleted"]):
+        refresh_compact_index(vectordb)
+        bump_collection_version(PERSIST_DIRECTORY)
+    if os.path.exists(PROGRESS_FILE):
+        os.remove(PROGRESS_FILE)
+    if chunker is not None:
+        stats["chunking"] = chunker.report()
+    print(f"Ingestion finished for '{pdf_path}': {stats}")
+    return vectordb
+
+
+def parse_pages(path, start, end):
+    """
+        Process pool task: text of pages [start, end) of one pdf, with PyPDFLoader metadata.
+    """
+    from pypdf import PdfReader
+    reader = PdfReader(path)
+    total = len(reader.pages)
+    return [
+        Document(page_content=reader.pages[number].extract_text() or "",
+                 metadata={"source": path, "page": number, "total_pages": total})
+        for number in range(start, min(end, total))
+    ]
+
+
+def page_count(path):
+    from pypdf import PdfReader
+    return len(PdfReader(path).pages)
+
+
+def load_manifest():
+    if os.path.exists(MANIFEST_FILE):
+        with open(MANIFEST_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+
+def save_manifest(manifest):
+    os.makedirs(PERSIST_DIRECTORY, exist_ok=True)
+    tmp_path = MANIFEST_FILE + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, MANIFEST_FILE)
+
+
+def parse_in_background(tasks, pages_queue, workers, stop):
+    """
+        Producer thread: runs (path, start, end) tasks on a process pool, at most
+        2 * workers in flight, and puts results on the bounded queue in task order,
+        with (path, None) after the last range of each file.
+    """
+    try:
+        # spawn: forking a process that already runs chroma/http threads is not safe
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            in_flight = deque()
+            task_iter = iter(tasks)
+            while not stop.is_set():
+                while len(in_flight) < 2 * workers:
+                    task = next(task_iter, None)
+                    if task is None:
+                        break
+                    future = pool.submit(parse_pages, *task[:3]) if task[1] is not None else None
+                    in_flight.append((task, future))
+                if not in_flight:
+                    break
+                (path, start, _, last), future = in_flight.popleft()
+                if future is not None:
+                    pages_queue.put((path, future.result()))
+                if last:
+                    pages_queue.put((path, None))
+            for _, future in in_flight:
+                if future is not None:
+                    future.cancel()
+    except Exception as e:
+        pages_queue.put((None, e))
+        return
+    pages_queue.put((None, None))
+
+
+def ingest_directory(directory, vectordb=None, workers=INGEST_WORKERS, pages_per_task=PAGES_PER_TASK,
+                     queue_size=None):
+    """
+        Indexes every pdf under `directory`. Files are parsed in page ranges across a
+        process pool and the parsed pages flow through a bounded queue into the same
+        split -> hash -> embed path as ingest_incremental, so memory depends on the queue
+        size, not on the corpus. Files whose size/mtime did not change since the last run
+        are skipped; chunks of files that disappeared are deleted.
+    """
+    if vectordb is None:
+        vectordb = get_vectordb()
+    paths = sorted(
+        os.path.join(root, name)
+        for root, _, names in os.walk(directory)
+        for name in names if name.lower().endswith(".pdf")
+    )
+    manifest = load_manifest()
+    removed = [path for path in manifest if path.startswith(os.path.join(directory, "")) and path not in paths]
+    changed = [path for path in paths if manifest.get(path) != file_fingerprint(path)]
+    print(f"{len(paths)} pdfs in '{directory}': {len(changed)} new or changed, {len(removed)} removed")
+
+    tasks = []
+    for path in changed:
+        pages = page_count(path)
+        if not pages:
+            tasks.append((path, None, None, True))
+        for start in range(0, pages, pages_per_task):
+            tasks.append((path, start, start + pages_per_task, start + pages_per_task >= pages))
+
+    pages_queue = queue.Queue(maxsize=queue_size or 2 * workers)
+    stop = threading.Event()
+    producer = threading.Thread(target=parse_in_background, args=(tasks, pages_queue, workers, stop), daemon=True)
+    producer.start()
+
+    def document_pages(path):
+        while True:
+            source, pages = pages_queue.get()
+            if isinstance(pages, Exception):
+                raise pages
+            if pages is None:
+                return
+            yield from pages
+
+    try:
+        for path in changed:
+            ingest_incremental(path, vectordb=vectordb, pages=document_pages(path), refresh=False)
+            manifest[path] = file_fingerprint(path)
+            save_manifest(manifest)
+    finally:
+        stop.set()
+        while producer.is_alive():
+            try:
+                pages_queue.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+    lexical_index = load_lexical_index(PERSIST_DIRECTORY)
+    for path in removed:
+        stale_ids = vectordb.get(where={"source": path}, include=[])["ids"]
+        if stale_ids:
+            vectordb.delete(ids=stale_ids)
+            for stale_id in stale_ids:
+                lexical_index.remove(stale_id)
+        del manifest[path]
+    if removed:
+        lexical_index.save(lexical_index_path(PERSIST_DIRECTORY))
+        save_manifest(manifest)
+    if changed or removed:
+        refresh_compact_index(vectordb)
+        bump_collection_version(PERSIST_DIRECTORY)
+    return vectordb
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Index a pdf, or every pdf in a directory, into the chroma `rag` collection")
+    parser.add_argument("pdf_path", nargs="?", default=PDF_PATH, help="pdf file or directory of pdfs")
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS, help="parser processes for directories")
+    parser.add_argument("--mode", choices=["incremental", "full"], default="incremental")
+    parser.add_argument("--rebuild-lexical", action="store_true",
+                        help="only rebuild the BM25 index from the existing collection")
+    parser.add_argument("--rebuild-compact", action="store_true",
+                        help="only rebuild the truncated/int8 embedding index from the existing collection")
+    args = parser.parse_args()
+    if args.rebuild_lexical:
+        rebuild_lexical_index()
+        bump_collection_version(PERSIST_DIRECTORY)
+    elif args.rebuild_compact:
+        rebuild_compact_index()
+        bump_collection_version(PERSIST_DIRECTORY)
+    elif os.path.isdir(args.pdf_path):
+        ingest_directory(args.pdf_path, workers=args.workers)
+    elif args.mode == "full":
+        ingest_full(args.pdf_path)
+    else:
+        ingest_incremental(args.pdf_path)